@@ -0,0 +1,242 @@
+"""Cost-based admission control for the single-text endpoints.
+
+A request's cost is estimated from its input length, its model and the enrichment stages it
+asks for (``StageCost`` per stage, in milliseconds of one worker's time). The admission
+controller then applies three rules:
+
+* **Size.** Texts longer than ``max_chars`` are rejected with 413 and that limit. A text whose
+  scoring alone would overrun the endpoint's deadline is still scored, but as a score-only
+  request: every enrichment is skipped (past ``max_scorable_chars`` of the deadline). VADER's
+  cost grows with the square of the text length: about 0.2 s for 10k characters, 1.6 s for
+  30k and 17 s for 100k, so long documents rely on this rather than on the deadline.
+* **Deadlines.** Each endpoint has a deadline (``ADMISSION_DEADLINE_MS``, e.g.
+  ``export_pdf=5000,*=3000``) that counts from the start of admission. Enrichments whose
+  estimated cost does not fit in what is left after scoring are skipped up front (the cheapest
+  are kept, in ``ENRICHMENTS`` order). Stages that run but overrun are dropped by
+  ``EnrichmentExecutor.run(deadline=...)``. Both kinds are listed in the response's
+  ``dropped``.
+* **Concurrency.** At most ``max_heavy`` requests estimated above ``heavy_ms`` run at once in
+  each worker process. Another heavy request waits up to ``queue_ms`` for a slot, then gets
+  503 with a ``Retry-After`` from the time the running ones are expected to need. Cheap
+  requests are never queued behind heavy ones. A heavy slot is held until the request's
+  enrichment stages have really finished: stages dropped at the deadline keep running in the
+  pool, so ``Ticket.hold`` defers the release until they end.
+
+    with ADMISSION.admit('analyze', len(text), model='vader') as ticket:
+        result = analyze_text(text, model='vader', ticket=ticket)
+"""
+import math
+import os
+import threading
+import time
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from enrichment import parse_timeouts
+
+# Optional stages in the order they are kept when the budget is short; keywords need the language
+ENRICHMENTS = ('langdetect', 'keywords', 'wordcloud')
+_REQUIRES = {'keywords': 'langdetect'}
+DEFAULT_DEADLINES = 'analyze_file=5000,export_pdf=5000,*=3000'
+DEFAULT_MAX_CHARS = 100_000
+
+
+class StageCost(NamedTuple):
+    fixed_ms: float
+    per_kchar_ms: float = 0.0
+    per_kchar2_ms: float = 0.0
+    max_chars: Optional[int] = None  # the stage samples its input down to this length
+
+    def estimate(self, chars: int) -> float:
+        k = min(chars, self.max_chars or chars) / 1000.0
+        return self.fixed_ms + self.per_kchar_ms * k + self.per_kchar2_ms * k * k
+
+
+# Measured on one core with the bundled models. 'score:<model>' overrides 'score'.
+DEFAULT_COSTS: Dict[str, StageCost] = {
+    'score': StageCost(0.5, 0.05),
+    'score:vader': StageCost(0.5, 0.5, 1.8),
+    'langdetect': StageCost(2.0, 4.0, max_chars=10_000),
+    'keywords': StageCost(5.0, 6.0, max_chars=20_000),
+    'wordcloud': StageCost(110.0, 0.15),
+}
+
+
+class Rejected(Exception):
+    """A request refused before any work was done; rendered as JSON with `status`."""
+
+    def __init__(self, status: int, message: str, retry_after: Optional[int] = None, **details):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+        self.details = details
+
+
+class Ticket:
+    """An admitted request: the stages it may run, its deadline and (if heavy) a held slot."""
+
+    __slots__ = ('endpoint', 'cost_ms', 'stages', 'skipped', 'deadline', 'heavy', '_controller', '_pending',
+                 '_released')
+
+    def __init__(self, endpoint: str, cost_ms: float, stages: tuple, skipped: list, deadline: float,
+                 heavy: bool, controller=None):
+        self.endpoint = endpoint
+        self.cost_ms = cost_ms
+        self.stages = stages
+        self.skipped = skipped
+        self.deadline = deadline
+        self.heavy = heavy
+        self._controller = controller
+        self._pending = 0
+        self._released = False
+
+    def hold(self, futures: Iterable):
+        """Keep a heavy slot until `futures` (work still running for this request) finish too."""
+        controller = self._controller
+        if controller is None or not self.heavy:
+            return
+        for fut in futures:
+            with controller._cond:
+                self._pending += 1
+            fut.add_done_callback(self._unhold)
+
+    def _unhold(self, _fut):
+        controller = self._controller
+        if controller is None:
+            return
+        with controller._cond:
+            self._pending -= 1
+            last = self._released and self._pending == 0
+        if last:
+            self._finish()
+
+    def release(self):
+        controller = self._controller
+        if controller is None or not self.heavy:
+            self._controller = None
+            return
+        with controller._cond:
+            if self._released:
+                return
+            self._released = True
+            if self._pending:
+                return  # the last held future releases the slot
+        self._finish()
+
+    def _finish(self):
+        controller, self._controller = self._controller, None
+        if controller is not None:
+            controller._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AdmissionController:
+    def __init__(self, max_chars: int = DEFAULT_MAX_CHARS, max_heavy: int = 2, heavy_ms: float = 250.0,
+                 queue_ms: float = 100.0, deadlines: Optional[Dict[str, float]] = None,
+                 costs: Optional[Dict[str, StageCost]] = None, metrics=None):
+        self.max_chars = max_chars
+        self.max_heavy = max(1, int(max_heavy))
+        self.heavy_ms = heavy_ms
+        self.queue_ms = queue_ms
+        self.deadlines = deadlines or parse_timeouts(DEFAULT_DEADLINES)
+        self.costs = {**DEFAULT_COSTS, **(costs or {})}
+        self.metrics = metrics
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            # slots are per process; a forked worker must not inherit the parent's holders
+            os.register_at_fork(after_in_child=self._reset)
+        if metrics is not None:
+            metrics.describe('sentiment_admission_rejected_total', 'counter',
+                             'Requests refused by admission control, by endpoint and reason.')
+            metrics.describe('sentiment_admission_skipped_total', 'counter',
+                             'Enrichment stages skipped up front because they would not fit the deadline.')
+
+    def _reset(self):
+        self._cond = threading.Condition()
+        self._running: Dict[int, float] = {}  # id(ticket) -> expected finish (monotonic)
+
+    def deadline(self, endpoint: str) -> float:
+        return self.deadlines.get(endpoint, self.deadlines.get('*', 3.0))
+
+    def cost(self, stage: str, chars: int, model: Optional[str] = None) -> float:
+        spec = self.costs.get(f'{stage}:{model}') if stage == 'score' else None
+        return (spec or self.costs[stage]).estimate(chars)
+
+    def max_scorable_chars(self, budget_ms: float, model: Optional[str] = None) -> int:
+        """Longest text whose scoring fits in `budget_ms` (capped at max_chars); longer ones are score-only."""
+        lo, hi = 0, self.max_chars
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.cost('score', mid, model) <= budget_ms:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def _reject(self, endpoint: str, reason: str, status: int, message: str, retry_after=None, **details):
+        if self.metrics is not None:
+            self.metrics.inc('sentiment_admission_rejected_total', 1, endpoint=endpoint, reason=reason)
+        return Rejected(status, message, retry_after, **details)
+
+    def admit(self, endpoint: str, chars: int, stages: Iterable[str] = ENRICHMENTS,
+              model: Optional[str] = None) -> Ticket:
+        """Ticket for a request of `chars` characters, or raise Rejected (413 / 503)."""
+        start = time.monotonic()
+        budget_ms = self.deadline(endpoint) * 1000.0
+        if chars > self.max_chars:
+            raise self._reject(endpoint, 'too_large', 413, f'text too long: {chars} characters (limit {self.max_chars})',
+                               max_chars=self.max_chars)
+        # scoring that alone overruns the deadline still runs: nothing is left over, so every
+        # enrichment is skipped below and the request is score-only
+        score_ms = self.cost('score', chars, model)
+        stages = set(stages)
+        wanted = [s for s in ENRICHMENTS if s in stages]
+        cost_ms = score_ms + sum(self.cost(s, chars) for s in wanted)
+        ticket = Ticket(endpoint, cost_ms, (), [], start + budget_ms / 1000.0, cost_ms >= self.heavy_ms, self)
+        if ticket.heavy:
+            self._acquire(ticket)
+        try:
+            left_ms = (ticket.deadline - time.monotonic()) * 1000.0 - score_ms
+            kept = []
+            for stage in wanted:
+                stage_ms = self.cost(stage, chars)
+                needs = _REQUIRES.get(stage)
+                if stage_ms <= left_ms and (needs is None or needs in kept):
+                    kept.append(stage)
+                    left_ms -= stage_ms
+                else:
+                    ticket.skipped.append(stage)
+                    if self.metrics is not None:
+                        self.metrics.inc('sentiment_admission_skipped_total', 1, endpoint=endpoint, stage=stage)
+            ticket.stages = tuple(kept)
+        except BaseException:
+            ticket.release()
+            raise
+        return ticket
+
+    def _acquire(self, ticket: Ticket):
+        give_up = time.monotonic() + self.queue_ms / 1000.0
+        with self._cond:
+            while len(self._running) >= self.max_heavy:
+                wait = give_up - time.monotonic()
+                if wait <= 0:
+                    ticket._controller = None  # nothing to release
+                    soonest = min(self._running.values()) - time.monotonic()
+                    raise self._reject(ticket.endpoint, 'busy', 503, 'server busy with large requests; retry later',
+                                       retry_after=max(1, math.ceil(soonest)))
+                self._cond.wait(wait)
+            self._running[id(ticket)] = time.monotonic() + ticket.cost_ms / 1000.0
+
+    def _release(self, ticket: Ticket):
+        with self._cond:
+            self._running.pop(id(ticket), None)
+            self._cond.notify()
+
+    def in_flight(self) -> int:
+        with self._cond:
+            return len(self._running)
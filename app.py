@@ -1,30 +1,45 @@
-from flask import Flask, request, render_template, jsonify, make_response, redirect, url_for, session, g, flash, send_file, send_from_directory
+import time
+_import_t0 = _import_mark = time.perf_counter()
+# Phase -> seconds spent at import; see `flask --app app startup-report`
+IMPORT_TIMINGS = {}
+
+
+def _mark_import(phase: str):
+    global _import_mark
+    now = time.perf_counter()
+    IMPORT_TIMINGS[phase] = now - _import_mark
+    _import_mark = now
+
+
+from flask import Flask, request, render_template, jsonify, make_response, redirect, url_for, session, g, flash, send_file, send_from_directory, has_request_context
 from flask_cors import CORS
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from flasgger import Swagger
 from importlib.metadata import version
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from typing import Optional
+from typing import Callable, Optional
+import click
 import os
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import io
 import csv
-from langdetect import detect as lang_detect
+import json
+import gzip
+import glob
+import threading
 import base64
+import hashlib
+import hmac
+import logging
+import logging.handlers
+import queue
+import uuid
+from contextlib import contextmanager
 
-try:
-    import yake
-except Exception:
-    yake = None
-
-try:
-    from wordcloud import WordCloud
-except Exception:
-    WordCloud = None
+_mark_import('framework')
 
-# reportlab is imported lazily inside the /export_pdf endpoint
+# Heavy enrichments (VADER lexicon, YAKE, WordCloud/matplotlib, langdetect profiles) are
+# loaded on first use through the lazy registry below; reportlab stays local to /export_pdf.
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-change-me')
@@ -32,13 +47,200 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-change-me')
 # Flask defaults to ASCII-only JSON which escapes unicode sequences (e.g. "\uXXXX")
 # Setting this to False returns UTF-8 characters directly which renders cleanly in browsers.
 app.config['JSON_AS_ASCII'] = False
-analyzer = SentimentIntensityAnalyzer()
 # Allow Cross-Origin requests during development (e.g., page served from port 5500)
 CORS(app)
 
-# Rate limiting (per client IP)
+# Rate limiting (per client IP). memory:// is per process; multi-worker deployments should
+# point RATELIMIT_STORAGE_URI at the shared sqlite:// backend (run_server.py does this).
+import ratelimit_storage  # noqa: F401  (registers the sqlite:// limits storage scheme)
+app.config.setdefault('RATELIMIT_STORAGE_URI', os.environ.get('RATELIMIT_STORAGE_URI', 'memory://'))
+# RATELIMIT_ENABLED=0 turns limits off, e.g. for capacity runs with benchmarks/loadtest.py
+app.config.setdefault('RATELIMIT_ENABLED', os.environ.get('RATELIMIT_ENABLED', '1') != '0')
+# X-RateLimit-* headers, plus Retry-After on 429s so clients (sentiment_client.py) can back off precisely
+app.config.setdefault('RATELIMIT_HEADERS_ENABLED', True)
 limiter = Limiter(key_func=get_remote_address, app=app, default_limits=["10 per minute", "200 per day"]) 
 
+# Request/stage metrics exposed at /metrics (see metrics.py; METRICS_DIR enables cross-worker merging)
+from metrics import Metrics
+METRICS = Metrics(directory=os.environ.get('METRICS_DIR') or None)
+METRICS.describe('sentiment_request_seconds', 'histogram', 'Request latency by endpoint.')
+METRICS.describe('sentiment_stage_seconds', 'histogram', 'Latency of analysis pipeline stages.')
+METRICS.describe('sentiment_requests_total', 'counter', 'Requests by endpoint and status code.')
+METRICS.describe('sentiment_rows_scored_total', 'counter', 'Texts scored by model.')
+METRICS.describe('sentiment_cache_hits_total', 'counter', 'Cache hits by cache name.')
+METRICS.describe('sentiment_cache_misses_total', 'counter', 'Cache misses by cache name.')
+METRICS.describe('sentiment_db_writes_total', 'counter', 'History writes by table.')
+METRICS.describe('sentiment_requests_in_flight', 'gauge', 'Requests currently being handled.')
+
+
+def _record_stage(name: str, seconds: float):
+    METRICS.observe('sentiment_stage_seconds', seconds, stage=name)
+    # Per-request totals feed the slow-request log
+    if has_request_context():
+        stages = g.setdefault('stage_seconds', {})
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def _stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record_stage(name, time.perf_counter() - t0)
+
+
+_mark_import('app_setup')
+
+
+# ---------- Lazy dependency registry ----------
+_LAZY_LOADERS = {}
+_LAZY_LOADED = {}
+_LAZY_ERRORS = {}  # name -> exception raised by its loader
+# name -> seconds the loader took (None value in _LAZY_LOADED means it failed / not installed)
+LAZY_LOAD_TIMINGS = {}
+_lazy_lock = threading.Lock()
+
+
+def register_lazy(name: str):
+    """Decorator registering a zero-arg loader for an optional heavy dependency."""
+    def deco(loader: Callable):
+        _LAZY_LOADERS[name] = loader
+        return loader
+    return deco
+
+
+def lazy(name: str):
+    """Return the loaded dependency (loading it once, thread-safe) or None if unavailable."""
+    try:
+        return _LAZY_LOADED[name]
+    except KeyError:
+        pass
+    with _lazy_lock:
+        if name not in _LAZY_LOADED:
+            t0 = time.perf_counter()
+            try:
+                _LAZY_LOADED[name] = _LAZY_LOADERS[name]()
+            except Exception as exc:
+                _LAZY_LOADED[name] = None
+                _LAZY_ERRORS[name] = exc
+            LAZY_LOAD_TIMINGS[name] = time.perf_counter() - t0
+        return _LAZY_LOADED[name]
+
+
+# VADER, langdetect and YAKE tables compiled into data/lexicon/*.tbl (see mapped_tables.py) and
+# memory-mapped, so workers share one copy; built on first use if `flask lexicon-build` /
+# run_server.py has not. LEXICON_MMAP=0 parses the packages' own files per process instead.
+# mapped_tables imports NumPy, so it is only imported inside the lazy loaders below.
+LEXICON_DIR = os.environ.get('LEXICON_DIR') or os.path.join(os.path.dirname(__file__), 'data', 'lexicon')
+LEXICON_MMAP = os.environ.get('LEXICON_MMAP', '1') != '0'
+
+
+@register_lazy('vader')
+def _load_vader():
+    import mapped_tables
+    analyzer = mapped_tables.vader_analyzer(LEXICON_DIR) if LEXICON_MMAP else None
+    if analyzer is not None:
+        return analyzer
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    return SentimentIntensityAnalyzer()
+
+
+@register_lazy('langdetect')
+def _load_langdetect():
+    from langdetect import detect
+    from langdetect.detector_factory import init_factory
+    import mapped_tables
+    if not (LEXICON_MMAP and mapped_tables.install_langdetect(LEXICON_DIR)):
+        init_factory()  # parse the language profiles now rather than on the first detect()
+    return detect
+
+
+@register_lazy('yake')
+def _load_yake():
+    import yake
+    return yake
+
+
+@register_lazy('wordcloud')
+def _load_wordcloud():
+    from wordcloud import WordCloud
+    return WordCloud
+
+
+# ---------- Sentiment models ----------
+# Every scorer is resolved through this registry: `model=` parameters, user default_model,
+# chat, PDF export and the batch paths. See model_registry.py.
+from model_registry import ModelRegistry, ModelLoadError  # noqa: F401
+from document import Document
+MODELS = ModelRegistry(default='vader', metrics=METRICS)
+# Models loaded (and pooled) by warm_up(); others load on first use
+MODEL_WARM = [m.strip() for m in os.environ.get('MODEL_WARM', 'vader').split(',') if m.strip()]
+
+
+@MODELS.register('vader', label='VADER', languages=('en',), description='Lexicon and rule based (vaderSentiment).')
+def _model_vader():
+    analyzer = lazy('vader')
+    if analyzer is None:  # surface it through the registry's error path, not as AttributeError later
+        err = _LAZY_ERRORS.get('vader')
+        raise ModelLoadError(f'vaderSentiment failed to load: {err}' if err else 'vaderSentiment is unavailable') from err
+    return analyzer
+
+
+class RuleScorer:
+    """Demo scorer: each positive/negative keyword tilts the compound score by 0.2."""
+    POSITIVE = ('great', 'good', 'love', 'excellent', 'happy', 'awesome')
+    NEGATIVE = ('bad', 'sad', 'angry', 'terrible', 'hate', 'awful')
+
+    def polarity_scores(self, text) -> dict:
+        low = text.lower if isinstance(text, Document) else text.lower()
+        pos_words = sum(w in low for w in self.POSITIVE)
+        neg_words = sum(w in low for w in self.NEGATIVE)
+        compound = max(-1.0, min(1.0, (pos_words - neg_words) * 0.2))
+        return {
+            'pos': max(0.0, compound),
+            'neu': max(0.0, 1.0 - abs(compound)),
+            'neg': max(0.0, -compound),
+            'compound': compound
+        }
+
+    def polarity_scores_batch(self, texts: list) -> list:
+        return [self.polarity_scores(t) for t in texts]
+
+
+@MODELS.register('rule', label='Rule-based (demo)', batch=True, languages=('en',), documents=True,
+                 description='Keyword counting demo model.')
+def _model_rule():
+    return RuleScorer()
+
+
+# Trained with `flask --app app train-linear labeled.csv`; the model is offered once the file exists
+LINEAR_MODEL_PATH = os.environ.get('LINEAR_MODEL_PATH') or os.path.join(os.path.dirname(__file__), 'data', 'models', 'linear.npz')
+
+
+@MODELS.register('linear', label='Linear (hashed n-grams)', batch=True,
+                 available=lambda: os.path.exists(LINEAR_MODEL_PATH),
+                 description='Hashed word/char n-gram softmax classifier; vectorized batch inference (hashing_model.py).')
+def _model_linear():
+    from hashing_model import LinearSentimentModel  # NumPy import deferred to first use
+    return LinearSentimentModel.load(LINEAR_MODEL_PATH)
+
+
+def warm_up(names=None) -> dict:
+    """Opt-in: load lazy dependencies, warm MODEL_WARM models and initialize the DB ahead of
+    traffic (e.g. from run_server.py).
+
+    Returns the per-dependency (and `model:<name>`) load time in seconds.
+    """
+    for name in (names or list(_LAZY_LOADERS)):
+        lazy(name)
+    _ensure_db()
+    timings = {n: LAZY_LOAD_TIMINGS.get(n) for n in (names or list(_LAZY_LOADERS))}
+    if names is None:
+        timings.update({f'model:{n}': t for n, t in MODELS.warm(MODEL_WARM).items()})
+    return timings
+
+
 # Supported language codes we explicitly surface (keep in sync with frontend mapping)
 SUPPORTED_LANGS = {"en","es","fr","de","it","pt","hi","ar","zh","ja"}
 
@@ -55,7 +257,10 @@ def serve_bg_video(filename: str):
         pass
     return resp
 
-def _detect_language(text: str) -> str:
+_ENGLISH_MARKERS = frozenset({"i","am","the","and","is","are","was","were","this","that","it","happy","good","bad","love","very","not"})
+
+
+def _detect_language(text) -> str:
     """Best-effort language detection with heuristics to reduce false positives on very short English texts.
 
     langdetect can misclassify short, high‑frequency English phrases (e.g., 'i am happy') as Scandinavian languages.
@@ -66,18 +271,22 @@ def _detect_language(text: str) -> str:
     """
     if not text:
         return 'en'
-    cleaned = (text or '').strip()
-    ascii_only = all(ord(c) < 128 for c in cleaned)
-    tokens = [t.lower() for t in cleaned.split() if t]
+    doc = Document.of(text)
+    cleaned = doc.text.strip()
+    ascii_only = doc.is_ascii
     length = len(cleaned)
-    english_markers = {"i","am","the","and","is","are","was","were","this","that","it","happy","good","bad","love","very","not"}
+    # whitespace tokens, not doc.tokens: the heuristics were tuned on them ('good.' is no marker)
+    tokens = [t.lower() for t in cleaned.split() if t]
     token_set = set(tokens)
-    short_en_like = (length < 25 or len(tokens) <= 4) and ascii_only and bool(english_markers & token_set)
+    short_en_like = (length < 25 or len(tokens) <= 4) and ascii_only and bool(_ENGLISH_MARKERS & token_set)
     if short_en_like:
         return 'en'
     try:
-        detected = lang_detect(cleaned).lower()
-        if detected in {"sv","no","da"} and ascii_only and (english_markers & token_set):
+        detect = lazy('langdetect')
+        if detect is None:
+            return 'en'
+        detected = detect(cleaned).lower()
+        if detected in {"sv","no","da"} and ascii_only and (_ENGLISH_MARKERS & token_set):
             return 'en'
         # Normalize Chinese variants
         if detected.startswith('zh'):
@@ -98,36 +307,48 @@ def _pkg_version(name: str) -> str:
         return "unknown"
 
 
-# Swagger configuration (serves UI at /api/docs)
-swagger = Swagger(
-    app,
-    config={
-        "headers": [],
-        "specs": [
-            {
-                "endpoint": "apispec_1",
-                "route": "/api/spec.json",
-                "rule_filter": lambda rule: True,
-                "model_filter": lambda tag: True,
+# Swagger configuration (serves UI at /api/docs). flasgger pulls in jsonschema/mistune/yaml;
+# CLIs and workers that never serve docs can skip it with API_DOCS=0.
+if os.environ.get('API_DOCS', '1') != '0':
+    from flasgger import Swagger
+    swagger = Swagger(
+        app,
+        config={
+            "headers": [],
+            "specs": [
+                {
+                    "endpoint": "apispec_1",
+                    "route": "/api/spec.json",
+                    "rule_filter": lambda rule: True,
+                    "model_filter": lambda tag: True,
+                }
+            ],
+            "static_url_path": "/flasgger_static",
+            "swagger_ui": True,
+            "specs_route": "/api/docs",
+        },
+        template={
+            "info": {
+                "title": "Text Sentiment Analysis API",
+                "description": "Endpoints for analyzing text or files and getting sentiment scores.",
+                "version": "1.1.0",
             }
-        ],
-        "static_url_path": "/flasgger_static",
-        "swagger_ui": True,
-        "specs_route": "/api/docs",
-    },
-    template={
-        "info": {
-            "title": "Text Sentiment Analysis API",
-            "description": "Endpoints for analyzing text or files and getting sentiment scores.",
-            "version": "1.1.0",
-        }
-    },
-)
+        },
+    )
+else:
+    swagger = None
+
+_mark_import('api_docs')
 
 # ---------- Persistence (SQLite) ----------
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 DB_PATH = os.path.join(DATA_DIR, 'app.db')
 
+# granularity -> (table, length of the created_at prefix used as bucket key)
+ROLLUP_TABLES = {'hour': 'rollup_hourly', 'day': 'rollup_daily'}
+ROLLUP_BUCKET_CHARS = {'hour': 13, 'day': 10}
+
+
 def _column_exists(conn, table: str, col: str) -> bool:
     cur = conn.execute(f"PRAGMA table_info({table})")
     return any(r[1] == col for r in cur.fetchall())
@@ -136,6 +357,9 @@ def _column_exists(conn, table: str, col: str) -> bool:
 def init_db():
     os.makedirs(DATA_DIR, exist_ok=True)
     with sqlite3.connect(DB_PATH) as conn:
+        # Only takes effect on a fresh file; existing DBs switch on the next full VACUUM
+        # (see `flask history-prune --full-vacuum`).
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS analyses (
@@ -189,6 +413,10 @@ def init_db():
                 cur.execute("ALTER TABLE user_settings ADD COLUMN background_image_enabled INTEGER DEFAULT 1")
             if 'noise_enabled' not in cols:
                 cur.execute("ALTER TABLE user_settings ADD COLUMN noise_enabled INTEGER DEFAULT 1")
+            if 'history_retention_days' not in cols:
+                cur.execute("ALTER TABLE user_settings ADD COLUMN history_retention_days INTEGER")
+            if 'updated_at' not in cols:
+                cur.execute("ALTER TABLE user_settings ADD COLUMN updated_at TEXT")
         except Exception:
             pass
         # Backfill user_id column if db existed without it
@@ -197,13 +425,120 @@ def init_db():
                 conn.execute("ALTER TABLE analyses ADD COLUMN user_id INTEGER")
             except Exception:
                 pass
+        # Batch uploads: one summary row per upload + compact per-row detail
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS batches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT NOT NULL,
+                filename TEXT,
+                model TEXT,
+                row_count INTEGER NOT NULL DEFAULT 0,
+                pos_count INTEGER NOT NULL DEFAULT 0,
+                neu_count INTEGER NOT NULL DEFAULT 0,
+                neg_count INTEGER NOT NULL DEFAULT 0,
+                mean_pos REAL,
+                mean_neu REAL,
+                mean_neg REAL,
+                mean_compound REAL,
+                has_details INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                user_id INTEGER
+            )
+            """
+        )
+        # label stored as -1/0/1, snippet kept short; keyed by (batch_id, row_idx)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS batch_items (
+                batch_id INTEGER NOT NULL,
+                row_idx INTEGER NOT NULL,
+                label INTEGER,
+                pos REAL,
+                neu REAL,
+                neg REAL,
+                compound REAL,
+                snippet TEXT,
+                PRIMARY KEY (batch_id, row_idx)
+            ) WITHOUT ROWID
+            """
+        )
+        if not _column_exists(conn, 'analyses', 'batch_id'):
+            try:
+                conn.execute("ALTER TABLE analyses ADD COLUMN batch_id INTEGER")
+            except Exception:
+                pass
+        # Incrementally maintained trend rollups; user_key 0 = anonymous
+        for table in ROLLUP_TABLES.values():
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    user_key INTEGER NOT NULL,
+                    bucket TEXT NOT NULL,
+                    n INTEGER NOT NULL DEFAULT 0,
+                    pos_n INTEGER NOT NULL DEFAULT 0,
+                    neu_n INTEGER NOT NULL DEFAULT 0,
+                    neg_n INTEGER NOT NULL DEFAULT 0,
+                    compound_sum REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (user_key, bucket)
+                ) WITHOUT ROWID
+                """
+            )
+        # Bumped on every history write/prune; drives /history ETags. user_key 0 = all rows
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS history_versions (
+                user_key INTEGER PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_user_id ON analyses(user_id, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_created_at ON analyses(created_at)")
         conn.commit()
 
 
+def _bump_rollups(conn, user_id: Optional[int], created_at: str, n: int, pos_n: int, neu_n: int, neg_n: int,
+                  compound_sum: float):
+    for gran, table in ROLLUP_TABLES.items():
+        conn.execute(
+            f"""
+            INSERT INTO {table} (user_key, bucket, n, pos_n, neu_n, neg_n, compound_sum) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_key, bucket) DO UPDATE SET
+                n = n + excluded.n, pos_n = pos_n + excluded.pos_n, neu_n = neu_n + excluded.neu_n,
+                neg_n = neg_n + excluded.neg_n, compound_sum = compound_sum + excluded.compound_sum
+            """,
+            (user_id or 0, created_at[:ROLLUP_BUCKET_CHARS[gran]], n, pos_n, neu_n, neg_n, compound_sum),
+        )
+
+
+def _bump_history_version(conn, user_id: Optional[int], updated_at: str):
+    # Anonymous /history lists every row, so key 0 changes on any write
+    for key in {0, user_id or 0}:
+        conn.execute(
+            """
+            INSERT INTO history_versions (user_key, version, updated_at) VALUES (?, 1, ?)
+            ON CONFLICT(user_key) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at
+            """,
+            (key, updated_at),
+        )
+
+
+def history_version(user_id: Optional[int]):
+    """(version, updated_at) of the history visible to user_id; (0, None) before the first write."""
+    with sqlite3.connect(DB_PATH) as conn:
+        row = conn.execute(
+            "SELECT version, updated_at FROM history_versions WHERE user_key = ?", (user_id or 0,)
+        ).fetchone()
+    return (row[0], row[1]) if row else (0, None)
+
+
 def insert_analysis(source: str, text: str, result: dict, filename: Optional[str] = None, user_id: Optional[int] = None):
     snippet = (text or "")[:200]
     scores = result.get("scores", {})
-    with sqlite3.connect(DB_PATH) as conn:
+    created_at = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    with _stage('db_write'), sqlite3.connect(DB_PATH) as conn:
         conn.execute(
             """
             INSERT INTO analyses (source, text_snippet, label, pos, neu, neg, compound, filename, created_at, user_id)
@@ -218,11 +553,184 @@ def insert_analysis(source: str, text: str, result: dict, filename: Optional[str
                 scores.get("neg"),
                 scores.get("compound"),
                 filename,
-                datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                created_at,
                 user_id,
             ),
         )
+        label = result.get("label")
+        _bump_rollups(conn, user_id, created_at, 1,
+                      int(label == 'Positive'), int(label == 'Neutral'), int(label == 'Negative'),
+                      float(scores.get("compound") or 0.0))
+        _bump_history_version(conn, user_id, created_at)
+        conn.commit()
+    METRICS.inc('sentiment_db_writes_total', table='analyses')
+
+
+# DB schema is created/migrated on first use (first request, CLI command or warm_up()),
+# not as an import side effect.
+_db_ready_path = None
+_db_lock = threading.Lock()
+
+
+def _ensure_db():
+    global _db_ready_path
+    if _db_ready_path == DB_PATH:
+        return
+    with _db_lock:
+        if _db_ready_path != DB_PATH:
+            init_db()
+            _db_ready_path = DB_PATH
+
+
+@app.before_request
+def _init_db_on_first_request():
+    _ensure_db()
+
+
+BATCH_SNIPPET_CHARS = 60
+_LABEL_CODES = {'Positive': 1, 'Neutral': 0, 'Negative': -1}
+_LABEL_NAMES = {v: k for k, v in _LABEL_CODES.items()}
+
+
+def _label_for_compound(compound: float) -> str:
+    if compound >= 0.05:
+        return 'Positive'
+    if compound <= -0.05:
+        return 'Negative'
+    return 'Neutral'
+
+
+def insert_batch(source: str, items: list, filename: Optional[str] = None, model: Optional[str] = None,
+                 user_id: Optional[int] = None, store_details: bool = True) -> Optional[int]:
+    """Persist one upload as a single history entry.
+
+    `items` is a list of (text, result) pairs. Aggregates go into `batches` and one
+    summary row is added to `analyses` (linked via batch_id) so history shows the
+    upload as one entry. Per-row detail is optional and stored compactly.
+    """
+    n = len(items)
+    counts = {'Positive': 0, 'Neutral': 0, 'Negative': 0}
+    sums = {'pos': 0.0, 'neu': 0.0, 'neg': 0.0, 'compound': 0.0}
+    detail_rows = []
+    for idx, (text, res) in enumerate(items):
+        sc = res.get('scores', {})
+        label = res.get('label') or 'Neutral'
+        counts[label] = counts.get(label, 0) + 1
+        for k in sums:
+            sums[k] += float(sc.get(k) or 0.0)
+        if store_details:
+            detail_rows.append((
+                idx,
+                _LABEL_CODES.get(label, 0),
+                sc.get('pos'), sc.get('neu'), sc.get('neg'), sc.get('compound'),
+                (text or '')[:BATCH_SNIPPET_CHARS],
+            ))
+    means = {k: (v / n if n else 0.0) for k, v in sums.items()}
+    label = _label_for_compound(means['compound'])
+    created_at = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    with _stage('db_write'), sqlite3.connect(DB_PATH) as conn:
+        cur = conn.execute(
+            """
+            INSERT INTO batches (source, filename, model, row_count, pos_count, neu_count, neg_count,
+                                 mean_pos, mean_neu, mean_neg, mean_compound, has_details, created_at, user_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (source, filename, model, n, counts['Positive'], counts['Neutral'], counts['Negative'],
+             means['pos'], means['neu'], means['neg'], means['compound'],
+             1 if store_details else 0, created_at, user_id),
+        )
+        batch_id = cur.lastrowid
+        if detail_rows:
+            conn.executemany(
+                "INSERT INTO batch_items (batch_id, row_idx, label, pos, neu, neg, compound, snippet) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((batch_id, *r) for r in detail_rows),
+            )
+        conn.execute(
+            """
+            INSERT INTO analyses (source, text_snippet, label, pos, neu, neg, compound, filename, created_at, user_id, batch_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (source, f"{n} rows", label, means['pos'], means['neu'], means['neg'], means['compound'],
+             filename, created_at, user_id, batch_id),
+        )
+        _bump_rollups(conn, user_id, created_at, n, counts['Positive'], counts['Neutral'], counts['Negative'],
+                      sums['compound'])
+        _bump_history_version(conn, user_id, created_at)
         conn.commit()
+    METRICS.inc('sentiment_db_writes_total', table='batches')
+    return batch_id
+
+
+def get_batch(batch_id: int, user_id: Optional[int] = None, offset: int = 0, limit: int = 100) -> Optional[dict]:
+    """Return a batch summary plus a page of its detail rows, or None if not visible to user_id."""
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM batches WHERE id = ?", (batch_id,)).fetchone()
+        if not row or (row['user_id'] or None) != (user_id or None):
+            return None
+        batch = dict(row)
+        batch['has_details'] = bool(batch['has_details'])
+        cur = conn.execute(
+            "SELECT row_idx, label, pos, neu, neg, compound, snippet FROM batch_items WHERE batch_id = ? AND row_idx >= ? ORDER BY row_idx LIMIT ?",
+            (batch_id, offset, limit),
+        )
+        items = []
+        for r in cur.fetchall():
+            d = dict(r)
+            d['label'] = _LABEL_NAMES.get(d['label'], 'Neutral')
+            items.append(d)
+    batch['items'] = items
+    return batch
+
+
+def get_analyses(ids: list, user_id: Optional[int] = None) -> list:
+    """History rows with these ids that belong to user_id (anonymous rows for None), in `ids` order."""
+    if not ids:
+        return []
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        cur = conn.execute(
+            f"SELECT id, source, text_snippet, label, pos, neu, neg, compound, filename, created_at, user_id, batch_id "
+            f"FROM analyses WHERE id IN ({','.join('?' * len(ids))})",
+            list(ids),
+        )
+        rows = {r['id']: dict(r) for r in cur.fetchall() if (r['user_id'] or None) == (user_id or None)}
+    return [rows[i] for i in ids if i in rows]
+
+
+def get_batch_summary(batch_id: int, user_id: Optional[int] = None, extremes: int = 5) -> Optional[dict]:
+    """Batch summary for reports: label counts, means, compound histogram and the most extreme rows."""
+    batch = get_batch(batch_id, user_id=user_id, limit=0)
+    if batch is None:
+        return None
+    bins = reports.HISTOGRAM_BINS
+    histogram = [0] * bins
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        cur = conn.execute(
+            "SELECT MIN(CAST((compound + 1.0) * ? / 2.0 AS INTEGER), ?) AS b, COUNT(*) AS n FROM batch_items "
+            "WHERE batch_id = ? AND compound IS NOT NULL GROUP BY b",
+            (bins, bins - 1, batch_id),
+        )
+        for r in cur.fetchall():
+            histogram[max(0, r['b'])] += r['n']
+
+        def extreme(code: int, order: str) -> list:
+            cur = conn.execute(
+                f"SELECT row_idx, label, compound, snippet FROM batch_items WHERE batch_id = ? AND label = ? "
+                f"ORDER BY compound {order}, row_idx LIMIT ?",
+                (batch_id, code, extremes),
+            )
+            return [{**dict(r), 'label': _LABEL_NAMES.get(r['label'], 'Neutral')} for r in cur.fetchall()]
+        most_negative, most_positive = extreme(-1, 'ASC'), extreme(1, 'DESC')
+    return {
+        'id': batch['id'], 'source': batch['source'], 'filename': batch['filename'], 'model': batch['model'],
+        'created_at': batch['created_at'], 'row_count': batch['row_count'],
+        'counts': {'Positive': batch['pos_count'], 'Neutral': batch['neu_count'], 'Negative': batch['neg_count']},
+        'means': {'pos': batch['mean_pos'], 'neu': batch['mean_neu'], 'neg': batch['mean_neg'],
+                  'compound': batch['mean_compound']},
+        'histogram': histogram, 'most_negative': most_negative, 'most_positive': most_positive,
+    }
 
 
 def get_history(limit: int = 10, user_id: Optional[int] = None):
@@ -230,17 +738,359 @@ def get_history(limit: int = 10, user_id: Optional[int] = None):
         conn.row_factory = sqlite3.Row
         if user_id:
             cur = conn.execute(
-                "SELECT id, source, text_snippet, label, pos, neu, neg, compound, filename, created_at FROM analyses WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+                """
+                SELECT a.id, a.source, a.text_snippet, a.label, a.pos, a.neu, a.neg, a.compound, a.filename, a.created_at,
+                       a.batch_id, b.row_count
+                FROM analyses a LEFT JOIN batches b ON b.id = a.batch_id
+                WHERE a.user_id = ? ORDER BY a.id DESC LIMIT ?
+                """,
                 (user_id, limit),
             )
         else:
             cur = conn.execute(
-                "SELECT id, source, text_snippet, label, pos, neu, neg, compound, filename, created_at FROM analyses ORDER BY id DESC LIMIT ?",
+                """
+                SELECT a.id, a.source, a.text_snippet, a.label, a.pos, a.neu, a.neg, a.compound, a.filename, a.created_at,
+                       a.batch_id, b.row_count
+                FROM analyses a LEFT JOIN batches b ON b.id = a.batch_id
+                ORDER BY a.id DESC LIMIT ?
+                """,
                 (limit,),
             )
         return [dict(row) for row in cur.fetchall()]
 
 
+def get_trends(user_id: Optional[int], granularity: str = 'day', since: Optional[str] = None) -> list:
+    """Read trend buckets from the rollup tables only (never scans `analyses`)."""
+    table = ROLLUP_TABLES[granularity]
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        cur = conn.execute(
+            f"SELECT bucket, n, pos_n, neu_n, neg_n, compound_sum FROM {table} WHERE user_key = ? AND bucket >= ? ORDER BY bucket",
+            (user_id or 0, since or ''),
+        )
+        out = []
+        for r in cur.fetchall():
+            out.append({
+                'bucket': r['bucket'],
+                'count': r['n'],
+                'labels': {'Positive': r['pos_n'], 'Neutral': r['neu_n'], 'Negative': r['neg_n']},
+                'mean_compound': (r['compound_sum'] / r['n']) if r['n'] else 0.0,
+            })
+        return out
+
+
+def _archived_rollup_rows():
+    """(kind, ref, user_key, created_at, n, pos_n, neu_n, neg_n, compound_sum) for every archived history row."""
+    for path in sorted(glob.glob(os.path.join(ARCHIVE_DIR, 'analyses-*'))):
+        if path.endswith('.parquet'):
+            try:
+                import pyarrow.parquet as pq  # type: ignore
+            except ImportError:
+                raise RuntimeError(f'{os.path.basename(path)}: reading Parquet archives needs pyarrow')
+            records = pq.read_table(path).to_pylist()
+        else:
+            with gzip.open(path, 'rt', encoding='utf-8') as fh:
+                records = [json.loads(line) for line in fh if line.strip()]
+        for rec in records:
+            batch = rec.get('batch')
+            if isinstance(batch, str):
+                batch = json.loads(batch)
+            if batch:
+                if (batch.get('row_count') or 0) > 0:
+                    yield ('b', batch['id'], batch.get('user_id') or 0, batch['created_at'], batch['row_count'],
+                           batch['pos_count'], batch['neu_count'], batch['neg_count'],
+                           (batch.get('mean_compound') or 0) * batch['row_count'])
+            elif not rec.get('batch_id'):
+                label = rec.get('label')
+                yield ('a', rec['id'], rec.get('user_id') or 0, rec['created_at'], 1, int(label == 'Positive'),
+                       int(label == 'Neutral'), int(label == 'Negative'), rec.get('compound') or 0)
+
+
+def rebuild_rollups() -> dict:
+    """Recompute all rollups from the rows in `analyses` (+ their batch aggregates) and the archive.
+
+    Archived rows are included so that retention does not erase older trend buckets.
+    """
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute(
+            """
+            CREATE TEMP TABLE rollup_source (
+                kind TEXT, ref INTEGER, user_key INTEGER, created_at TEXT,
+                n INTEGER, pos_n INTEGER, neu_n INTEGER, neg_n INTEGER, compound_sum REAL,
+                PRIMARY KEY (kind, ref)
+            )
+            """
+        )
+        conn.execute(
+            """
+            INSERT INTO rollup_source
+            SELECT 'a', id, COALESCE(user_id, 0), created_at, 1, label = 'Positive', label = 'Neutral',
+                   label = 'Negative', COALESCE(compound, 0)
+            FROM analyses WHERE batch_id IS NULL
+            """
+        )
+        conn.execute(
+            """
+            INSERT INTO rollup_source
+            SELECT 'b', id, COALESCE(user_id, 0), created_at, row_count, pos_count, neu_count, neg_count,
+                   COALESCE(mean_compound * row_count, 0)
+            FROM batches WHERE row_count > 0
+            """
+        )
+        # live rows win over a copy that was archived just before a crash
+        conn.executemany("INSERT OR IGNORE INTO rollup_source VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         _archived_rollup_rows())
+        for gran, table in ROLLUP_TABLES.items():
+            k = ROLLUP_BUCKET_CHARS[gran]
+            conn.execute(f"DELETE FROM {table}")
+            conn.execute(
+                f"""
+                INSERT INTO {table} (user_key, bucket, n, pos_n, neu_n, neg_n, compound_sum)
+                SELECT user_key, substr(created_at, 1, {k}), SUM(n), SUM(pos_n), SUM(neu_n), SUM(neg_n),
+                       SUM(compound_sum)
+                FROM rollup_source GROUP BY 1, 2
+                """
+            )
+        conn.execute("DROP TABLE rollup_source")
+        conn.commit()
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ROLLUP_TABLES.values()}
+
+
+# ---------- History retention / archival ----------
+ARCHIVE_DIR = os.path.join(DATA_DIR, 'archive')
+# Days to keep rows in the hot `analyses` table, per source ('*' = any other source).
+# Off unless configured, e.g. HISTORY_RETENTION="text=90,file=90,csv=30,*=180"; 0 keeps forever.
+DEFAULT_HISTORY_RETENTION = {'*': 0}
+PRUNE_CHUNK_ROWS = 5000
+
+
+def _parse_retention(spec: Optional[str]) -> dict:
+    if not spec:
+        return dict(DEFAULT_HISTORY_RETENTION)
+    out = {}
+    for part in spec.split(','):
+        if '=' not in part:
+            continue
+        key, _, val = part.partition('=')
+        try:
+            out[key.strip() or '*'] = max(0, int(val))
+        except ValueError:
+            continue
+    return out or dict(DEFAULT_HISTORY_RETENTION)
+
+
+app.config.setdefault('HISTORY_RETENTION', _parse_retention(os.environ.get('HISTORY_RETENTION')))
+app.config.setdefault('HISTORY_ARCHIVE_FORMAT', os.environ.get('HISTORY_ARCHIVE_FORMAT', 'ndjson'))
+app.config.setdefault('HISTORY_MAINTENANCE_INTERVAL', int(os.environ.get('HISTORY_MAINTENANCE_INTERVAL', '3600')))
+app.config.setdefault('HISTORY_VACUUM_PAGES', int(os.environ.get('HISTORY_VACUUM_PAGES', '2000')))
+
+
+def _cutoff(days: int, now: Optional[datetime] = None) -> str:
+    return ((now or datetime.utcnow()) - timedelta(days=days)).isoformat(timespec="seconds") + "Z"
+
+
+def _write_archive(records: list, stamp: str) -> Optional[str]:
+    """Write archived rows to data/archive as gzip NDJSON (or Parquet if configured and pyarrow is installed)."""
+    if not records:
+        return None
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    if app.config.get('HISTORY_ARCHIVE_FORMAT') == 'parquet':
+        try:
+            import pyarrow as pa  # type: ignore
+            import pyarrow.parquet as pq  # type: ignore
+            path = os.path.join(ARCHIVE_DIR, f'analyses-{stamp}-{records[0]["id"]}.parquet')
+            flat = [{**r, 'batch': json.dumps(r['batch']) if r.get('batch') else None} for r in records]
+            pq.write_table(pa.Table.from_pylist(flat), path, compression='zstd')
+            return path
+        except Exception:
+            pass  # fall through to NDJSON
+    path = os.path.join(ARCHIVE_DIR, f'analyses-{stamp}.ndjson.gz')
+    with gzip.open(path, 'at', encoding='utf-8') as fh:
+        for r in records:
+            fh.write(json.dumps(r, ensure_ascii=False) + '\n')
+    return path
+
+
+def _archive_where(conn, where: str, params: tuple, stamp: str) -> int:
+    """Move rows matching `where` out of analyses (and their batch detail) into the archive, in chunks."""
+    moved = 0
+    while True:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(
+            f"SELECT * FROM analyses a WHERE {where} ORDER BY a.id LIMIT {PRUNE_CHUNK_ROWS}", params
+        ).fetchall()
+        if not rows:
+            return moved
+        records = []
+        batch_ids = []
+        for r in rows:
+            rec = dict(r)
+            if rec.get('batch_id'):
+                b = conn.execute("SELECT * FROM batches WHERE id = ?", (rec['batch_id'],)).fetchone()
+                if b:
+                    bd = dict(b)
+                    bd['items'] = [list(i) for i in conn.execute(
+                        "SELECT row_idx, label, pos, neu, neg, compound, snippet FROM batch_items WHERE batch_id = ? ORDER BY row_idx",
+                        (rec['batch_id'],),
+                    )]
+                    rec['batch'] = bd
+                batch_ids.append(rec['batch_id'])
+            records.append(rec)
+        _write_archive(records, stamp)
+        ids = [r['id'] for r in rows]
+        marks = ','.join('?' * len(ids))
+        conn.execute(f"DELETE FROM analyses WHERE id IN ({marks})", ids)
+        if batch_ids:
+            bmarks = ','.join('?' * len(batch_ids))
+            conn.execute(f"DELETE FROM batch_items WHERE batch_id IN ({bmarks})", batch_ids)
+            conn.execute(f"DELETE FROM batches WHERE id IN ({bmarks})", batch_ids)
+        conn.commit()
+        moved += len(ids)
+
+
+def prune_history(now: Optional[datetime] = None) -> dict:
+    """Archive rows older than their retention window and return counts per rule.
+
+    A user's own `history_retention_days` setting wins over the per-source policy.
+    """
+    policy = app.config.get('HISTORY_RETENTION') or {}
+    stamp = (now or datetime.utcnow()).strftime('%Y%m%d-%H%M%S')
+    report = {}
+    with sqlite3.connect(DB_PATH) as conn:
+        overrides = conn.execute(
+            "SELECT user_id, history_retention_days FROM user_settings WHERE history_retention_days IS NOT NULL"
+        ).fetchall()
+        for uid, days in overrides:
+            if days and days > 0:
+                report[f'user:{uid}'] = _archive_where(
+                    conn, "a.user_id = ? AND a.created_at < ?", (uid, _cutoff(days, now)), stamp
+                )
+        not_overridden = "(a.user_id IS NULL OR a.user_id NOT IN (SELECT user_id FROM user_settings WHERE history_retention_days IS NOT NULL))"
+        named = [k for k in policy if k != '*']
+        for source in named:
+            days = policy[source]
+            if days > 0:
+                report[source] = _archive_where(
+                    conn, f"a.source = ? AND a.created_at < ? AND {not_overridden}", (source, _cutoff(days, now)), stamp
+                )
+        days = policy.get('*', 0)
+        if days > 0:
+            marks = ','.join('?' * len(named))
+            source_clause = f"a.source NOT IN ({marks}) AND " if named else ""
+            report['*'] = _archive_where(
+                conn, f"{source_clause}a.created_at < ? AND {not_overridden}", (*named, _cutoff(days, now)), stamp
+            )
+        if any(report.values()):
+            # Rows of many users may be gone; invalidate every cached history view
+            conn.execute(
+                "UPDATE history_versions SET version = version + 1, updated_at = ?",
+                ((now or datetime.utcnow()).isoformat(timespec="seconds") + "Z",),
+            )
+            conn.commit()
+    return report
+
+
+def vacuum_history(pages: Optional[int] = None, full: bool = False) -> None:
+    """Return free pages to the OS. `full` rewrites the file (needed once to enable incremental mode)."""
+    with sqlite3.connect(DB_PATH) as conn:
+        if full:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        else:
+            n = pages if pages is not None else app.config.get('HISTORY_VACUUM_PAGES', 2000)
+            conn.execute(f"PRAGMA incremental_vacuum({int(n)})")
+
+
+def history_stats() -> dict:
+    """Table sizes, SQLite page usage and archive totals for the admin report."""
+    stats = {'db_path': DB_PATH, 'db_bytes': os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else 0}
+    with sqlite3.connect(DB_PATH) as conn:
+        for pragma in ('page_size', 'page_count', 'freelist_count', 'auto_vacuum'):
+            stats[pragma] = conn.execute(f"PRAGMA {pragma}").fetchone()[0]
+        stats['auto_vacuum'] = {0: 'none', 1: 'full', 2: 'incremental'}.get(stats['auto_vacuum'], stats['auto_vacuum'])
+        tables = {}
+        for table in ('analyses', 'batches', 'batch_items', *ROLLUP_TABLES.values(), 'users', 'user_settings'):
+            tables[table] = {'rows': conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]}
+        try:
+            for name, size in conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"):
+                if name in tables:
+                    tables[name]['bytes'] = size
+        except sqlite3.Error:
+            pass  # dbstat virtual table not compiled in
+        stats['tables'] = tables
+        stats['analyses_by_source'] = dict(conn.execute("SELECT source, COUNT(*) FROM analyses GROUP BY source").fetchall())
+        oldest, newest = conn.execute("SELECT MIN(created_at), MAX(created_at) FROM analyses").fetchone()
+        stats['analyses_oldest'], stats['analyses_newest'] = oldest, newest
+    files = sorted(glob.glob(os.path.join(ARCHIVE_DIR, 'analyses-*')))
+    stats['archive'] = {
+        'dir': ARCHIVE_DIR,
+        'files': len(files),
+        'bytes': sum(os.path.getsize(p) for p in files),
+        'latest': os.path.basename(files[-1]) if files else None,
+    }
+    stats['retention'] = app.config.get('HISTORY_RETENTION')
+    return stats
+
+
+def run_history_maintenance() -> dict:
+    report = prune_history()
+    vacuum_history()
+    return report
+
+
+_maintenance_started = False
+_maintenance_lock = threading.Lock()
+_maintenance_lock_fh = None
+
+
+def _maintenance_leader() -> bool:
+    """True if this process holds the maintenance lock file (one process per DB prunes and vacuums).
+
+    The lock is kept for the life of the process; if its holder exits, another worker takes over.
+    """
+    global _maintenance_lock_fh
+    if _maintenance_lock_fh is not None:
+        return True
+    try:
+        import fcntl
+    except ImportError:  # pragma: no cover - no flock (Windows): every process runs it
+        return True
+    fh = open(DB_PATH + '.maintenance.lock', 'a')
+    try:
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fh.close()
+        return False
+    _maintenance_lock_fh = fh
+    return True
+
+
+def _maintenance_loop(interval: int):
+    while True:
+        time.sleep(interval)
+        if not _maintenance_leader():
+            continue  # another worker process maintains this DB
+        try:
+            run_history_maintenance()
+        except Exception:
+            app.logger.exception('history maintenance failed')
+
+
+@app.before_request
+def _start_history_maintenance():
+    """Start the background prune/vacuum thread on the first request (HISTORY_MAINTENANCE_INTERVAL=0 disables)."""
+    global _maintenance_started
+    if _maintenance_started:
+        return
+    with _maintenance_lock:
+        if _maintenance_started:
+            return
+        _maintenance_started = True
+        interval = app.config.get('HISTORY_MAINTENANCE_INTERVAL') or 0
+        if interval > 0:
+            threading.Thread(target=_maintenance_loop, args=(interval,), name='history-maintenance', daemon=True).start()
+
+
 # ---------- Auth helpers ----------
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -286,23 +1136,66 @@ def load_current_user():
 
 # ---------- Core analysis ----------
 
-def _extract_keywords(text: str, max_k: int = 6):
-    if not text or not yake:
-        return []
-    kw = yake.KeywordExtractor(lan='en', top=max_k)
-    try:
-        items = kw.extract_keywords(text)
-        return [w for w, score in items]
-    except Exception:
-        return []
+def _make_keyword_extractor(lang: str):
+    import mapped_tables
+    stopwords = mapped_tables.yake_stopwords(LEXICON_DIR, lang) if LEXICON_MMAP else None
+    return lazy('yake').KeywordExtractor(lan=lang, top=6, stopwords=stopwords)
 
 
-def _wordcloud_b64(text: str) -> Optional[str]:
+# Reused YAKE extractors per detected language; long texts are sampled down to KEYWORDS_MAX_CHARS
+from keywords import KeywordService
+KEYWORDS = KeywordService(
+    _make_keyword_extractor,
+    languages=sorted(SUPPORTED_LANGS),
+    pool_size=int(os.environ.get('KEYWORDS_POOL_SIZE', '4')),
+    max_chars=int(os.environ.get('KEYWORDS_MAX_CHARS', '20000')),
+    metrics=METRICS,
+)
+
+
+def _extract_keywords(text, max_k: int = 6, lang: Optional[str] = None):
+    yake = lazy('yake') if text else None
+    if not text or not yake:
+        return []
+    if isinstance(text, Document):
+        text = text.text  # YAKE runs its own sentence/term segmentation
+    return KEYWORDS.extract(text, lang, top=max_k)
+
+
+def _wordcloud_counts(wc, doc: Document) -> dict:
+    """WordCloud.process_text on the document's tokens instead of a fresh regex pass."""
+    try:  # not part of wordcloud's documented API: fall back to process_text if it moves
+        from wordcloud.tokenization import process_tokens, unigrams_and_bigrams
+    except ImportError:
+        return wc.process_text(doc.text)
+    if wc.regexp is not None:
+        return wc.process_text(doc.text)  # a custom pattern: the document's tokens do not apply
+    words = [w[:-2] if w.lower().endswith("'s") else w for w in doc.words(min_length=max(1, wc.min_word_length))]
+    if not wc.include_numbers:
+        words = [w for w in words if not w.isdigit()]
+    stopwords = _WORDCLOUD_STOPWORDS
+    if wc.collocations:
+        return unigrams_and_bigrams(words, stopwords, wc.normalize_plurals, wc.collocation_threshold)
+    counts, _ = process_tokens([w for w in words if w.lower() not in stopwords], wc.normalize_plurals)
+    return counts
+
+
+_WORDCLOUD_STOPWORDS = None
+
+
+def _wordcloud_b64(text) -> Optional[str]:
+    global _WORDCLOUD_STOPWORDS
+    WordCloud = lazy('wordcloud') if text else None
     if not text or not WordCloud:
         return None
     try:
         wc = WordCloud(width=480, height=280, background_color='white', mode='RGBA')
-        img = wc.generate(text).to_image()
+        if _WORDCLOUD_STOPWORDS is None:
+            _WORDCLOUD_STOPWORDS = frozenset(w.lower() for w in wc.stopwords)
+        counts = _wordcloud_counts(wc, Document.of(text))
+        if not counts:
+            return None
+        img = wc.generate_from_frequencies(counts).to_image()
         buf = io.BytesIO()
         img.save(buf, format='PNG')
         return base64.b64encode(buf.getvalue()).decode('utf-8')
@@ -310,31 +1203,86 @@ def _wordcloud_b64(text: str) -> Optional[str]:
         return None
 
 
-def analyze_text(text: str, model: str = 'vader') -> dict:
-    """Analyze text and return label, emoji, and raw scores.
+# Language, keywords and word cloud run on a shared pool while the caller scores the text;
+# a stage past its ENRICH_TIMEOUT_MS budget is left out of the result (see enrichment.py).
+from enrichment import EnrichmentExecutor, parse_timeouts
+ENRICH = EnrichmentExecutor(
+    max_workers=int(os.environ.get('ENRICH_WORKERS', '4')),
+    timeouts=parse_timeouts(os.environ.get('ENRICH_TIMEOUT_MS')),
+    max_overruns=int(os.environ.get('ENRICH_MAX_OVERRUNS', '2')),
+    metrics=METRICS,
+)
+
+
+# Cost-based admission for the single-text endpoints: size caps, per-endpoint deadlines that
+# skip enrichments which will not fit, and a per-worker cap on concurrent heavy requests.
+from admission import DEFAULT_DEADLINES, ENRICHMENTS, AdmissionController, Rejected
+ADMISSION = AdmissionController(
+    max_chars=int(os.environ.get('ADMISSION_MAX_CHARS', '100000')),
+    max_heavy=int(os.environ.get('ADMISSION_MAX_HEAVY', '2')),
+    heavy_ms=float(os.environ.get('ADMISSION_HEAVY_MS', '250')),
+    queue_ms=float(os.environ.get('ADMISSION_QUEUE_MS', '100')),
+    deadlines=parse_timeouts(DEFAULT_DEADLINES + ',' + os.environ.get('ADMISSION_DEADLINE_MS', '')),
+    metrics=METRICS,
+)
+
+
+@app.errorhandler(Rejected)
+def _admission_rejected(exc: Rejected):
+    resp = jsonify({'error': exc.message, **exc.details})
+    resp.status_code = exc.status
+    if exc.retry_after is not None:
+        resp.headers['Retry-After'] = str(exc.retry_after)
+    return resp
+
+
+def _requested_stages(data: dict) -> tuple:
+    """Enrichments asked for in a JSON body's optional `enrich` (list or comma string); all by default."""
+    raw = data.get('enrich')
+    if raw is None:
+        return ENRICHMENTS
+    names = raw.split(',') if isinstance(raw, str) else raw
+    names = [str(n).strip() for n in names if str(n).strip()]
+    unknown = [n for n in names if n not in ENRICHMENTS]
+    if unknown:
+        raise Rejected(400, f'unknown enrichment {unknown[0]!r}', expected_any_of=list(ENRICHMENTS))
+    return tuple(names)
 
-    Returns a dict with keys: label, emoji, scores (pos/neu/neg/compound)
+
+def analyze_text(text, model: str = 'vader', ticket=None) -> dict:
+    """Analyze text (a str or a Document) and return label, emoji, and raw scores.
+
+    Returns a dict with keys: label, emoji, scores (pos/neu/neg/compound), plus lang, keywords
+    and wordcloud_png_b64 when those stages finish in time; skipped stages are listed in
+    ``dropped`` (lang then falls back to 'en'). With an admission `ticket` only the ticket's
+    stages run, and none past its deadline.
     """
     if not text:
         return {"label": "Neutral", "emoji": "\U0001F610", "scores": {"pos": 0.0, "neu": 0.0, "neg": 0.0, "compound": 0.0}}
-    # Language detection (best effort)
-    # Improved language detection with heuristics
-    lang = _detect_language(text)
-
-    if model == 'rule':
-        # Simple demo rule-based: keywords tilt sentiment
-        low = text.lower()
-        pos_words = sum(w in low for w in ['great','good','love','excellent','happy','awesome'])
-        neg_words = sum(w in low for w in ['bad','sad','angry','terrible','hate','awful'])
-        compound = max(-1.0, min(1.0, (pos_words - neg_words) * 0.2))
-        scores = {
-            'pos': max(0.0, compound),
-            'neu': max(0.0, 1.0 - abs(compound)),
-            'neg': max(0.0, -compound),
-            'compound': compound
-        }
-    else:
-        scores = analyzer.polarity_scores(text)
+    doc = Document.of(text)  # normalized and tokenized once for every stage
+
+    def score():
+        with _stage('score'):
+            return MODELS.score(MODELS.resolve(model) or MODELS.default, doc)
+
+    # Language detection (best effort, with heuristics) and enrichments
+    stages = {
+        'langdetect': lambda: _detect_language(doc),
+        'wordcloud': lambda: _wordcloud_b64(doc),
+    }
+    after = {
+        'keywords': ('langdetect', lambda lang: _extract_keywords(doc, lang=lang)),
+    }
+    if ticket is not None:
+        stages = {k: v for k, v in stages.items() if k in ticket.stages}
+        after = {k: v for k, v in after.items() if k in ticket.stages}
+    done = ENRICH.run(stages, inline=score, after=after, deadline=ticket.deadline if ticket is not None else None)
+    if ticket is not None:
+        ticket.hold(done.pending)  # stages past the deadline still run; keep the heavy slot until they end
+    for name, seconds in done.seconds.items():
+        _record_stage(name, seconds)
+
+    scores = done.inline
     compound = scores.get("compound", 0.0)
     if compound >= 0.05:
         label, emoji = "Positive", "\U0001F60A"
@@ -343,18 +1291,44 @@ def analyze_text(text: str, model: str = 'vader') -> dict:
     else:
         label, emoji = "Neutral", "\U0001F610"
 
-    result = {"label": label, "emoji": emoji, "scores": scores, "lang": lang}
-    # Enrichments
-    result["keywords"] = _extract_keywords(text)
-    wc = _wordcloud_b64(text)
-    if wc:
-        result["wordcloud_png_b64"] = wc
+    result = {"label": label, "emoji": emoji, "scores": scores, "lang": done.values.get('langdetect', 'en')}
+    if 'keywords' in done.values:
+        result["keywords"] = done.values['keywords']
+    if done.values.get('wordcloud'):
+        result["wordcloud_png_b64"] = done.values['wordcloud']
+    dropped = (ticket.skipped if ticket is not None else []) + done.dropped
+    if dropped:
+        result["dropped"] = dropped
     return result
 
 
+_EMPTY_SCORES = {"pos": 0.0, "neu": 0.0, "neg": 0.0, "compound": 0.0}
+
+
+def score_texts(texts: list, model: str = 'vader') -> list:
+    """Label and scores only (no language, keywords or word cloud) for a batch of texts.
+
+    Uses the model's batch path; empty texts score neutral without calling the model.
+    """
+    name = MODELS.resolve(model) or MODELS.default
+    idx = [i for i, t in enumerate(texts) if t]
+    with _stage('score'):
+        scored = MODELS.score_batch(name, [texts[i] for i in idx])
+    out = [{'label': 'Neutral', 'scores': dict(_EMPTY_SCORES)} for _ in texts]
+    for i, scores in zip(idx, scored):
+        out[i] = {'label': _label_for_compound(scores.get('compound', 0.0)), 'scores': scores}
+    return out
+
+
 def _resolve_model(requested: Optional[str]) -> str:
-    m = (requested or '').strip().lower()
-    if m in ('vader', 'rule'):
+    m = _resolve_model_name(requested)
+    g.resolved_model = m  # recorded in request profiles
+    return m
+
+
+def _resolve_model_name(requested: Optional[str]) -> str:
+    m = MODELS.resolve(requested)
+    if m:
         return m
     # if user has a default
     uid = g.get('user_id') or None
@@ -363,13 +1337,12 @@ def _resolve_model(requested: Optional[str]) -> str:
             with sqlite3.connect(DB_PATH) as conn:
                 cur = conn.execute("SELECT default_model FROM user_settings WHERE user_id=?", (uid,))
                 row = cur.fetchone()
-                if row and row[0]:
-                    dm = (row[0] or '').strip().lower()
-                    if dm in ('vader','rule'):
-                        return dm
+                dm = MODELS.resolve(row[0]) if row else None
+                if dm:
+                    return dm
         except Exception:
             pass
-    return 'vader'
+    return MODELS.default
 
 
 @app.route('/')
@@ -383,7 +1356,7 @@ def index():
 @app.route('/ui/analyze', methods=['GET'])
 @limiter.exempt
 def analyze_page():
-    return render_template('analyze.html')
+    return render_template('analyze.html', models=MODELS.describe())
 
 
 @app.route('/ui/batch', methods=['GET'])
@@ -414,16 +1387,17 @@ def settings_page():
     # Load current settings
     with sqlite3.connect(DB_PATH) as conn:
         conn.row_factory = sqlite3.Row
-        cur = conn.execute("SELECT default_tone, default_model, accent_theme, background_image_enabled, noise_enabled FROM user_settings WHERE user_id=?", (current_user_id(),))
+        cur = conn.execute("SELECT default_tone, default_model, accent_theme, background_image_enabled, noise_enabled, history_retention_days FROM user_settings WHERE user_id=?", (current_user_id(),))
         row = cur.fetchone()
     settings = {
+        'history_retention_days': row['history_retention_days'] if row else None,
         'default_tone': row['default_tone'] if row else None,
         'default_model': row['default_model'] if row else None,
         'accent_theme': row['accent_theme'] if row else 'blue',
         'background_image_enabled': bool(row['background_image_enabled']) if row else True,
         'noise_enabled': bool(row['noise_enabled']) if row else True,
     }
-    return render_template('settings.html', settings=settings)
+    return render_template('settings.html', settings=settings, models=MODELS.describe())
 
 
 @app.route('/images/<path:filename>')
@@ -438,6 +1412,12 @@ def serve_image(filename: str):
     return send_from_directory(images_dir, filename)
 
 
+# Fingerprinted, precompressed copies of static/ (built by `flask --app app assets-build` or
+# run_server.py); url_for('static', ...) points at them once static/dist/manifest.json exists.
+import static_assets
+reload_static_manifest = static_assets.install(app, limiter=limiter)
+
+
 @app.route('/analyze', methods=['POST'])
 @limiter.limit("20/minute")
 def analyze():
@@ -456,6 +1436,10 @@ def analyze():
             text:
               type: string
               example: I love this product!
+            enrich:
+              type: array
+              items: { type: string, enum: [langdetect, keywords, wordcloud] }
+              description: Optional stages to run (default all)
     responses:
       200:
         description: Analysis result
@@ -476,14 +1460,33 @@ def analyze():
     """
     data = request.get_json(force=True, silent=True) or {}
     text = data.get('text', '')
+    _note_input(text)
     model = _resolve_model(data.get('model'))
-    result = analyze_text(text, model=model)
+    with ADMISSION.admit('analyze', len(text or ''), _requested_stages(data), model=model) as ticket:
+        result = analyze_text(text, model=model, ticket=ticket)
     try:
         insert_analysis("text", text, result, user_id=current_user_id())
     except Exception:
         # Avoid breaking response due to DB issues
         pass
-    return jsonify(result)
+    with _stage('serialize'):
+        return jsonify(result)
+
+
+# Uploaded PDF/DOCX files are parsed in a separate process pool with CPU/memory limits and a
+# hard timeout; extracted text is cached on disk by content hash (see extraction.py).
+from extraction import ExtractionError, ExtractionPool, TextCache
+EXTRACTION = ExtractionPool(
+    workers=int(os.environ.get('EXTRACT_WORKERS', '2')),
+    timeout=float(os.environ.get('EXTRACT_TIMEOUT_S', '20')),
+    cpu_seconds=int(os.environ.get('EXTRACT_CPU_SECONDS', '15')),
+    memory_mb=int(os.environ.get('EXTRACT_MEMORY_MB', '1024')),
+    pages_per_task=int(os.environ.get('EXTRACT_PAGES_PER_TASK', '8')),
+    cache=TextCache(os.environ.get('EXTRACT_CACHE_DIR') or os.path.join(DATA_DIR, 'extracted'),
+                    max_bytes=int(os.environ.get('EXTRACT_CACHE_MAX_MB', '256')) * 1024 * 1024,
+                    max_age=float(os.environ.get('EXTRACT_CACHE_MAX_AGE_H', '168')) * 3600, metrics=METRICS),
+    metrics=METRICS,
+)
 
 
 @app.route('/analyze_file', methods=['POST'])
@@ -518,45 +1521,17 @@ def analyze_file():
         raw = f.read()
     except Exception:
         return jsonify({'error': 'could not read file'}), 400
+    _note_input(raw)
 
-    text = ''
-    # Helper decoders
-    def _decode_bytes(b: bytes) -> str:
-        try:
-            return b.decode('utf-8')
-        except Exception:
-            try:
-                return b.decode('latin-1', errors='ignore')
-            except Exception:
-                return ''
-
-    if ext in {'txt','csv','log'}:
-        text = _decode_bytes(raw)
-    elif ext == 'pdf':
-        try:
-            from PyPDF2 import PdfReader  # type: ignore
-            reader = PdfReader(io.BytesIO(raw))
-            parts = []
-            for page in reader.pages:
-                try:
-                    parts.append(page.extract_text() or '')
-                except Exception:
-                    continue
-            text = '\n'.join(parts)
-        except Exception:
-            return jsonify({'error': 'failed to extract text from PDF'}), 400
-    elif ext == 'docx':
-        try:
-            import docx  # type: ignore
-            doc = docx.Document(io.BytesIO(raw))
-            text = '\n'.join(p.text for p in doc.paragraphs if p.text)
-        except Exception:
-            return jsonify({'error': 'failed to extract text from DOCX'}), 400
-    else:
-        # Fallback: attempt plain decode anyway
-        text = _decode_bytes(raw)
-        if not text:
-            return jsonify({'error': f'unsupported file type: {ext or "unknown"}'}), 400
+    # PDF/DOCX parsing runs in the extraction pool's worker processes; text is cached by hash
+    try:
+        with _stage('extract'):
+            extracted = EXTRACTION.extract(raw, ext)
+    except ExtractionError as exc:
+        return jsonify({'error': str(exc)}), exc.status
+    text = extracted.text
+    if extracted.kind == 'text' and ext not in {'txt', 'csv', 'log'} and not text:
+        return jsonify({'error': f'unsupported file type: {ext or "unknown"}'}), 400
 
     if not text.strip():
         return jsonify({
@@ -577,97 +1552,180 @@ def analyze_file():
         }), 400
 
     model = _resolve_model(request.args.get('model'))
-    result = analyze_text(text, model=model)
+    with ADMISSION.admit('analyze_file', len(text), model=model) as ticket:
+        result = analyze_text(text, model=model, ticket=ticket)
     # add a summary length
-    result['meta'] = {'chars': len(text), 'filename': filename, 'ext': ext}
+    result['meta'] = {'chars': len(text), 'filename': filename, 'ext': ext, 'sha256': extracted.sha256,
+                      'pages': extracted.pages, 'cached': extracted.cached}
     try:
         insert_analysis("file", text, result, filename=getattr(f, 'filename', None), user_id=current_user_id())
     except Exception:
         pass
-    return jsonify(result)
+    with _stage('serialize'):
+        return jsonify(result)
+
+
+# PDF reports are rendered from existing results (history rows, batch summaries or a result the
+# client already has) in a background process and cached by content (see reports.py).
+import reports
+REPORTS = reports.ReportService(
+    os.environ.get('REPORT_DIR') or os.path.join(DATA_DIR, 'reports'),
+    workers=int(os.environ.get('REPORT_WORKERS', '1')),
+    max_bytes=int(os.environ.get('REPORT_CACHE_MAX_MB', '256')) * 1024 * 1024,
+    metrics=METRICS,
+)
+app.config.setdefault('REPORT_WAIT_S', float(os.environ.get('REPORT_WAIT_S', '30')))
+
+
+def _report_pending(key: str, status: str):
+    """202 (still rendering) or 500 (failed) JSON for a report that is not ready."""
+    if status == 'failed':
+        return jsonify({'error': 'report rendering failed', 'id': key, 'detail': REPORTS.error(key)}), 500
+    resp = jsonify({'id': key, 'status': status, 'url': url_for('get_report', key=key)})
+    resp.status_code = 202
+    resp.headers['Location'] = url_for('get_report', key=key)
+    resp.headers['Retry-After'] = '1'
+    return resp
+
+
+def _send_report(key: str):
+    resp = send_file(REPORTS.pdf_path(key), mimetype='application/pdf', as_attachment=True,
+                     download_name='sentiment_report.pdf', etag=key, max_age=86400)
+    # content-addressed: a given id never changes
+    resp.cache_control.private = True
+    resp.cache_control.immutable = True
+    return resp
 
 
 @app.route('/export_pdf', methods=['POST'])
 @limiter.limit("10/minute")
 def export_pdf():
-    """Generate a simple PDF report for a given text analysis."""
-    # Import reportlab locally
-    try:
-        from reportlab.pdfgen import canvas as _canvas
-        from reportlab.lib.pagesizes import letter as _letter
-        from reportlab.lib.units import inch as _inch
-        from reportlab.lib.utils import ImageReader as _ImageReader
-    except Exception:
+    """Generate a PDF report for a given text, or for a file already sent to /analyze_file (`file_sha256`).
+
+    Pass the /analyze response for the text as `result` to report it as is, without re-scoring.
+    """
+    if not reports.available():
         return jsonify({'error': 'PDF utilities unavailable'}), 500
+    deadline = time.monotonic() + ADMISSION.deadline('export_pdf')
     data = request.get_json(force=True, silent=True) or {}
     text = (data.get('text') or '').strip()
-    model = (data.get('model') or 'vader').lower()
+    if not text and data.get('file_sha256'):
+        # report on a file already uploaded to /analyze_file, from the extraction cache
+        text = (EXTRACTION.cached_text(str(data['file_sha256'])) or '').strip()
+        if not text:
+            return jsonify({'error': 'no extracted text for file_sha256; upload the file to /analyze_file first'}), 404
+    _note_input(text)
+    model = _resolve_model(data.get('model'))
     if not text:
         return jsonify({'error': 'text required'}), 400
-    res = analyze_text(text, model=model)
-
-    buf = io.BytesIO()
-    c = _canvas.Canvas(buf, pagesize=_letter)
-    width, height = _letter
-
-    # Title
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(72, height - 72, "Sentiment Analysis Report")
-    c.setFont("Helvetica", 10)
-    c.drawString(72, height - 90, f"Generated: {datetime.utcnow().isoformat(timespec='seconds')}Z")
-    c.drawString(72, height - 105, f"Model: {model.upper()}")
-
-    # Text snippet
-    snippet = (text[:300] + ('…' if len(text) > 300 else ''))
-    c.setFont("Helvetica", 11)
-    c.drawString(72, height - 130, "Text snippet:")
-    text_obj = c.beginText(72, height - 145)
-    text_obj.setFont("Helvetica", 10)
-    for line in snippet.splitlines() or [snippet]:
-        text_obj.textLine(line)
-    c.drawText(text_obj)
-
-    # Scores
-    y = height - 230
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(72, y, f"Result: {res.get('label')} {res.get('emoji','')}")
-    y -= 16
-    sc = res.get('scores', {})
-    c.setFont("Helvetica", 11)
-    c.drawString(72, y, f"Positive: {sc.get('pos',0):.3f}  Neutral: {sc.get('neu',0):.3f}  Negative: {sc.get('neg',0):.3f}  Compound: {sc.get('compound',0):.3f}")
-
-    # Keywords
-    y -= 24
-    kws = res.get('keywords') or []
-    if kws:
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(72, y, "Top Keywords:")
-        y -= 14
-        c.setFont("Helvetica", 11)
-        for k in kws[:10]:
-            c.drawString(90, y, f"• {k}")
-            y -= 14
-
-    # Wordcloud image if available
-    wc_b64 = res.get('wordcloud_png_b64')
-    if wc_b64:
-        try:
-            img_bytes = base64.b64decode(wc_b64)
-            img = _ImageReader(io.BytesIO(img_bytes))
-            img_w, img_h = img.getSize()
-            max_w = width - 2*_inch
-            scale = min(1.0, max_w / img_w)
-            draw_w = img_w * scale
-            draw_h = img_h * scale
-            y_img = max(72, y - draw_h - 10)
-            c.drawImage(img, 72, y_img, width=draw_w, height=draw_h, mask='auto')
-        except Exception:
-            pass
+    try:
+        if isinstance(data.get('result'), dict):
+            item = reports.analysis_item(data['result'], text=text, model=model)
+        else:
+            with ADMISSION.admit('export_pdf', len(text), _requested_stages(data), model=model) as ticket:
+                deadline = ticket.deadline
+                res = analyze_text(text, model=model, ticket=ticket)
+            item = reports.analysis_item(res, text=text, model=model)
+    except ValueError as exc:
+        return jsonify({'error': f'invalid result: {exc}'}), 400
+
+    key, status = REPORTS.request(reports.make_spec([item], [], data.get('title'), owner=current_user_id()))
+    if status != 'ready':
+        # wait only for what is left of the endpoint's deadline; past it, the client polls the 202's Location
+        with _stage('report_render'):
+            status = REPORTS.wait(key, max(0.0, min(app.config['REPORT_WAIT_S'], deadline - time.monotonic())))
+    if status != 'ready':
+        return _report_pending(key, status)
+    return _send_report(key)
+
+
+def _id_list(value, limit: int, name: str) -> list:
+    if value is None:
+        return []
+    if not isinstance(value, list) or len(value) > limit:
+        raise ValueError(f'{name} must be a list of at most {limit} ids')
+    try:
+        return list(dict.fromkeys(int(v) for v in value))
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must contain integer ids')
 
-    c.showPage()
-    c.save()
-    buf.seek(0)
-    return send_file(buf, mimetype='application/pdf', as_attachment=True, download_name='sentiment_report.pdf')
+
+@app.route('/reports', methods=['POST'])
+@limiter.limit("10/minute")
+def create_report():
+    """
+    Queue a PDF report over stored analyses, batches and/or results already returned by /analyze
+    ---
+    consumes:
+      - application/json
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          properties:
+            title: { type: string }
+            history_ids: { type: array, items: { type: integer }, description: "/history item ids (max 100)" }
+            batch_ids: { type: array, items: { type: integer }, description: "CSV batch ids (max 10)" }
+            analyses: { type: array, items: { type: object }, description: "/analyze responses, optionally with text (max 50)" }
+    responses:
+      200:
+        description: Report already rendered (cached); download it from `url`
+      202:
+        description: Report queued; poll `url`
+    """
+    if not reports.available():
+        return jsonify({'error': 'PDF utilities unavailable'}), 500
+    data = request.get_json(force=True, silent=True) or {}
+    uid = current_user_id()
+    given = data.get('analyses') or []
+    try:
+        history_ids = _id_list(data.get('history_ids'), 100, 'history_ids')
+        batch_ids = _id_list(data.get('batch_ids'), 10, 'batch_ids')
+        if not isinstance(given, list) or len(given) > 50 or not all(isinstance(a, dict) for a in given):
+            raise ValueError('analyses must be a list of at most 50 results')
+        analyses = []
+        rows = get_analyses(history_ids, user_id=uid)
+        for row in rows:
+            if row['batch_id']:
+                batch_ids.append(row['batch_id'])  # a batch's history entry: report the whole batch
+            else:
+                analyses.append(reports.analysis_item(row))
+        analyses += [reports.analysis_item(a, text=a.get('text')) for a in given]
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    batches, missing_batches = [], []
+    for batch_id in dict.fromkeys(batch_ids):
+        summary = get_batch_summary(batch_id, user_id=uid)
+        if summary is None:
+            missing_batches.append(batch_id)
+        else:
+            batches.append(summary)
+    found = {r['id'] for r in rows}
+    missing = [i for i in history_ids if i not in found]
+    if missing or missing_batches:
+        return jsonify({'error': 'not found', 'history_ids': missing, 'batch_ids': missing_batches}), 404
+    if not analyses and not batches:
+        return jsonify({'error': 'nothing to report; pass history_ids, batch_ids or analyses'}), 400
+
+    key, status = REPORTS.request(reports.make_spec(analyses, batches, data.get('title'), owner=uid))
+    if status != 'ready':
+        return _report_pending(key, status)
+    return jsonify({'id': key, 'status': status, 'url': url_for('get_report', key=key)})
+
+
+@app.route('/reports/<key>', methods=['GET'])
+@limiter.limit("120/minute")
+def get_report(key: str):
+    """Download a report queued with POST /reports (202 while it is still rendering)."""
+    status = REPORTS.status(key)
+    if status is None or not REPORTS.belongs_to(key, current_user_id()):  # other users' reports do not exist
+        return jsonify({'error': 'report not found'}), 404
+    if status != 'ready':
+        return _report_pending(key, status)
+    return _send_report(key)
 
 
 @app.route('/chat', methods=['POST'])
@@ -703,15 +1761,19 @@ def chat():
 
     data = request.get_json(force=True, silent=True) or {}
     message = (data.get('message') or '').strip()
+    _note_input(message)
     tone = (data.get('tone') or 'listening').lower()
     if not message:
         return jsonify({"reply": "Please share something so I can respond.", "sentiment": analyze_text("")})
 
-    sentiment = analyze_text(message)
+    doc = Document(message)
+    model = _resolve_model(data.get('model'))
+    with ADMISSION.admit('chat', len(message), model=model) as ticket:
+        sentiment = analyze_text(doc, model=model, ticket=ticket)
     label = sentiment.get('label')
     compound = sentiment.get('scores', {}).get('compound', 0.0)
 
-    m = message.lower()
+    m = doc.lower
     # Intent detection
     is_greeting = any(m.startswith(g) for g in ["hi", "hello", "hey"]) or any(
         phrase in m for phrase in ["good morning", "good afternoon", "good evening", "namaste", "hola"]
@@ -932,6 +1994,41 @@ def chat():
     })
 
 
+# Column picking shared by /analyze_csv and batch_score.py
+TEXT_COLUMN_SYNONYMS = ('text', 'message', 'content', 'body', 'comment', 'review', 'sentence')
+
+
+def choose_text_column(fieldnames, requested: Optional[str] = None) -> Optional[str]:
+    """The requested column (case-insensitive, default 'text'), else the first synonym present."""
+    target_col = (requested or 'text').strip()
+    for name in fieldnames:
+        if name.lower() == target_col.lower():
+            return name
+    for syn in TEXT_COLUMN_SYNONYMS:
+        for name in fieldnames:
+            if name.lower() == syn:
+                return name
+    return None
+
+
+def _looks_like_sentence(s: str) -> bool:
+    s2 = s.strip()
+    if len(s2) < 5: return False
+    if s2.lower() in TEXT_COLUMN_SYNONYMS: return False
+    alpha = sum(c.isalpha() for c in s2)
+    if alpha < 3: return False
+    has_space = ' ' in s2
+    sentiment_keywords = {'happy','sad','angry','love','hate','good','bad','excellent','terrible','great','awful','am','not','very','emotional'}
+    kw_hit = any(w in s2.lower() for w in sentiment_keywords)
+    end_punct = s2.endswith(('.', '!', '?'))
+    return has_space and (kw_hit or end_punct or len(s2) > 25)
+
+
+def header_is_data(fieldnames) -> bool:
+    """A header-less single-column file whose first line is really a text row."""
+    return len(fieldnames) == 1 and _looks_like_sentence(fieldnames[0])
+
+
 @app.route('/analyze_csv', methods=['POST'])
 @limiter.limit("5/minute")
 def analyze_csv():
@@ -950,6 +2047,7 @@ def analyze_csv():
         raw = f.read()
     except Exception:
         return jsonify({'error': 'could not read file'}), 400
+    _note_input(raw)
 
     # Prepare row iterator (list of dicts) and fieldnames
     excel_rows = None
@@ -993,46 +2091,20 @@ def analyze_csv():
         reader = csv.DictReader(io.StringIO(content))
         fieldnames = reader.fieldnames or []
 
-    target_col = (request.args.get('col') or 'text').strip()
-    synonyms = ['text','message','content','body','comment','review','sentence']
-    chosen = None
-    # Direct match (case-insensitive)
-    for name in fieldnames:
-        if name.lower() == target_col.lower():
-            chosen = name; break
-    if not chosen:
-        for syn in synonyms:
-            for name in fieldnames:
-                if name.lower() == syn:
-                    chosen = name; break
-            if chosen: break
+    chosen = choose_text_column(fieldnames, request.args.get('col'))
     if not chosen:
         # Heuristic fallback: single column that looks like a sentence may actually be data not header
-        def _looks_like_sentence(s: str) -> bool:
-            s2 = s.strip()
-            if len(s2) < 5: return False
-            if s2.lower() in {'text','message','content','body','comment','review','sentence'}: return False
-            alpha = sum(c.isalpha() for c in s2)
-            if alpha < 3: return False
-            has_space = ' ' in s2
-            sentiment_keywords = {'happy','sad','angry','love','hate','good','bad','excellent','terrible','great','awful','am','not','very','emotional'}
-            kw_hit = any(w in s2.lower() for w in sentiment_keywords)
-            end_punct = s2.endswith(('.', '!', '?')) if isinstance(s2, str) else False
-            return has_space and (kw_hit or end_punct or len(s2) > 25)
-
         heuristic_rows = []
-        if len(fieldnames) == 1:
-            header_candidate = fieldnames[0]
-            if _looks_like_sentence(header_candidate):
-                heuristic_rows.append({'text': header_candidate})
+        if header_is_data(fieldnames):
+            heuristic_rows.append({'text': fieldnames[0]})
         if heuristic_rows:
             chosen = 'text'
             rows = []
             model = _resolve_model(request.args.get('model'))
             detect_lang = (request.args.get('detect_lang','0').lower() in {'1','true','yes','on'})
-            for row in heuristic_rows:
+            scored = score_texts([row['text'] for row in heuristic_rows], model=model)
+            for row, res in zip(heuristic_rows, scored):
                 text_val = row['text']
-                res = analyze_text(text_val, model=model)
                 out = {
                     **row,
                     'label': res['label'],
@@ -1051,19 +2123,21 @@ def analyze_csv():
 
         return jsonify({
             'error': "File missing a suitable text column",
-            'expected_any_of': synonyms,
+            'expected_any_of': list(TEXT_COLUMN_SYNONYMS),
             'available': fieldnames,
             'hint': 'Add a header row with one of the expected names or use ?col=YourColumnName'
         }), 400
 
     rows = []
+    batch_items = []
     model = _resolve_model(request.args.get('model'))
     detect_lang = (request.args.get('detect_lang','0').lower() in {'1','true','yes','on'})
+    store_details = (request.args.get('details','1').lower() in {'1','true','yes','on'})
     # Iterate rows source
-    row_iter = excel_rows if excel_rows is not None else (reader or [])
-    for row in row_iter:
-        text = row.get(chosen, '') or ''
-        res = analyze_text(text, model=model)
+    row_iter = list(excel_rows if excel_rows is not None else (reader or []))
+    texts = [row.get(chosen, '') or '' for row in row_iter]
+    # Rows only need label + scores: score them in one batch call, skip per-row enrichments
+    for row, text, res in zip(row_iter, texts, score_texts(texts, model=model)):
         out = {
             **row,
             'label': res['label'],
@@ -1078,8 +2152,14 @@ def analyze_csv():
             except Exception:
                 out['lang'] = 'unknown'
         rows.append(out)
+        batch_items.append((text, res))
+    _note_input(rows=len(rows))
+
+    batch_id = None
+    if batch_items:
         try:
-            insert_analysis("csv", text, res, filename=getattr(f, 'filename', None), user_id=current_user_id())
+            batch_id = insert_batch("csv", batch_items, filename=getattr(f, 'filename', None), model=model,
+                                    user_id=current_user_id(), store_details=store_details)
         except Exception:
             pass
 
@@ -1104,7 +2184,45 @@ def analyze_csv():
         resp.headers['Content-Disposition'] = 'attachment; filename="analysis_results.csv"'
         return resp
 
-    return jsonify({'count': len(rows), 'results': rows[:50], 'column_used': chosen, 'detect_lang': detect_lang, 'ext': ext or 'csv'})  # preview
+    return jsonify({'count': len(rows), 'results': rows[:50], 'column_used': chosen, 'detect_lang': detect_lang, 'ext': ext or 'csv', 'batch_id': batch_id})  # preview
+
+
+# --- Conditional GET (ETag / Last-Modified) ---
+def _parse_utc(stamp: Optional[str]) -> Optional[datetime]:
+    if not stamp:
+        return None
+    try:
+        return datetime.fromisoformat(stamp.rstrip('Z')).replace(tzinfo=timezone.utc, microsecond=0)
+    except ValueError:
+        return None
+
+
+def _with_validators(resp, etag: str, last_modified: Optional[datetime], private: bool = True):
+    resp.set_etag(etag)
+    if last_modified is not None:
+        resp.last_modified = last_modified
+    # Always revalidate; a matching validator costs one indexed lookup and an empty 304
+    resp.cache_control.no_cache = True
+    if private:
+        resp.cache_control.private = True
+        resp.vary.add('Cookie')
+    else:
+        resp.cache_control.public = True
+    return resp
+
+
+def _not_modified(etag: str, last_modified: Optional[datetime], private: bool = True):
+    """A 304 response if the request's validators still match, else None."""
+    if request.if_none_match:
+        # If-None-Match wins over If-Modified-Since; weak match since compression weakens ETags
+        fresh = request.if_none_match.contains_weak(etag)
+    elif last_modified is not None and request.if_modified_since is not None:
+        fresh = last_modified <= request.if_modified_since
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    return _with_validators(make_response('', 304), etag, last_modified, private)
 
 
 @app.route('/history', methods=['GET'])
@@ -1115,11 +2233,78 @@ def history():
     except Exception:
         limit = 10
     limit = max(1, min(limit, 100))
+    uid = current_user_id()
+    try:
+        version, updated_at = history_version(uid)
+    except Exception:
+        version, updated_at = None, None
+    if version is not None:
+        etag = f'history-{uid or 0}-{version}-{limit}'
+        last_modified = _parse_utc(updated_at)
+        cached = _not_modified(etag, last_modified)
+        if cached is not None:
+            return cached
     try:
-        items = get_history(limit=limit, user_id=current_user_id())
+        items = get_history(limit=limit, user_id=uid)
     except Exception:
         items = []
-    return jsonify({'items': items, 'limit': limit})
+    resp = jsonify({'items': items, 'limit': limit})
+    if version is not None:
+        _with_validators(resp, etag, last_modified)
+    return resp
+
+
+@app.route('/history/trends', methods=['GET'])
+@limiter.limit("30/minute")
+def history_trends():
+    """
+    Sentiment trend buckets for the current user, served from the rollup tables
+    ---
+    parameters:
+      - in: query
+        name: granularity
+        type: string
+        enum: [day, hour]
+        required: false
+      - in: query
+        name: days
+        type: integer
+        required: false
+        description: Look-back window (default 30, max 730)
+    responses:
+      200:
+        description: Buckets with per-label counts and mean compound
+    """
+    granularity = (request.args.get('granularity') or 'day').lower()
+    if granularity not in ROLLUP_TABLES:
+        return jsonify({'error': 'granularity must be one of: ' + ', '.join(ROLLUP_TABLES)}), 400
+    try:
+        days = int(request.args.get('days', '30'))
+    except Exception:
+        days = 30
+    days = max(1, min(days, 730))
+    since = (datetime.utcnow() - timedelta(days=days)).isoformat(timespec="seconds")[:ROLLUP_BUCKET_CHARS[granularity]]
+    try:
+        buckets = get_trends(current_user_id(), granularity=granularity, since=since)
+    except Exception:
+        buckets = []
+    return jsonify({'granularity': granularity, 'days': days, 'buckets': buckets})
+
+
+@app.route('/history/batch/<int:batch_id>', methods=['GET'])
+@limiter.limit("30/minute")
+def history_batch(batch_id: int):
+    """Summary and paged detail rows for one batch upload (?offset=0&limit=100)."""
+    try:
+        offset = max(0, int(request.args.get('offset', '0')))
+        limit = int(request.args.get('limit', '100'))
+    except Exception:
+        offset, limit = 0, 100
+    limit = max(1, min(limit, 500))
+    batch = get_batch(batch_id, user_id=current_user_id(), offset=offset, limit=limit)
+    if batch is None:
+        return jsonify({'error': 'batch not found'}), 404
+    return jsonify({'batch': batch, 'offset': offset, 'limit': limit})
 
 
 @app.route('/settings', methods=['GET', 'POST'])
@@ -1129,8 +2314,14 @@ def settings_api():
     uid = current_user_id()
     if request.method == 'GET':
         with sqlite3.connect(DB_PATH) as conn:
+            stamp = conn.execute("SELECT updated_at FROM user_settings WHERE user_id=?", (uid,)).fetchone()
+            etag = f"settings-{uid}-{(stamp[0] or 'initial') if stamp else 'none'}"
+            last_modified = _parse_utc(stamp[0]) if stamp else None
+            cached = _not_modified(etag, last_modified)
+            if cached is not None:
+                return cached
             conn.row_factory = sqlite3.Row
-            cur = conn.execute("SELECT default_tone, default_model, accent_theme, background_image_enabled, noise_enabled FROM user_settings WHERE user_id=?", (uid,))
+            cur = conn.execute("SELECT default_tone, default_model, accent_theme, background_image_enabled, noise_enabled, history_retention_days FROM user_settings WHERE user_id=?", (uid,))
             row = cur.fetchone()
         if row:
             data = dict(row)
@@ -1138,7 +2329,7 @@ def settings_api():
             data['noise_enabled'] = bool(data.get('noise_enabled', 1))
         else:
             data = {}
-        return jsonify({'settings': data})
+        return _with_validators(jsonify({'settings': data}), etag, last_modified)
     data = request.form or request.get_json(silent=True) or {}
     tone = (data.get('default_tone') or '').strip() or None
     model = (data.get('default_model') or '').strip() or None
@@ -1151,10 +2342,31 @@ def settings_api():
             conn.execute("UPDATE user_settings SET default_tone=?, default_model=?, accent_theme=?, background_image_enabled=?, noise_enabled=? WHERE user_id=?", (tone, model, accent, bg_image_enabled, noise_enabled, uid))
         else:
             conn.execute("INSERT INTO user_settings (user_id, default_tone, default_model, accent_theme, background_image_enabled, noise_enabled) VALUES (?, ?, ?, ?, ?, ?)", (uid, tone, model, accent, bg_image_enabled, noise_enabled))
+        if 'history_retention_days' in data:
+            # Blank resets to the server-wide per-source policy
+            try:
+                retention = max(0, int(str(data.get('history_retention_days')).strip()))
+            except ValueError:
+                retention = None
+            conn.execute("UPDATE user_settings SET history_retention_days=? WHERE user_id=?", (retention, uid))
+        # Microseconds so two saves within one second still change the ETag
+        conn.execute("UPDATE user_settings SET updated_at=? WHERE user_id=?",
+                     (datetime.utcnow().isoformat(timespec='microseconds') + 'Z', uid))
         conn.commit()
     return jsonify({'ok': True})
 
 
+@app.route('/models', methods=['GET'])
+@limiter.limit("30/minute")
+def models_api():
+    """Registered sentiment models with capabilities, load state and per-model latency."""
+    stats = MODELS.stats()
+    return jsonify({
+        'default': MODELS.default,
+        'models': [{**m, **stats.get(m['name'], {})} for m in MODELS.describe()],
+    })
+
+
 @app.route('/health')
 @limiter.exempt
 def health():
@@ -1172,8 +2384,144 @@ def health():
     )
 
 
-# Initialize DB on startup
-init_db()
+
+# --- Slow-request log ---
+# JSONL entries for requests slower than SLOW_REQUEST_MS (0 disables). Entries are handed to a
+# QueueHandler so hashing, formatting and IO happen on a background QueueListener thread; the file rotates
+# by size. `{pid}` in SLOW_LOG_PATH gives each worker its own file (rotation is per process).
+app.config.setdefault('SLOW_REQUEST_MS', float(os.environ.get('SLOW_REQUEST_MS', '1000') or 0))
+app.config.setdefault('SLOW_LOG_PATH', os.environ.get('SLOW_LOG_PATH', os.path.join(DATA_DIR, 'slow_requests.jsonl')))
+app.config.setdefault('SLOW_LOG_MAX_BYTES', int(os.environ.get('SLOW_LOG_MAX_BYTES', str(10 * 1024 * 1024))))
+app.config.setdefault('SLOW_LOG_BACKUPS', int(os.environ.get('SLOW_LOG_BACKUPS', '5')))
+
+slow_logger = logging.getLogger('sentiment.slow_requests')
+slow_logger.propagate = False
+slow_logger.setLevel(logging.INFO)
+_slow_listener = None
+_slow_pid = None
+_slow_lock = threading.Lock()
+
+
+class _SlowEntryFormatter(logging.Formatter):
+    """Runs on the listener thread: hashes the request input and serializes the entry."""
+
+    def format(self, record):
+        entry = record.msg
+        data = getattr(record, 'slow_input', None)
+        if data is not None:
+            raw = data.encode('utf-8', errors='ignore') if isinstance(data, str) else data
+            entry['input_sha256'] = hashlib.sha256(raw).hexdigest()
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _SlowQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        return record  # pass the entry dict and the input reference through as they are
+
+
+def _slow_log_queue_handler():
+    """Create the queue + rotating file listener once per process (after fork)."""
+    global _slow_listener, _slow_pid
+    if _slow_pid == os.getpid():
+        return
+    with _slow_lock:
+        if _slow_pid == os.getpid():
+            return
+        for h in list(slow_logger.handlers):
+            slow_logger.removeHandler(h)
+        path = app.config['SLOW_LOG_PATH'].format(pid=os.getpid())
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=app.config['SLOW_LOG_MAX_BYTES'], backupCount=app.config['SLOW_LOG_BACKUPS'], encoding='utf-8'
+        )
+        file_handler.setFormatter(_SlowEntryFormatter())
+        q = queue.Queue(maxsize=10000)
+        _slow_listener = logging.handlers.QueueListener(q, file_handler)
+        _slow_listener.start()
+        slow_logger.addHandler(_SlowQueueHandler(q))
+        _slow_pid = os.getpid()
+
+
+def _note_input(data=None, rows: Optional[int] = None):
+    """Remember the request's input for the slow log; it is only hashed if the request turns out slow."""
+    if data is not None:
+        g.log_input = data
+    if rows is not None:
+        g.log_rows = rows
+
+
+def _log_slow_request(endpoint: str, elapsed: float, resp):
+    data = g.get('log_input')
+    entry = {
+        'ts': datetime.utcnow().isoformat(timespec='milliseconds') + 'Z',
+        'request_id': g.get('request_id'),
+        'endpoint': endpoint,
+        'method': request.method,
+        'status': resp.status_code,
+        'ms': round(elapsed * 1000.0, 2),
+        'model': g.get('resolved_model'),
+        'stages_ms': {k: round(v * 1000.0, 2) for k, v in (g.get('stage_seconds') or {}).items()},
+        'db_ms': round((g.get('stage_seconds') or {}).get('db_write', 0.0) * 1000.0, 2),
+        'content_length': request.content_length,
+    }
+    if data is not None:
+        entry['input_chars' if isinstance(data, str) else 'input_bytes'] = len(data)
+    if g.get('log_rows') is not None:
+        entry['rows'] = g.log_rows
+    try:
+        _slow_log_queue_handler()
+        # the input is hashed by the listener thread (_SlowEntryFormatter), off the request path
+        slow_logger.info(entry, extra={'slow_input': data})
+    except Exception:
+        pass  # never let logging break a response
+
+
+# --- Request metrics ---
+def _metrics_begin():
+    g._metrics_t0 = time.perf_counter()
+    g.request_id = (request.headers.get('X-Request-ID') or '')[:64] or uuid.uuid4().hex
+    g._metrics_endpoint = request.endpoint or 'unmatched'
+    METRICS.gauge_add('sentiment_requests_in_flight', 1, endpoint=g._metrics_endpoint)
+
+
+# First in line, ahead of Flask-Limiter's check, so rate-limited (429) requests are counted too
+app.before_request_funcs.setdefault(None, []).insert(0, _metrics_begin)
+
+
+@app.after_request
+def _metrics_record(resp):
+    t0 = g.get('_metrics_t0')
+    if t0 is not None:
+        endpoint = g._metrics_endpoint
+        elapsed = time.perf_counter() - t0
+        METRICS.observe('sentiment_request_seconds', elapsed, endpoint=endpoint)
+        METRICS.inc('sentiment_requests_total', endpoint=endpoint, status=resp.status_code)
+        threshold = app.config.get('SLOW_REQUEST_MS') or 0
+        if threshold > 0 and elapsed * 1000.0 >= threshold:
+            _log_slow_request(endpoint, elapsed, resp)
+        resp.headers.setdefault('X-Request-ID', g.request_id)
+    return resp
+
+
+@app.teardown_request
+def _metrics_end(exc):
+    endpoint = g.pop('_metrics_endpoint', None)
+    if endpoint is not None:
+        METRICS.gauge_add('sentiment_requests_in_flight', -1, endpoint=endpoint)
+        METRICS.maybe_flush()
+
+
+@app.route('/metrics')
+@limiter.exempt
+def metrics_endpoint():
+    """Prometheus text exposition of request/stage latency, counters and in-flight gauges."""
+    token = os.environ.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return jsonify({'error': 'unauthorized'}), 401
+    resp = make_response(METRICS.render())
+    resp.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return resp
+
 
 # --- Security Headers (CSP) ---
 @app.after_request
@@ -1242,6 +2590,187 @@ def logout():
     return redirect(url_for('login'))
 
 
+# ---------- Admin CLI (flask --app app <command>) ----------
+
+@app.cli.command('history-stats')
+def history_stats_command():
+    """Report history table sizes, page usage and archive stats as JSON."""
+    _ensure_db()
+    click.echo(json.dumps(history_stats(), indent=2))
+
+
+@app.cli.command('history-prune')
+@click.option('--full-vacuum', is_flag=True, help='Rewrite the DB file (switches existing DBs to incremental auto_vacuum).')
+def history_prune_command(full_vacuum: bool):
+    """Archive history rows past their retention window, then reclaim free pages."""
+    _ensure_db()
+    report = prune_history()
+    vacuum_history(full=full_vacuum)
+    click.echo(json.dumps({'archived': report, 'stats': history_stats()}, indent=2))
+
+
+@app.cli.command('rollups-rebuild')
+def rollups_rebuild_command():
+    """Backfill the hourly/daily trend rollups from existing and archived history rows."""
+    _ensure_db()
+    try:
+        click.echo(json.dumps(rebuild_rollups(), indent=2))
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc))
+
+
+@app.cli.command('ratelimit-bench')
+@click.option('--hits', default=5000, show_default=True, help='Limiter hits per storage.')
+def ratelimit_bench_command(hits: int):
+    """Measure per-request limiter cost (one app-style hit = every default + route limit)."""
+    from limits import parse_many
+    from limits.storage import storage_from_string
+    from limits.strategies import FixedWindowRateLimiter
+    import tempfile
+
+    limits_per_request = parse_many("10 per minute; 200 per day; 20/minute")
+    uris = {'memory': 'memory://', 'configured': app.config.get('RATELIMIT_STORAGE_URI')}
+    if not str(uris['configured']).startswith('sqlite'):
+        uris['sqlite'] = 'sqlite://' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    report = {}
+    for name, uri in uris.items():
+        strategy = FixedWindowRateLimiter(storage_from_string(uri))
+        t0 = time.perf_counter()
+        for i in range(hits):
+            key = f'10.0.{i % 250}.{i % 7}'
+            for lim in limits_per_request:
+                strategy.hit(lim, 'bench', key)
+        elapsed = time.perf_counter() - t0
+        report[name] = {'uri': uri, 'us_per_request': round(elapsed / hits * 1e6, 2)}
+    click.echo(json.dumps(report, indent=2))
+
+
+@app.cli.command('assets-build')
+def assets_build_command():
+    """Fingerprint and gzip/brotli-compress static assets into static/dist/."""
+    manifest = static_assets.build(app.static_folder)
+    reload_static_manifest()
+    for name, hashed in sorted(manifest.items()):
+        click.echo(f'{name} -> {hashed}')
+    if static_assets.brotli is None:
+        click.echo('brotli not installed: only .gz variants were written')
+
+
+@app.cli.command('lexicon-build')
+@click.option('--force', is_flag=True, help='Rebuild even when the compiled tables are up to date.')
+def lexicon_build_command(force: bool):
+    """Compile VADER, langdetect and YAKE tables into memory-mappable files under data/lexicon/."""
+    import mapped_tables
+    click.echo(json.dumps(mapped_tables.build(LEXICON_DIR, force=force), indent=2))
+
+
+@app.cli.command('models')
+@click.option('--warm', is_flag=True, help='Load every registered model first.')
+def models_command(warm: bool):
+    """List registered sentiment models, their capabilities and load/latency stats."""
+    if warm:
+        MODELS.warm()
+    stats = MODELS.stats()
+    click.echo(json.dumps([{**m, **stats[m['name']]} for m in MODELS.describe()], indent=2))
+
+
+@app.cli.command('train-linear')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--text-col', default='text', show_default=True)
+@click.option('--label-col', default='label', show_default=True,
+              help='positive/neutral/negative (or pos/neu/neg, or a signed number)')
+@click.option('--out', 'out_path', default=None, help='Artifact path (default: LINEAR_MODEL_PATH).')
+@click.option('--bits', default=18, show_default=True, help='log2 of the number of hashed features.')
+@click.option('--epochs', default=5, show_default=True)
+@click.option('--holdout', default=0.1, show_default=True, help='Fraction held out for the accuracy report.')
+def train_linear_command(csv_path, text_col, label_col, out_path, bits, epochs, holdout):
+    """Train the hashed n-gram linear model from a labeled CSV and save it as .npz."""
+    from hashing_model import read_labeled_csv, train
+    texts, labels, skipped = read_labeled_csv(csv_path, text_col=text_col, label_col=label_col)
+    if not texts:
+        raise click.ClickException('no labeled rows found')
+    model = train(texts, labels, n_bits=bits, epochs=epochs, holdout=holdout)
+    out_path = out_path or LINEAR_MODEL_PATH
+    if os.path.dirname(out_path):
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    model.save(out_path)
+    click.echo(json.dumps({'path': out_path, 'bytes': os.path.getsize(out_path), 'skipped_rows': skipped, **model.meta}, indent=2))
+
+
+@app.cli.command('startup-report')
+@click.option('--warm', is_flag=True, help='Also load every lazy dependency and time it.')
+def startup_report_command(warm: bool):
+    """Print the import-time breakdown of app.py and lazy dependency load times."""
+    if warm:
+        warm_up()
+    report = {
+        'import_seconds': {k: round(v, 4) for k, v in IMPORT_TIMINGS.items()},
+        'import_total_seconds': round(IMPORT_TOTAL_SECONDS, 4),
+        'lazy_loaded_seconds': {k: round(v, 4) for k, v in LAZY_LOAD_TIMINGS.items()},
+        'lazy_available': {k: _LAZY_LOADED.get(k) is not None for k in _LAZY_LOADERS if k in _LAZY_LOADED},
+        'lazy_pending': [k for k in _LAZY_LOADERS if k not in _LAZY_LOADED],
+        'models': MODELS.stats(),
+    }
+    click.echo(json.dumps(report, indent=2))
+
+
+# --- Precomputed OpenAPI spec ---
+# flasgger would jsonify the spec on every hit; build the bytes and ETag once (warm_up() does it
+# before forking) and serve them from memory. Registered after all routes so the spec is complete.
+@register_lazy('apispec')
+def _load_apispec():
+    if swagger is None:
+        return None
+    with app.app_context():
+        spec = swagger.get_apispecs('apispec_1')
+    body = json.dumps(spec, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return {'body': body, 'etag': hashlib.sha256(body).hexdigest()[:20], 'built_at': datetime.now(timezone.utc).replace(microsecond=0)}
+
+
+def api_spec():
+    spec = lazy('apispec')
+    if spec is None:
+        return jsonify({'error': 'spec unavailable'}), 503
+    cached = _not_modified(spec['etag'], spec['built_at'], private=False)
+    if cached is not None:
+        return cached
+    resp = make_response(spec['body'])
+    resp.mimetype = 'application/json'
+    return _with_validators(resp, spec['etag'], spec['built_at'], private=False)
+
+
+if swagger is not None:
+    app.view_functions['flasgger.apispec_1'] = limiter.exempt(api_spec)
+
+
+# Opt-in request profiling (no-op unless PROFILE_TOKEN or PROFILE_SAMPLE_RATE is set)
+from profiling import install_profiler
+PROFILES_DIR = os.path.join(DATA_DIR, 'profiles')
+install_profiler(
+    app,
+    PROFILES_DIR,
+    token=os.environ.get('PROFILE_TOKEN') or None,
+    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', '0') or 0),
+    mode=os.environ.get('PROFILE_MODE', 'sample'),
+    interval_ms=float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', '5') or 5),
+)
+
+# Negotiated gzip/brotli for dynamic responses. Registered last so it runs first among the
+# after_request hooks and the request metrics include the compression time.
+from compression import install_compression, parse_rules
+install_compression(
+    app,
+    min_bytes=int(os.environ.get('COMPRESS_MIN_BYTES', '1024') or 1024),
+    level=int(os.environ.get('COMPRESS_LEVEL', '6') or 0),
+    br_quality=int(os.environ.get('COMPRESS_BR_QUALITY', '4') or 4),
+    rules=parse_rules(os.environ.get('COMPRESS_TYPES')),
+    metrics=METRICS,
+)
+
+_mark_import('routes')
+IMPORT_TOTAL_SECONDS = time.perf_counter() - _import_t0
+
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
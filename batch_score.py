@@ -0,0 +1,307 @@
+"""Offline batch scorer: score a CSV / XLSX / NDJSON dump without the web stack.
+
+Reuses app.py's scoring (``score_texts`` with any registered model, ``_detect_language``) and
+the text-column choice of ``/analyze_csv`` (``--col``, then the usual synonyms), but skips
+HTTP, rate limits and history writes. Rows are streamed: read in chunks, scored across
+``--jobs`` processes (forked after the model is loaded, so lexicon pages are shared) with a
+bounded number of chunks in flight, and written in input order as CSV or NDJSON.
+
+    python batch_score.py dump.csv -o scored.csv --jobs 8
+    zcat dump.ndjson.gz | python batch_score.py - --format ndjson --output-format ndjson > out.ndjson
+    python batch_score.py dump.csv -o scored.csv --resume          # continue after a crash
+
+``--start-row N`` skips the first N data rows; ``--resume`` also skips as many rows as
+``--output`` already holds complete (pass the same ``--start-row`` again), cuts off a
+half-written last row, and appends after them. Progress and throughput go to stderr every
+few seconds, and a JSON summary is printed there at the end.
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+FORMATS = ('csv', 'ndjson', 'xlsx')
+SCORE_FIELDS = ['label', 'pos', 'neu', 'neg', 'compound']
+_app = None
+
+
+def _load_app():
+    global _app
+    if _app is None:
+        os.environ.setdefault('API_DOCS', '0')
+        import app
+        _app = app
+    return _app
+
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    if ext in ('xlsx', 'xls'):
+        return 'xlsx'
+    if ext in ('ndjson', 'jsonl', 'json'):
+        return 'ndjson'
+    return 'csv'
+
+
+def _open_text(path: str):
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', errors='replace', newline='')
+    return open(path, encoding='utf-8-sig', errors='replace', newline='')
+
+
+def _ndjson_rows(fh) -> Iterator[dict]:
+    for line in fh:
+        line = line.strip()
+        if not line:
+            continue
+        obj = json.loads(line)
+        yield obj if isinstance(obj, dict) else {'text': '' if obj is None else str(obj)}
+
+
+def _xlsx_rows(path: str) -> Tuple[List[str], Iterator[dict]]:
+    from openpyxl import load_workbook  # optional, as for /analyze_csv
+    source = io.BytesIO(sys.stdin.buffer.read()) if path == '-' else path
+    ws = load_workbook(source, read_only=True, data_only=True).active
+    rows = ws.iter_rows(values_only=True)
+    header = [(str(c).strip() if c is not None else '') for c in next(rows, ())]
+
+    def gen():
+        for row in rows:
+            d = {}
+            for idx, val in enumerate(row):
+                key = header[idx] if idx < len(header) else f'col_{idx}'
+                if key:
+                    d[key] = '' if val is None else str(val)
+            if any(v for v in d.values()):  # skip completely empty rows
+                yield d
+    return header, gen()
+
+
+def read_rows(path: str, fmt: str) -> Tuple[List[str], Iterator[dict]]:
+    """(fieldnames, row iterator) for `path` ('-' = stdin) in format `fmt`."""
+    if fmt == 'xlsx':
+        return _xlsx_rows(path)
+    fh = _open_text(path)
+    if fmt == 'ndjson':
+        rows = _ndjson_rows(fh)
+        first = next(rows, None)
+        if first is None:
+            return [], iter(())
+        return list(first), itertools.chain([first], rows)
+    reader = csv.DictReader(fh)
+    return list(reader.fieldnames or []), reader
+
+
+def _as_text(value) -> str:
+    """A row's text cell as a string: NDJSON values may be numbers, booleans or null."""
+    if value is None:
+        return ''
+    return value if isinstance(value, str) else str(value)
+
+
+def _chunks(it: Iterable, size: int) -> Iterator[list]:
+    it = iter(it)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def score_chunk(task: Tuple[List[str], str, bool]) -> List[tuple]:
+    """[(label, scores, lang or None), ...] for a chunk of texts; runs in worker processes."""
+    texts, model, detect_lang = task
+    app = _load_app()
+    out = []
+    for text, res in zip(texts, app.score_texts(texts, model=model)):
+        lang = None
+        if detect_lang:
+            try:
+                lang = app._detect_language(text)
+            except Exception:
+                lang = 'unknown'
+        out.append((res['label'], res['scores'], lang))
+    return out
+
+
+def _complete_prefix(path: str, fmt: str) -> Tuple[int, int]:
+    """(data rows, bytes) of the complete records at the start of `path` (for --resume).
+
+    A crash can leave the last record half written; it ends the prefix, as does anything
+    after it. A record is complete when it parses and ends with a newline.
+    """
+    if not os.path.exists(path):
+        return 0, 0
+    with open(path, 'rb') as fh:
+        if fmt == 'ndjson':
+            rows = good = pos = 0
+            for line in fh:
+                pos += len(line)
+                if not line.endswith(b'\n'):
+                    break
+                if line.strip():
+                    try:
+                        json.loads(line)
+                    except ValueError:
+                        break
+                    rows += 1
+                good = pos
+            return rows, good
+
+        consumed, ended = 0, True
+
+        def lines():  # csv.reader pulls exactly the lines of one record before yielding it
+            nonlocal consumed, ended
+            for line in fh:
+                consumed += len(line)
+                ended = line.endswith(b'\n')
+                yield line.decode('utf-8', errors='replace')
+        records = good = 0
+        try:
+            for _ in csv.reader(lines(), strict=True):  # strict: a quoted field cut off at EOF is an error
+                if not ended:
+                    break
+                records += 1
+                good = consumed
+        except csv.Error:
+            pass
+        return max(0, records - 1), good
+
+
+class _Writer:
+    def __init__(self, fh, fmt: str, fieldnames: List[str], header: bool):
+        self.fh = fh
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(fh, fieldnames=fieldnames, extrasaction='ignore')
+            if header:
+                self.csv.writeheader()
+
+    def write(self, row: dict):
+        if self.fmt == 'csv':
+            self.csv.writerow(row)
+        else:
+            self.fh.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+def _parse_args(argv=None):
+    p = argparse.ArgumentParser(description='Score a CSV/XLSX/NDJSON file offline, without the web server.')
+    p.add_argument('input', help="input file, or '-' for stdin")
+    p.add_argument('-o', '--output', default='-', help="output file (default: stdout)")
+    p.add_argument('--format', choices=FORMATS, help='input format (default: from the extension, else csv)')
+    p.add_argument('--output-format', choices=('csv', 'ndjson'), help='default: ndjson for ndjson input, else csv')
+    p.add_argument('--col', default=None, help="text column (default: 'text', then message/content/body/...)")
+    p.add_argument('--model', default=None, help='registered model name (default: the app default)')
+    p.add_argument('--detect-lang', action='store_true', help='add a lang column')
+    p.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='scoring processes (1 = in-process)')
+    p.add_argument('--chunk-size', type=int, default=2000, help='rows per scoring task')
+    p.add_argument('--start-row', type=int, default=0, help='skip this many data rows first')
+    p.add_argument('--resume', action='store_true', help='also skip the complete rows already in --output (on top of --start-row) and append after them')
+    p.add_argument('--progress-every', type=float, default=5.0, help='seconds between progress lines (0 = off)')
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    app = _load_app()
+    model = app.MODELS.resolve(args.model) if args.model else app.MODELS.default
+    if model is None:
+        print(f'unknown or unavailable model {args.model!r}; choose from {app.MODELS.names()}', file=sys.stderr)
+        return 2
+    fmt = detect_format(args.input, args.format)
+    out_fmt = args.output_format or ('ndjson' if fmt == 'ndjson' else 'csv')
+    start_row = args.start_row
+    if args.resume:
+        if args.output == '-':
+            print('--resume needs --output', file=sys.stderr)
+            return 2
+        done_rows, size = _complete_prefix(args.output, out_fmt)
+        start_row += done_rows  # the output began at --start-row, not at the first input row
+        if os.path.exists(args.output) and os.path.getsize(args.output) > size:
+            # drop the half-written record a crash left behind before appending after it
+            os.truncate(args.output, size)
+
+    fieldnames, rows = read_rows(args.input, fmt)
+    column = app.choose_text_column(fieldnames, args.col)
+    if column is None and app.header_is_data(fieldnames):
+        # header-less single-column file: its first line is a text row, as in /analyze_csv
+        orig = fieldnames[0]
+        rows = itertools.chain([{'text': orig}], ({'text': r.get(orig, '')} for r in rows))
+        fieldnames, column = ['text'], 'text'
+    if column is None:
+        print(f'no text column among {fieldnames}; expected one of {list(app.TEXT_COLUMN_SYNONYMS)} or --col',
+              file=sys.stderr)
+        return 2
+    rows = itertools.islice(rows, start_row, None)
+    out_fields = list(fieldnames) + [f for f in SCORE_FIELDS if f not in fieldnames]
+    if args.detect_lang and 'lang' not in out_fields:
+        out_fields.append('lang')
+
+    appending = (start_row > 0 or args.resume) and args.output != '-' and os.path.exists(args.output) \
+        and os.path.getsize(args.output) > 0
+    out_fh = sys.stdout if args.output == '-' else open(args.output, 'a' if appending else 'w', encoding='utf-8', newline='')
+    writer = _Writer(out_fh, out_fmt, out_fields, header=not appending)
+
+    jobs = max(1, args.jobs)
+    pool = None
+    if jobs > 1:
+        app.MODELS.warm([model])  # load before forking so workers share it
+        if args.detect_lang:
+            app.lazy('langdetect')
+        methods = multiprocessing.get_all_start_methods()
+        pool = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn').Pool(jobs)
+
+    t0 = last = time.perf_counter()
+    done = 0
+    pending: deque = deque()
+
+    def drain(block_until: int):
+        nonlocal done, last
+        while len(pending) > block_until:
+            chunk, result = pending.popleft()
+            scored = result.get() if pool is not None else result
+            for row, (label, scores, lang) in zip(chunk, scored):
+                out = {**row, 'label': label, 'pos': scores['pos'], 'neu': scores['neu'],
+                       'neg': scores['neg'], 'compound': scores['compound']}
+                if args.detect_lang:
+                    out['lang'] = lang
+                writer.write(out)
+            out_fh.flush()  # a crash loses at most the chunk being written
+            done += len(chunk)
+            now = time.perf_counter()
+            if args.progress_every and now - last >= args.progress_every:
+                last = now
+                print(f'rows={start_row + done} scored={done} rate={done / (now - t0):.0f} rows/s',
+                      file=sys.stderr, flush=True)
+
+    try:
+        for chunk in _chunks(rows, max(1, args.chunk_size)):
+            task = ([_as_text(r.get(column)) for r in chunk], model, args.detect_lang)
+            pending.append((chunk, pool.apply_async(score_chunk, (task,)) if pool is not None else score_chunk(task)))
+            drain(jobs * 2 if pool is not None else 0)  # bounded in-flight chunks keep memory flat
+        drain(0)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        out_fh.flush()
+        if out_fh is not sys.stdout:
+            out_fh.close()
+
+    seconds = time.perf_counter() - t0
+    print(json.dumps({'rows': done, 'start_row': start_row, 'next_row': start_row + done, 'column': column,
+                      'model': model, 'jobs': jobs, 'seconds': round(seconds, 3),
+                      'rows_per_second': round(done / seconds, 1) if seconds else None}), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""Reproducible benchmarks for the scoring pipeline and HTTP endpoints.
+
+    python benchmarks/bench.py                          # quick profile, prints JSON
+    python benchmarks/bench.py --profile full -o bench.json
+    python benchmarks/bench.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench.py --compare benchmarks/baseline.json --threshold 0.15
+
+Corpora are synthetic and seeded, so runs are comparable across machines and commits. Each
+case reports min/mean/p50/p95 wall time in ms; --compare exits with status 1 if any case's p50
+is more than --threshold (fraction) slower than the baseline. Endpoints are driven through the
+Flask test client against a temporary database with rate limits disabled.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+POSITIVE = ['great', 'love', 'excellent', 'happy', 'awesome', 'wonderful', 'fantastic', 'delightful', 'good', 'amazing']
+NEGATIVE = ['bad', 'sad', 'angry', 'terrible', 'hate', 'awful', 'broken', 'disappointing', 'slow', 'rude']
+NEUTRAL = ['the', 'product', 'delivery', 'service', 'package', 'team', 'price', 'order', 'store', 'app', 'was', 'is',
+           'and', 'it', 'with', 'today', 'after', 'update', 'support', 'quality', 'screen', 'battery', 'staff', 'room']
+
+PROFILES = {
+    # name: (iterations per text case, csv row counts, document pages)
+    'quick': (5, [200], 3),
+    'full': (20, [10_000, 100_000, 1_000_000], 20),
+}
+
+
+def _sentence(rng: random.Random, n_words: int) -> str:
+    words = []
+    for _ in range(n_words):
+        r = rng.random()
+        pool = POSITIVE if r < 0.15 else NEGATIVE if r < 0.3 else NEUTRAL
+        words.append(rng.choice(pool))
+    return ' '.join(words).capitalize() + rng.choice(['.', '!', '?'])
+
+
+def make_corpus(kind: str, n: int, seed: int = 1234) -> list:
+    """Deterministic synthetic texts: 'tweet' (~15 words), 'review' (~150), 'document' (n pages of ~500)."""
+    rng = random.Random(f'{kind}-{seed}')
+    if kind == 'tweet':
+        return [_sentence(rng, rng.randint(8, 20)) for _ in range(n)]
+    if kind == 'review':
+        return [' '.join(_sentence(rng, rng.randint(10, 20)) for _ in range(10)) for _ in range(n)]
+    if kind == 'document':
+        return ['\n\n'.join(' '.join(_sentence(rng, 15) for _ in range(33)) for _ in range(n))]
+    raise ValueError(kind)
+
+
+def make_csv(rows: int, seed: int = 1234) -> bytes:
+    rng = random.Random(f'csv-{seed}')
+    out = io.StringIO()
+    w = csv.writer(out)
+    w.writerow(['id', 'text'])
+    for i in range(rows):
+        w.writerow([i, _sentence(rng, rng.randint(6, 18))])
+    return out.getvalue().encode('utf-8')
+
+
+def make_pdf(pages: int, seed: int = 1234) -> bytes:
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    rng = random.Random(f'pdf-{seed}')
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=letter)
+    for _ in range(pages):
+        t = c.beginText(72, 720)
+        for _ in range(40):
+            t.textLine(_sentence(rng, 12))
+        c.drawText(t)
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def _summarize(samples: list) -> dict:
+    s = sorted(samples)
+    pick = lambda q: s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
+    return {
+        'n': len(s),
+        'min_ms': round(s[0] * 1000, 3),
+        'mean_ms': round(sum(s) / len(s) * 1000, 3),
+        'p50_ms': round(pick(0.5) * 1000, 3),
+        'p95_ms': round(pick(0.95) * 1000, 3),
+    }
+
+
+def timeit(fn, iterations: int) -> dict:
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return _summarize(samples)
+
+
+def run(profile: str = 'quick', only=None) -> dict:
+    iterations, csv_sizes, doc_pages = PROFILES[profile]
+    tmp = tempfile.mkdtemp(prefix='sentiment-bench-')
+    os.environ.setdefault('API_DOCS', '0')
+    import app as app_module
+    app_module.DB_PATH = os.path.join(tmp, 'bench.db')
+    app_module.ARCHIVE_DIR = os.path.join(tmp, 'archive')
+    app_module.app.config['SLOW_REQUEST_MS'] = 0
+    app_module.limiter.enabled = False
+
+    results = {}
+    t0 = time.perf_counter()
+    results['startup.warm_up'] = {'seconds': {k: round(v or 0.0, 4) for k, v in app_module.warm_up().items()},
+                                  'total_ms': round((time.perf_counter() - t0) * 1000, 3)}
+
+    def case(name, fn, n=iterations, warm=True):
+        if only and not any(name.startswith(o) for o in only):
+            return
+        if warm:
+            fn()  # warm-up call, not measured
+        results[name] = timeit(fn, n)
+        print(f'{name:40s} p50={results[name]["p50_ms"]:>10.3f} ms', file=sys.stderr)
+
+    corpora = {
+        'tweet': make_corpus('tweet', 1)[0],
+        'review': make_corpus('review', 1)[0],
+        'document': make_corpus('document', doc_pages)[0],
+    }
+    vader = app_module._model_vader()
+    for kind, text in corpora.items():
+        case(f'stage.langdetect.{kind}', lambda t=text: app_module._detect_language(t))
+        case(f'stage.vader.{kind}', lambda t=text: vader.polarity_scores(t))
+        case(f'stage.keywords.{kind}', lambda t=text: app_module._extract_keywords(t))
+        case(f'stage.wordcloud.{kind}', lambda t=text: app_module._wordcloud_b64(t))
+        case(f'analyze_text.{kind}', lambda t=text: app_module.analyze_text(t))
+
+    # Per-worker load cost: parsing the packages' files vs mapping the compiled tables
+    from langdetect.detector_factory import DetectorFactory, PROFILES_DIRECTORY
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    import mapped_tables
+    mapped_tables.build(app_module.LEXICON_DIR)
+    case('lexicon.load.vader.parsed', SentimentIntensityAnalyzer, n=max(3, iterations // 10))
+    case('lexicon.load.vader.mapped', lambda: mapped_tables.MappedBundle(
+        mapped_tables.resource_path(app_module.LEXICON_DIR, 'vader')), n=max(3, iterations // 10))
+    case('lexicon.load.langdetect.parsed', lambda: DetectorFactory().load_profile(PROFILES_DIRECTORY), n=3, warm=False)
+    case('lexicon.load.langdetect.mapped', lambda: mapped_tables.MappedBundle(
+        mapped_tables.resource_path(app_module.LEXICON_DIR, 'langdetect')), n=3, warm=False)
+
+    if not app_module.MODELS.resolve('linear'):
+        # No trained artifact: distil a throwaway one from VADER labels so the model is comparable
+        from hashing_model import train
+        texts = make_corpus('tweet', 5000, seed=99)
+        labels = [{'Negative': 0, 'Neutral': 1, 'Positive': 2}[app_module._label_for_compound(vader.polarity_scores(t)['compound'])]
+                  for t in texts]
+        app_module.LINEAR_MODEL_PATH = os.path.join(tmp, 'linear.npz')
+        train(texts, labels, epochs=3).save(app_module.LINEAR_MODEL_PATH)
+    bulk = make_corpus('tweet', 1000)
+    case('keywords.corpus.200', lambda: app_module.KEYWORDS.corpus_keywords(bulk[:200], 'en'))
+    for name in app_module.MODELS.names():
+        if app_module.MODELS.resolve(name):
+            case(f'model.score_batch.{name}.1000', lambda m=name: app_module.MODELS.score_batch(m, bulk))
+
+    client = app_module.app.test_client()
+    for kind, text in corpora.items():
+        case(f'http.analyze.{kind}', lambda t=text: client.post('/analyze', json={'text': t}))
+    case('http.export_pdf.review', lambda: client.post('/export_pdf', json={'text': corpora['review']}))
+
+    doc_txt = corpora['document'].encode('utf-8')
+    case('http.analyze_file.txt', lambda: client.post(
+        '/analyze_file', data={'file': (io.BytesIO(doc_txt), 'doc.txt')}, content_type='multipart/form-data'))
+    pdf = make_pdf(doc_pages)
+    case('http.analyze_file.pdf', lambda: client.post(
+        '/analyze_file', data={'file': (io.BytesIO(pdf), 'doc.pdf')}, content_type='multipart/form-data'))
+
+    for rows in csv_sizes:
+        payload = make_csv(rows)
+        case(f'http.analyze_csv.{rows}', lambda p=payload: client.post(
+            '/analyze_csv', data={'file': (io.BytesIO(p), 'rows.csv')}, content_type='multipart/form-data'), n=1, warm=False)
+
+    # Response compression: CPU cost vs bytes saved per encoding/level
+    import compression
+    payloads = {
+        'analyze_json': client.post('/analyze', json={'text': corpora['review']}).get_data(),
+        'csv': make_csv(2000),
+    }
+    settings = [('gzip', 1), ('gzip', 6), ('gzip', 9)]
+    if compression.brotli is not None:
+        settings += [('br', 1), ('br', 4), ('br', 11)]
+    for label, payload in payloads.items():
+        for encoding, level in settings:
+            name = f'compress.{label}.{encoding}{level}'
+            case(name, lambda p=payload, e=encoding, l=level: compression.compress_bytes(p, e, level=l, br_quality=l))
+            if name in results:
+                out = len(compression.compress_bytes(payload, encoding, level=level, br_quality=level))
+                results[name].update(bytes_in=len(payload), bytes_out=out, ratio=round(out / len(payload), 4))
+
+    case('db.get_history.100', lambda: app_module.get_history(limit=100))
+    case('db.get_history.100.user', lambda: app_module.get_history(limit=100, user_id=1))
+
+    return {
+        'meta': {
+            'profile': profile,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'git_rev': _git_rev(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'results': results,
+    }
+
+
+def _git_rev():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.10, metric: str = 'p50_ms') -> list:
+    """Return regressions as (case, baseline_ms, current_ms, ratio) for cases slower than 1+threshold."""
+    regressions = []
+    for name, base in (baseline.get('results') or {}).items():
+        cur = (current.get('results') or {}).get(name)
+        if not cur or metric not in base or metric not in cur or not base[metric]:
+            continue
+        ratio = cur[metric] / base[metric]
+        if ratio > 1.0 + threshold:
+            regressions.append((name, base[metric], cur[metric], round(ratio, 3)))
+    return regressions
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument('--profile', choices=sorted(PROFILES), default='quick')
+    p.add_argument('--only', action='append', help='run only cases with this name prefix (repeatable)')
+    p.add_argument('-o', '--output', help='write results JSON here (default: stdout)')
+    p.add_argument('--save-baseline', metavar='PATH', help='also write results as the new baseline')
+    p.add_argument('--compare', metavar='BASELINE', help='compare against a stored baseline JSON')
+    p.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown fraction (default 0.10)')
+    args = p.parse_args(argv)
+
+    report = run(args.profile, only=args.only)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            fh.write(text + '\n')
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as fh:
+            fh.write(text + '\n')
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as fh:
+            baseline = json.load(fh)
+        regressions = compare(report, baseline, threshold=args.threshold)
+        for name, base, cur, ratio in regressions:
+            print(f'REGRESSION {name}: {base:.3f} ms -> {cur:.3f} ms (x{ratio})', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
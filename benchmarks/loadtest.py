@@ -0,0 +1,271 @@
+"""Closed-loop load generator for a locally running instance.
+
+    python run_server.py --workers 4 &                      # or let --spawn start it
+    python benchmarks/loadtest.py --concurrency 16 --duration 30 --mix analyze=0.8,chat=0.2
+    python benchmarks/loadtest.py --spawn --workers 4 --no-ratelimit --traffic requests.jsonl --target-p99 500
+
+Traffic is a JSONL file. Lines with a ``path`` are replayed as recorded::
+
+    {"method": "POST", "path": "/analyze", "json": {"text": "great"}}
+
+Any other line contributes its text (``text``, ``message``, ``body`` or ``title``) to the
+--mix endpoints, so the backlog-style ``requests.jsonl`` works as a corpus. Without --traffic
+a seeded synthetic corpus is used. Each worker keeps one keep-alive connection and sends the
+next request as soon as the previous one returns.
+
+Reports throughput plus p50/p95/p99 latency, errors and 429s overall and per endpoint. Only
+loopback targets are accepted.
+"""
+import argparse
+import http.client
+import ipaddress
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+ENDPOINT_FIELDS = {'analyze': ('/analyze', 'text'), 'chat': ('/chat', 'message')}
+TEXT_KEYS = ('text', 'message', 'body', 'title')
+
+
+def is_loopback(url: str) -> bool:
+    host = urlsplit(url).hostname or ''
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in (spec or '').split(','):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINT_FIELDS:
+            raise ValueError(f'unknown endpoint in mix: {name!r} (choose from {", ".join(ENDPOINT_FIELDS)})')
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError('mix needs at least one positive weight')
+    return mix
+
+
+def load_traffic(lines, mix: dict, seed: int = 1234) -> list:
+    """Turn JSONL lines into (method, path, body_bytes) tuples."""
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    out = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        rec = json.loads(line)
+        if rec.get('path'):
+            body = rec.get('json')
+            out.append((rec.get('method', 'POST' if body is not None else 'GET').upper(), rec['path'],
+                        json.dumps(body).encode('utf-8') if body is not None else None))
+            continue
+        text = next((rec[k] for k in TEXT_KEYS if isinstance(rec.get(k), str) and rec[k].strip()), None)
+        if text is None:
+            continue
+        path, field = ENDPOINT_FIELDS[rng.choices(names, weights)[0]]
+        out.append(('POST', path, json.dumps({field: text}).encode('utf-8')))
+    return out
+
+
+def synthetic_traffic(mix: dict, n: int = 500, seed: int = 1234) -> list:
+    from benchmarks.bench import make_corpus
+    return load_traffic((json.dumps({'text': t}) for t in make_corpus('tweet', n, seed)), mix, seed)
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def _summarize(samples: list, elapsed: float) -> dict:
+    lat = sorted(s[1] for s in samples)
+    statuses = [s[0] for s in samples]
+    limited = sum(1 for st in statuses if st == 429)
+    errors = sum(1 for st in statuses if st == 0 or (st >= 400 and st != 429))
+    return {
+        'requests': len(samples),
+        'rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(lat, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(lat, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(lat, 0.99) * 1000, 2),
+        'max_ms': round(lat[-1] * 1000, 2) if lat else 0.0,
+        'errors': errors,
+        'rate_limited': limited,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+    }
+
+
+def run_load(url: str, traffic: list, concurrency: int = 8, duration: float = 10.0,
+             max_requests: int = 0, timeout: float = 30.0) -> dict:
+    if not is_loopback(url):
+        raise ValueError(f'refusing non-loopback target {url!r}')
+    if not traffic:
+        raise ValueError('no traffic to replay')
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    base = parts.path.rstrip('/')
+
+    feed = itertools.cycle(traffic)
+    feed_lock = threading.Lock()
+    sent = itertools.count()
+    samples = []  # (status, seconds, path); status 0 = connection/protocol error
+    samples_lock = threading.Lock()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def worker():
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        local = []
+        while True:
+            if deadline and time.perf_counter() >= deadline:
+                break
+            if max_requests and next(sent) >= max_requests:
+                break
+            with feed_lock:
+                method, path, body = next(feed)
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            t0 = time.perf_counter()
+            try:
+                conn.request(method, base + path, body=body, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                status = resp.status
+            except (OSError, http.client.HTTPException):
+                status = 0
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=timeout)
+            local.append((status, time.perf_counter() - t0, path))
+        conn.close()
+        with samples_lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, concurrency))]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    by_path = {}
+    for s in samples:
+        by_path.setdefault(s[2], []).append(s)
+    return {
+        'target': url,
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 3),
+        'total': _summarize(samples, elapsed),
+        'endpoints': {p: _summarize(v, elapsed) for p, v in sorted(by_path.items())},
+        'status_counts': {str(k): v for k, v in sorted(_count(s[0] for s in samples).items())},
+    }
+
+
+def _count(values) -> dict:
+    out = {}
+    for v in values:
+        out[v] = out.get(v, 0) + 1
+    return out
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def spawn_server(workers: int, threads: int, ratelimit: bool, wait: float = 60.0):
+    """Start run_server.py on a free loopback port and wait for /health. Returns (proc, url)."""
+    port = _free_port()
+    env = dict(os.environ, API_DOCS=os.environ.get('API_DOCS', '0'))
+    if not ratelimit:
+        env['RATELIMIT_ENABLED'] = '0'
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT_DIR, 'run_server.py'), '--bind', f'127.0.0.1:{port}',
+                             '--workers', str(workers), '--threads', str(threads)],
+                            cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    end = time.monotonic() + wait
+    while time.monotonic() < end:
+        if proc.poll() is not None:
+            raise RuntimeError(f'server exited with status {proc.returncode}')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return proc, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError('server did not become healthy in time')
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument('--url', default='http://127.0.0.1:5000', help='loopback base URL of a running instance')
+    p.add_argument('--traffic', help='JSONL file to replay (default: synthetic tweets)')
+    p.add_argument('--mix', default='analyze=0.8,chat=0.2', help='endpoint weights for text-only traffic lines')
+    p.add_argument('-c', '--concurrency', type=int, default=8)
+    p.add_argument('-d', '--duration', type=float, default=10.0, help='seconds to run (0 = until --requests)')
+    p.add_argument('-n', '--requests', type=int, default=0, help='stop after this many requests')
+    p.add_argument('--target-p99', type=float, help='exit 1 if overall p99 (ms) exceeds this')
+    p.add_argument('--spawn', action='store_true', help='start run_server.py on a free loopback port for the run')
+    p.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='with --spawn')
+    p.add_argument('--threads', type=int, default=4, help='with --spawn')
+    p.add_argument('--no-ratelimit', action='store_true', help='with --spawn: start the server with RATELIMIT_ENABLED=0')
+    p.add_argument('-o', '--output', help='write the JSON report here (default: stdout)')
+    args = p.parse_args(argv)
+    if not args.duration and not args.requests:
+        p.error('set --duration and/or --requests')
+
+    mix = parse_mix(args.mix)
+    if args.traffic:
+        with open(args.traffic, encoding='utf-8') as fh:
+            traffic = load_traffic(fh, mix)
+    else:
+        traffic = synthetic_traffic(mix)
+
+    proc, url = None, args.url
+    if args.spawn:
+        proc, url = spawn_server(args.workers, args.threads, ratelimit=not args.no_ratelimit)
+    try:
+        report = run_load(url, traffic, concurrency=args.concurrency, duration=args.duration,
+                          max_requests=args.requests)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            fh.write(text + '\n')
+    else:
+        print(text)
+    t = report['total']
+    print(f"{t['requests']} requests, {t['rps']} req/s, p50={t['p50_ms']} p95={t['p95_ms']} p99={t['p99_ms']} ms, "
+          f"errors={t['errors']} 429={t['rate_limited']}", file=sys.stderr)
+    if args.target_p99 is not None and t['p99_ms'] > args.target_p99:
+        print(f'p99 {t["p99_ms"]} ms exceeds target {args.target_p99} ms', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""Accept-Encoding negotiated gzip/brotli compression for dynamic responses.
+
+``install_compression(app, ...)`` adds an after_request hook that compresses a response when
+
+  * the client accepts ``br`` or ``gzip`` (brotli preferred when the package is installed),
+  * its mimetype has a rule (see DEFAULT_RULES; a per-type level of 0 disables it),
+  * the body is at least ``min_bytes``, or the response is streamed,
+  * and it is not already encoded, a file passthrough, a partial/empty response or marked
+    ``Cache-Control: no-transform``.
+
+Streamed responses are compressed chunk by chunk with a sync flush after each chunk, so rows
+still reach the client as they are produced. Compressed responses get ``Vary: Accept-Encoding``
+and a weak ETag (the bytes differ per encoding, the representation does not).
+"""
+import time
+import zlib
+from typing import Dict, Optional
+
+try:  # optional: only gzip is offered when the package is missing
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# mimetype -> gzip level (None = use the default level, 0 = never compress)
+DEFAULT_RULES: Dict[str, Optional[int]] = {
+    'application/json': None,
+    'text/csv': None,
+    'text/html': None,
+    'text/plain': None,
+    'text/css': None,
+    'text/javascript': None,
+    'application/javascript': None,
+    'image/svg+xml': None,
+}
+DEFAULT_MIN_BYTES = 1024
+DEFAULT_LEVEL = 6
+DEFAULT_BR_QUALITY = 4
+_SKIP_STATUS = {204, 206, 304}
+
+
+def parse_rules(spec: Optional[str]) -> Dict[str, Optional[int]]:
+    """'application/json,text/csv=9,text/html=0' -> {mimetype: level or None}."""
+    if not spec:
+        return dict(DEFAULT_RULES)
+    rules = {}
+    for part in spec.split(','):
+        mimetype, _, level = part.strip().partition('=')
+        if mimetype:
+            rules[mimetype.strip().lower()] = int(level) if level.strip() else None
+    return rules
+
+
+def _accepts(header: Optional[str]) -> set:
+    accepted = set()
+    for part in (header or '').lower().split(','):
+        token, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            k, _, v = param.strip().partition('=')
+            if k == 'q':
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        if token and q > 0:
+            accepted.add(token.strip())
+    return accepted
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    accepted = _accepts(accept_encoding)
+    if brotli is not None and ('br' in accepted or '*' in accepted):
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compressor(encoding: str, level: int, br_quality: int):
+    """Return (compress(chunk) -> bytes, flush() -> bytes, finish() -> bytes)."""
+    if encoding == 'br':
+        c = brotli.Compressor(quality=br_quality)
+        return c.process, c.flush, c.finish
+    c = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    return c.compress, lambda: c.flush(zlib.Z_SYNC_FLUSH), c.flush
+
+
+def compress_bytes(data: bytes, encoding: str, level: int = DEFAULT_LEVEL, br_quality: int = DEFAULT_BR_QUALITY) -> bytes:
+    compress, _, finish = compressor(encoding, level, br_quality)
+    return compress(data) + finish()
+
+
+def install_compression(app, min_bytes: int = DEFAULT_MIN_BYTES, level: int = DEFAULT_LEVEL,
+                        br_quality: int = DEFAULT_BR_QUALITY, rules=None, metrics=None) -> bool:
+    """Register the compression hook. Returns False (and does nothing) when level is 0."""
+    if level <= 0:
+        return False
+    rules = DEFAULT_RULES if rules is None else rules
+    from flask import request
+
+    if metrics is not None:
+        metrics.describe('sentiment_compression_bytes_total', 'counter',
+                         'Response bytes before (in) and after (out) compression by encoding.')
+        metrics.describe('sentiment_compression_seconds', 'histogram', 'CPU time spent compressing responses.')
+
+    def _account(encoding, raw, out, seconds):
+        if metrics is not None:
+            metrics.inc('sentiment_compression_bytes_total', raw, encoding=encoding, direction='in')
+            metrics.inc('sentiment_compression_bytes_total', out, encoding=encoding, direction='out')
+            metrics.observe('sentiment_compression_seconds', seconds, encoding=encoding)
+
+    def _stream(chunks, encoding, type_level):
+        compress, flush, finish = compressor(encoding, type_level, br_quality)
+        raw = out = 0
+        seconds = 0.0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                t0 = time.perf_counter()
+                data = compress(chunk) + flush()
+                seconds += time.perf_counter() - t0
+                raw += len(chunk)
+                out += len(data)
+                if data:
+                    yield data
+            tail = finish()
+            out += len(tail)
+            if tail:
+                yield tail
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            _account(encoding, raw, out, seconds)
+
+    @app.after_request
+    def _compress_response(resp):
+        if resp.status_code < 200 or resp.status_code in _SKIP_STATUS or request.method == 'HEAD':
+            return resp
+        if resp.direct_passthrough or 'Content-Encoding' in resp.headers or 'Content-Range' in resp.headers:
+            return resp
+        mimetype = (resp.mimetype or '').lower()
+        if mimetype not in rules:
+            return resp
+        type_level = rules[mimetype]
+        type_level = level if type_level is None else type_level
+        if type_level <= 0 or 'no-transform' in (resp.headers.get('Cache-Control') or ''):
+            return resp
+        resp.vary.add('Accept-Encoding')
+        encoding = negotiate(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return resp
+
+        if resp.is_streamed:
+            resp.response = _stream(resp.response, encoding, type_level)
+            resp.headers.pop('Content-Length', None)
+        else:
+            data = resp.get_data()
+            if len(data) < min_bytes:
+                return resp
+            t0 = time.perf_counter()
+            body = compress_bytes(data, encoding, type_level, br_quality)
+            _account(encoding, len(data), len(body), time.perf_counter() - t0)
+            if len(body) >= len(data):
+                return resp
+            resp.set_data(body)
+        resp.headers['Content-Encoding'] = encoding
+        etag, weak = resp.get_etag()
+        if etag and not weak:
+            resp.set_etag(etag, weak=True)
+        return resp
+
+    return True
@@ -0,0 +1,68 @@
+"""A text tokenized once and shared by every analysis stage.
+
+``Document(text)`` holds the original text, its lowercase form, the word tokens (lowercase),
+each token's ``(start, end)`` offsets into the original text and an ASCII flag. Language
+detection heuristics, the rule model, chat intent scans and the word cloud all read these
+fields instead of lowercasing and splitting the text themselves; VADER, YAKE and langdetect
+still take ``doc.text`` since they tokenize internally.
+
+Tokens use the word pattern WordCloud uses (``\\w[\\w']*``), so its frequency counts can be
+built from the document without another regex pass over the text.
+"""
+import re
+from array import array
+from typing import List
+
+_WORD_RE = re.compile(r"\w[\w']*")
+
+
+class Document:
+    __slots__ = ('text', 'lower', 'tokens', 'offsets', 'is_ascii', '_token_set')
+
+    def __init__(self, text: str):
+        text = text or ''
+        self.text = text
+        self.lower = text.lower()
+        self.is_ascii = text.isascii()
+        # lower() keeps offsets aligned except for a few non-ASCII characters (e.g. 'İ')
+        aligned = len(self.lower) == len(text)
+        source = self.lower if aligned else text
+        tokens = []
+        offsets = array('I')
+        for m in _WORD_RE.finditer(source):
+            start, end = m.span()
+            tokens.append(m.group() if aligned else m.group().lower())
+            offsets.append(start)
+            offsets.append(end)
+        self.tokens: List[str] = tokens
+        self.offsets = offsets  # flat start/end pairs: token i spans offsets[2i]:offsets[2i+1]
+        self._token_set = None
+
+    @classmethod
+    def of(cls, text) -> 'Document':
+        """`text` itself if it is already a Document, else a new one."""
+        return text if isinstance(text, cls) else cls(text)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def __bool__(self) -> bool:
+        return bool(self.text)
+
+    def __repr__(self) -> str:
+        return f'Document({len(self.text)} chars, {len(self.tokens)} tokens)'
+
+    @property
+    def token_set(self) -> frozenset:
+        if self._token_set is None:
+            self._token_set = frozenset(self.tokens)
+        return self._token_set
+
+    def span(self, i: int) -> str:
+        """Token `i` as written in the original text (case preserved)."""
+        return self.text[self.offsets[2 * i]:self.offsets[2 * i + 1]]
+
+    def words(self, min_length: int = 1) -> List[str]:
+        """Original-case tokens of at least `min_length` characters, in order."""
+        off, text = self.offsets, self.text
+        return [text[off[2 * i]:off[2 * i + 1]] for i, t in enumerate(self.tokens) if len(t) >= min_length]
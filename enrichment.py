@@ -0,0 +1,230 @@
+"""Run independent analysis stages concurrently on a shared, bounded thread pool.
+
+``analyze_text`` needs language detection, keywords and a word cloud in addition to the score,
+and apart from keywords needing the language they only depend on the text.
+``EnrichmentExecutor.run`` submits the optional stages
+to a process-wide pool, runs the required one (scoring) in the calling thread meanwhile, then
+collects what finished within each stage's timeout. WordCloud/PIL rendering and NumPy release
+the GIL for much of their time, so the stages overlap rather than queue behind each other.
+
+A stage that overruns its timeout (measured from submission, so time spent queued behind other
+requests counts) is cancelled if it has not started and reported in ``dropped``; the caller
+leaves it out of the response instead of stalling. Timeouts are per stage::
+
+    ENRICH_TIMEOUT_MS='wordcloud=800,keywords=500,*=2000'
+
+A stage that has already started cannot be stopped, so an overrun keeps its pool thread until
+it finishes. Background work is bounded instead: pool threads count as busy until their stage
+(and any chained stage) really finishes, and stages that find no free thread run inline in
+the calling thread, within their budget, rather than queueing behind overruns. A stage is
+dropped up front only while ``max_overruns`` of its earlier runs are still overrunning, so
+one slow input does not turn the stage off for everyone, but abandoned runs cannot pile up. ``StageResults.pending`` lists a run's overruns that are still going.
+
+A stage that needs another stage's result (keywords need the detected language) is passed in
+``after`` as ``{name: (parent, fn(parent_value))}``; it runs in the parent's worker thread as
+soon as the parent finishes, and its budget still counts from the original submission.
+
+A caller with an overall request deadline (see admission.py) passes it as ``deadline``; no
+stage is waited for past it, whatever its own timeout.
+
+``max_workers=0`` runs every stage inline, one after another, with no timeouts; stages not yet
+started when ``deadline`` passes are dropped.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_WORKERS = 4
+DEFAULT_TIMEOUT_MS = 2000
+DEFAULT_MAX_OVERRUNS = 2
+
+
+def parse_timeouts(spec: Optional[str]) -> Dict[str, float]:
+    """'wordcloud=800,*=2000' -> {stage: seconds}; '*' is the default for unlisted stages."""
+    timeouts = {'*': DEFAULT_TIMEOUT_MS / 1000.0}
+    for part in (spec or '').split(','):
+        name, _, ms = part.strip().partition('=')
+        if name and ms.strip():
+            timeouts[name.strip()] = float(ms) / 1000.0
+    return timeouts
+
+
+class StageResults:
+    """Outcome of one ``run``: stage values, per-stage seconds and the names that were dropped."""
+
+    def __init__(self):
+        self.values: Dict[str, Any] = {}
+        self.seconds: Dict[str, float] = {}
+        self.dropped: List[str] = []
+        self.inline: Any = None
+        self.pending: List[Future] = []  # overran and still running
+
+
+class EnrichmentExecutor:
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, timeouts: Optional[Dict[str, float]] = None,
+                 max_overruns: int = DEFAULT_MAX_OVERRUNS, metrics=None):
+        self.max_workers = max(0, int(max_workers))
+        self.timeouts = timeouts or parse_timeouts(None)
+        self.max_overruns = max(1, int(max_overruns))  # abandoned runs per stage before it is skipped
+        self.metrics = metrics
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._busy = 0  # pool tasks (with their chained stages) not finished yet
+        self._overrunning: Dict[str, int] = {}  # stage -> abandoned runs still going
+        if hasattr(os, 'register_at_fork'):
+            # a forked worker inherits the pool object but not its threads
+            os.register_at_fork(after_in_child=self._reset)
+        if metrics is not None:
+            metrics.describe('sentiment_enrichment_dropped_total', 'counter',
+                             'Enrichment stages left out of a response because they overran their timeout.')
+            metrics.describe('sentiment_enrichment_inline_total', 'counter',
+                             'Enrichment stages run in the request thread because the pool was busy.')
+
+    def _reset(self):
+        self._pool = None
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._overrunning = {}
+
+    def busy(self) -> int:
+        with self._lock:
+            return self._busy
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='enrich')
+        return self._pool
+
+    def timeout(self, name: str) -> float:
+        return self.timeouts.get(name, self.timeouts.get('*', DEFAULT_TIMEOUT_MS / 1000.0))
+
+    @staticmethod
+    def _timed(fn: Callable[[], Any]):
+        t0 = time.perf_counter()
+        value = fn()
+        return value, time.perf_counter() - t0
+
+    def _chain(self, parent: Future, fn: Callable[[Any], Any]) -> Future:
+        """Future for fn(parent's value), run in the thread that completes `parent`."""
+        child: Future = Future()
+
+        def go(done: Future):
+            if not child.set_running_or_notify_cancel():
+                return  # dropped before the parent finished
+            try:
+                value, _ = done.result()
+                child.set_result(self._timed(lambda: fn(value)))
+            except BaseException as exc:
+                child.set_exception(exc)
+
+        parent.add_done_callback(go)
+        return child
+
+    def run(self, stages: Dict[str, Callable[[], Any]], inline: Optional[Callable[[], Any]] = None,
+            after: Optional[Dict[str, Tuple[str, Callable[[Any], Any]]]] = None,
+            deadline: Optional[float] = None) -> StageResults:
+        """Run `stages` ({name: zero-arg fn}) on the pool and `inline()` in this thread.
+
+        `deadline` is an optional time.monotonic() value capping every stage's wait.
+        Exceptions raised by a stage propagate to the caller, as they would sequentially.
+        """
+        out = StageResults()
+        after = after or {}
+        if self.max_workers == 0:
+            if inline is not None:
+                out.inline = inline()
+            late = lambda: deadline is not None and time.monotonic() >= deadline  # noqa: E731
+            for name, fn in stages.items():
+                if late():
+                    self._drop(out, name)
+                else:
+                    out.values[name], out.seconds[name] = self._timed(fn)
+            for name, (parent, fn) in after.items():
+                if late() or parent not in out.values:
+                    self._drop(out, name)
+                else:
+                    out.values[name], out.seconds[name] = self._timed(lambda: fn(out.values[parent]))
+            return out
+
+        pool = self._executor()
+        submitted = time.monotonic()
+        pooled, local = [], []
+        with self._lock:
+            for name in stages:
+                if self._overrunning.get(name, 0) >= self.max_overruns:
+                    self._drop(out, name)  # enough of its runs are still going; another would pile up
+                elif self._busy < self.max_workers:
+                    self._busy += 1
+                    pooled.append(name)
+                else:
+                    local.append(name)
+        futures = {name: pool.submit(self._timed, stages[name]) for name in pooled}
+        local_after = []
+        for name, (parent, fn) in after.items():
+            if parent in futures and self._overrunning.get(name, 0) < self.max_overruns:
+                futures[name] = self._chain(futures[parent], fn)
+            elif parent in local:
+                local_after.append(name)
+            else:
+                self._drop(out, name)
+        for name in pooled:
+            # added after _chain's callback, so the thread counts as busy until the child ran too
+            futures[name].add_done_callback(self._task_done)
+        if inline is not None:
+            out.inline = inline()
+        for name in local:
+            self._run_local(out, name, stages[name], submitted, deadline)
+        for name in local_after:
+            parent, fn = after[name]
+            if parent in out.values:
+                self._run_local(out, name, lambda: fn(out.values[parent]), submitted, deadline)
+            else:
+                self._drop(out, name)
+        for name in sorted(futures, key=self.timeout):
+            fut = futures[name]
+            until = submitted + self.timeout(name)
+            if deadline is not None:
+                until = min(until, deadline)
+            try:
+                out.values[name], out.seconds[name] = fut.result(timeout=max(0.0, until - time.monotonic()))
+            except FutureTimeout:
+                if not fut.cancel():  # already running: it finishes unobserved, holding its thread
+                    self._overran(name, fut)
+                    out.pending.append(fut)
+                self._drop(out, name)
+        return out
+
+    def _run_local(self, out: StageResults, name: str, fn: Callable[[], Any], submitted: float,
+                   deadline: Optional[float]):
+        """Run a stage that found no free pool thread here, if its budget is not already spent."""
+        until = submitted + self.timeout(name)
+        if deadline is not None:
+            until = min(until, deadline)
+        if time.monotonic() >= until:
+            self._drop(out, name)
+            return
+        if self.metrics is not None:
+            self.metrics.inc('sentiment_enrichment_inline_total', 1, stage=name)
+        out.values[name], out.seconds[name] = self._timed(fn)
+
+    def _task_done(self, _fut: Future):
+        with self._lock:
+            self._busy -= 1
+
+    def _overran(self, name: str, fut: Future):
+        with self._lock:
+            self._overrunning[name] = self._overrunning.get(name, 0) + 1
+
+        def finished(_f):
+            with self._lock:
+                self._overrunning[name] -= 1
+        fut.add_done_callback(finished)
+
+    def _drop(self, out: StageResults, name: str):
+        out.dropped.append(name)
+        if self.metrics is not None:
+            self.metrics.inc('sentiment_enrichment_dropped_total', 1, stage=name)
@@ -0,0 +1,467 @@
+"""Document text extraction in isolated worker processes, cached by content hash.
+
+``/analyze_file`` used to run PyPDF2 and python-docx in the request thread, where a malformed
+or huge document could hang the worker or grow it without bound. ``ExtractionPool`` runs them
+in up to ``workers`` worker processes per web worker instead. They are forkserver children
+where available, started from a server that preloaded PyPDF2 and python-docx, rather than
+copies of the web worker. A worker runs one task at a time and is reused for the next, so
+killing one only ever fails the extraction whose task it was running, never another
+upload's tasks in flight alongside it.
+
+* every task gets a CPU-time budget (``RLIMIT_CPU``, reset per task) and each worker an
+  address-space cap (``RLIMIT_AS``); a worker that exceeds either dies and the request fails
+  with 422;
+* a whole extraction has a hard wall-clock timeout, after which the workers still running
+  its tasks are killed;
+* PDFs are split into page ranges of ``pages_per_task`` that are extracted in parallel. The
+  first task parses the upload, extracts the first range and cuts the rest into small PDFs
+  of their own, so the other tasks do not each parse the whole document again.
+
+Plain text (.txt/.csv/.log and unknown extensions) is only decoded, in-process.
+
+Results are stored in ``TextCache``: ``<sha256>.<kind>.txt`` files under one directory,
+written atomically and shared by all workers. A repeat upload of the same bytes skips
+extraction, and ``/export_pdf`` can build a report from an uploaded file's ``sha256`` without
+the file. Entries unused for ``max_age`` are dropped, texts over ``max_entry_bytes`` are not
+cached, and the cache is trimmed to ``max_bytes``, least recently used first.
+
+``workers=0`` extracts in the calling thread, without limits or timeouts.
+"""
+import hashlib
+import io
+import math
+import multiprocessing
+import os
+import re
+import threading
+import time
+from multiprocessing.connection import wait as wait_connections
+from typing import List, NamedTuple, Optional, Tuple
+
+try:  # POSIX only; elsewhere workers run without resource limits
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+KINDS = ('pdf', 'docx', 'text')
+_KIND_LABELS = {'pdf': 'PDF', 'docx': 'DOCX', 'text': 'text'}
+_SHA256 = re.compile(r'[0-9a-f]{64}')
+
+
+class ExtractionError(Exception):
+    def __init__(self, message: str, status: int = 400, reason: str = 'failed'):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+
+
+class Extracted(NamedTuple):
+    text: str
+    sha256: str
+    kind: str
+    pages: Optional[int]
+    cached: bool
+
+
+def kind_for(ext: str) -> str:
+    return ext if ext in ('pdf', 'docx') else 'text'
+
+
+def decode_text(raw: bytes) -> str:
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('latin-1', errors='ignore')
+
+
+# ---------- worker side (module-level so worker processes can import them) ----------
+
+def _limit_memory(memory_mb: int):
+    if resource is not None and memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError):
+            pass
+
+
+def _limit_cpu(cpu_seconds: int):
+    """Allow `cpu_seconds` of CPU on top of what this process already used."""
+    if resource is not None and cpu_seconds > 0:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = math.ceil(usage.ru_utime + usage.ru_stime) + cpu_seconds
+        try:
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, resource.RLIM_INFINITY))
+        except (ValueError, OSError):
+            pass
+
+
+def _worker(conn, memory_mb: int):
+    """Loop of a worker process: one (cpu_seconds, fn, args) at a time in, its outcome out."""
+    _limit_memory(memory_mb)
+    while True:
+        try:
+            cpu_seconds, fn, args = conn.recv()
+        except (EOFError, OSError):
+            return  # the pool closed its end: retire
+        _limit_cpu(cpu_seconds)
+        try:
+            msg = ('ok', fn(*args))
+        except MemoryError:
+            msg = ('limit', 'MemoryError')
+        except Exception as exc:
+            msg = ('failed', f'{type(exc).__name__}: {exc}')
+        try:
+            conn.send(msg)
+        except Exception as exc:  # e.g. a result that does not pickle
+            conn.send(('failed', f'{type(exc).__name__}: {exc}'))
+
+
+def _page_texts(reader, start: int, stop: int) -> List[str]:
+    texts = []
+    for i in range(start, stop):
+        try:
+            texts.append(reader.pages[i].extract_text() or '')
+        except Exception:
+            continue  # one unreadable page should not lose the rest
+    return texts
+
+
+def pdf_pages(raw: bytes, start: int, stop: Optional[int]) -> Tuple[int, List[str]]:
+    """(page count, texts of pages start..stop that could be extracted)."""
+    from PyPDF2 import PdfReader  # type: ignore
+    reader = PdfReader(io.BytesIO(raw))
+    total = len(reader.pages)
+    return total, _page_texts(reader, start, total if stop is None else min(stop, total))
+
+
+def pdf_split(raw: bytes, per_part: int) -> Tuple[int, List[str], Optional[List[bytes]]]:
+    """(page count, texts of the first `per_part` pages, the other pages as PDFs of `per_part` pages).
+
+    The parts let the remaining ranges be extracted without each task parsing the whole
+    upload again. They are None when the document cannot be split; use pdf_pages then.
+    """
+    from PyPDF2 import PdfReader, PdfWriter  # type: ignore
+    reader = PdfReader(io.BytesIO(raw))
+    total = len(reader.pages)
+    texts = _page_texts(reader, 0, min(per_part, total))
+    parts: Optional[List[bytes]] = []
+    try:
+        for start in range(per_part, total, per_part):
+            writer = PdfWriter()
+            for i in range(start, min(start + per_part, total)):
+                writer.add_page(reader.pages[i])
+            buf = io.BytesIO()
+            writer.write(buf)
+            parts.append(buf.getvalue())
+    except Exception:
+        parts = None
+    return total, texts, parts
+
+
+def docx_text(raw: bytes) -> str:
+    import docx  # type: ignore
+    doc = docx.Document(io.BytesIO(raw))
+    return '\n'.join(p.text for p in doc.paragraphs if p.text)
+
+
+# ---------- cache ----------
+
+def trim_lru(directory: str, max_bytes: int, suffix: str, max_age: float = 0) -> int:
+    """Delete the least recently modified `suffix` files in `directory` until they fit in max_bytes.
+
+    With `max_age` (seconds), files not modified for that long go first, whatever the total.
+    """
+    stats = []
+    try:
+        entries = [e for e in os.scandir(directory) if e.name.endswith(suffix)]
+    except OSError:
+        return 0
+    for e in entries:
+        try:
+            st = e.stat()
+        except OSError:
+            continue
+        stats.append((st.st_mtime, st.st_size, e.path))
+    total = sum(size for _, size, _ in stats)
+    expired = time.time() - max_age if max_age > 0 else 0
+    removed = 0
+    for mtime, size, path in sorted(stats):
+        if total <= max_bytes and mtime >= expired:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+class TextCache:
+    def __init__(self, directory: Optional[str], max_bytes: int = 256 * 1024 * 1024, max_age: float = 7 * 86400,
+                 max_entry_bytes: Optional[int] = None, metrics=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age  # seconds unused before an entry is dropped; 0 keeps entries until trimmed for size
+        self.max_entry_bytes = max_bytes // 16 if max_entry_bytes is None else max_entry_bytes
+        self.metrics = metrics
+        self._writes = 0
+        self._unchecked = 0  # bytes written since the last trim
+        self._lock = threading.Lock()
+
+    def _path(self, sha: str, kind: str) -> str:
+        return os.path.join(self.directory, f'{sha}.{kind}.txt')
+
+    def get(self, sha: str, kinds=KINDS) -> Optional[Tuple[str, str]]:
+        """(text, kind) for the first of `kinds` cached under `sha`, or None."""
+        if not self.directory or not _SHA256.fullmatch(sha):
+            return None
+        for kind in kinds:
+            path = self._path(sha, kind)
+            try:
+                with open(path, encoding='utf-8') as fh:
+                    text = fh.read()
+            except OSError:
+                continue
+            if self.max_age > 0 and self._expired(path):
+                continue
+            try:
+                os.utime(path)  # recency for trimming
+            except OSError:
+                pass
+            self._count('sentiment_cache_hits_total')
+            return text, kind
+        self._count('sentiment_cache_misses_total')
+        return None
+
+    def _expired(self, path: str) -> bool:
+        try:
+            return time.time() - os.path.getmtime(path) > self.max_age
+        except OSError:
+            return True
+
+    def put(self, sha: str, kind: str, text: str) -> None:
+        if not self.directory:
+            return
+        data = text.encode('utf-8')
+        if len(data) > self.max_entry_bytes:
+            return  # one huge document would push out many others
+        path = self._path(sha, kind)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp, 'wb') as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            return  # a cache that cannot be written is just a cold cache
+        with self._lock:
+            self._writes += 1
+            self._unchecked += len(data)
+            trim = self._writes % 32 == 1 or self._unchecked > self.max_bytes // 8
+            if trim:
+                self._unchecked = 0
+        if trim:
+            self.trim()
+
+    def trim(self) -> int:
+        """Delete expired entries, then least recently used ones until the cache fits max_bytes; returns files removed."""
+        return trim_lru(self.directory, self.max_bytes, '.txt', self.max_age)
+
+    def _count(self, name: str):
+        if self.metrics is not None:
+            self.metrics.inc(name, 1, cache='extraction')
+
+
+# ---------- pool ----------
+
+class ExtractionPool:
+    def __init__(self, workers: int = 2, timeout: float = 20.0, cpu_seconds: int = 15, memory_mb: int = 1024,
+                 pages_per_task: int = 8, cache: Optional[TextCache] = None, metrics=None):
+        self.workers = max(0, int(workers))
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.pages_per_task = max(1, pages_per_task)
+        self.cache = cache or TextCache(None)
+        self.metrics = metrics
+        self.started = 0  # worker processes started
+        methods = multiprocessing.get_all_start_methods()
+        if 'forkserver' in methods:
+            self._ctx = multiprocessing.get_context('forkserver')
+            # workers fork from a server that already imported the parsers (if installed)
+            self._ctx.set_forkserver_preload(['extraction', 'PyPDF2', 'docx'])
+        else:
+            self._ctx = multiprocessing.get_context('spawn')
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            # a forked web worker must start its own workers, not talk to the parent's
+            os.register_at_fork(after_in_child=self._reset)
+        if metrics is not None:
+            metrics.describe('sentiment_extraction_failures_total', 'counter',
+                             'Document extractions that failed, by reason (failed, timeout, limit).')
+
+    def _reset(self):
+        self._slots = threading.BoundedSemaphore(max(1, self.workers))
+        self._idle: list = []  # [(conn, process)] waiting for a task
+        self._live: set = set()  # processes running a task
+        self._lock = threading.Lock()
+
+    def _spawn(self) -> tuple:
+        parent, child = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_worker, args=(child, self.memory_mb), daemon=True)
+        try:
+            proc.start()
+        except BaseException:
+            parent.close()
+            raise
+        finally:
+            child.close()  # the worker holds the only other end: EOF means it died
+        self.started += 1
+        return parent, proc
+
+    def _start(self, fn, args) -> tuple:
+        """Hand fn(*args) to an idle worker (or a new one) in a slot already taken; returns (conn, process)."""
+        try:
+            while True:
+                with self._lock:
+                    worker = self._idle.pop() if self._idle else None
+                conn, proc = worker or self._spawn()
+                try:
+                    conn.send((self.cpu_seconds, fn, args))
+                    break
+                except OSError:
+                    if worker is None:
+                        raise
+                    self._retire(conn, proc, kill=True)  # died while idle; try the next one
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._live.add(proc)
+        return conn, proc
+
+    def _stop(self, conn, proc, kill: bool = False):
+        """Give back a task's slot; its worker is reused unless it died or must be `kill`ed."""
+        with self._lock:
+            self._live.discard(proc)
+            keep = not kill and proc.is_alive() and len(self._idle) < self.workers
+            if keep:
+                self._idle.append((conn, proc))
+        if not keep:
+            self._retire(conn, proc, kill)
+        self._slots.release()
+
+    @staticmethod
+    def _retire(conn, proc, kill: bool):
+        if kill:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        conn.close()  # an idle worker exits on EOF
+        proc.join(5)
+
+    def shutdown(self):
+        """Stop idle workers and kill busy ones (extractions waiting on them fail)."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            live = list(self._live)
+        for proc in live:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        for conn, proc in idle:
+            self._retire(conn, proc, kill=False)
+
+    def _fail(self, message: str, status: int, reason: str) -> ExtractionError:
+        if self.metrics is not None:
+            self.metrics.inc('sentiment_extraction_failures_total', 1, reason=reason)
+        return ExtractionError(message, status, reason)
+
+    def extract(self, raw: bytes, ext: str) -> Extracted:
+        """Text of an uploaded file (`ext` without the dot), from the cache when possible."""
+        kind = kind_for(ext)
+        sha = hashlib.sha256(raw).hexdigest()
+        hit = self.cache.get(sha, (kind,))
+        if hit is not None:
+            return Extracted(hit[0], sha, kind, None, True)
+        pages = None
+        if kind == 'text':
+            text = decode_text(raw)
+        elif kind == 'docx':
+            text = self._run([(docx_text, raw)], kind)[0]
+        else:
+            pages, text = self._pdf(raw)
+        self.cache.put(sha, kind, text)
+        return Extracted(text, sha, kind, pages, False)
+
+    def cached_text(self, sha: str) -> Optional[str]:
+        hit = self.cache.get((sha or '').lower())
+        return hit[0] if hit is not None else None
+
+    def _pdf(self, raw: bytes) -> Tuple[int, str]:
+        n = self.pages_per_task
+        deadline = time.monotonic() + self.timeout
+        # the first task parses the upload once and splits the other pages into small PDFs
+        total, texts, parts = self._run([(pdf_split, raw, n)], 'pdf', deadline)[0]
+        if total > n:
+            if parts is not None:
+                calls = [(pdf_pages, part, 0, None) for part in parts]
+            else:
+                calls = [(pdf_pages, raw, start, start + n) for start in range(n, total, n)]
+            for _, part in self._run(calls, 'pdf', deadline):
+                texts.extend(part)
+        return total, '\n'.join(texts)
+
+    def _run(self, calls: list, kind: str, deadline: Optional[float] = None) -> list:
+        """Results of [(fn, *args), ...] from the pool, in order; raises ExtractionError."""
+        label = _KIND_LABELS[kind]
+        if self.workers == 0:
+            try:
+                return [fn(*args) for fn, *args in calls]
+            except Exception as exc:
+                raise self._fail(f'failed to extract text from {label}', 400, 'failed') from exc
+        deadline = deadline or time.monotonic() + self.timeout
+        results: list = [None] * len(calls)
+        queued = list(enumerate(calls))
+        running = {}  # conn -> (index, process)
+        try:
+            while queued or running:
+                # start what the free slots allow; with nothing running, wait for a slot
+                while queued and self._slots.acquire(blocking=not running,
+                                                     timeout=None if running else max(0.0, deadline - time.monotonic())):
+                    i, (fn, *args) = queued.pop(0)
+                    conn, proc = self._start(fn, args)
+                    running[conn] = (i, proc)
+                if not running:
+                    break
+                ready = wait_connections(list(running), timeout=max(0.0, deadline - time.monotonic()))
+                for conn in ready:
+                    i, proc = running.pop(conn)
+                    try:
+                        status, value = conn.recv()
+                    except (EOFError, OSError):
+                        proc.join(5)
+                        status, value = 'limit', f'worker process exited with {proc.exitcode}'  # SIGXCPU or OOM
+                    except BaseException:
+                        self._stop(conn, proc, kill=True)
+                        raise
+                    # a worker that hit a limit is not reused; one whose document failed to parse is
+                    self._stop(conn, proc, kill=status == 'limit')
+                    if status == 'limit':
+                        raise self._fail(f'{label} extraction exceeded its CPU or memory limit', 422,
+                                         'limit') from RuntimeError(value)
+                    if status != 'ok':
+                        raise self._fail(f'failed to extract text from {label}', 400, 'failed') from RuntimeError(value)
+                    results[i] = value
+                if not ready and time.monotonic() >= deadline:
+                    break
+            if queued or running:
+                raise self._fail(f'{label} extraction timed out after {self.timeout:g} s', 422, 'timeout')
+            return results
+        finally:
+            for conn, (_, proc) in running.items():
+                self._stop(conn, proc, kill=True)  # only the workers running this extraction's tasks
@@ -0,0 +1,253 @@
+"""Hashed n-gram features + a linear softmax classifier, in NumPy only.
+
+Features are word unigrams, word bigrams and character n-grams of each word (``<word>``
+padded), hashed with CRC32 into 2**n_bits buckets with a sign bit to cancel collisions, then
+L2-normalised per text. A batch of texts becomes one COO triple (row, column, value), so
+inference is a handful of ``np.bincount`` calls for the whole batch, no per-item model calls.
+Character n-grams make it usable beyond English as long as the training data covers the
+language.
+
+Training (``train``) is mini-batch AdaGrad on multinomial logistic loss over the same sparse
+triples. ``save`` writes a compressed ``.npz`` holding only the non-zero weight rows plus a
+JSON header (feature config, classes, training report); ``load`` restores it.
+
+    flask --app app train-linear labeled.csv --text-col text --label-col label
+"""
+import csv
+import json
+import re
+import time
+import zlib
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CLASSES = ('negative', 'neutral', 'positive')
+FORMAT_VERSION = 1
+_WORD_RE = re.compile(r"\w+(?:'\w+)?", re.UNICODE)
+_LABELS = {
+    'negative': 0, 'neg': 0, '-1': 0,
+    'neutral': 1, 'neu': 1, '0': 1,
+    'positive': 2, 'pos': 2, '1': 2, '+1': 2,
+}
+
+
+def parse_label(value) -> Optional[int]:
+    """Map a CSV label (name, abbreviation or signed number) to a class index."""
+    key = str(value if value is not None else '').strip().lower()
+    if key in _LABELS:
+        return _LABELS[key]
+    try:
+        num = float(key)
+    except ValueError:
+        return None
+    return 2 if num > 0 else 0 if num < 0 else 1
+
+
+class HashingFeaturizer:
+    def __init__(self, n_bits: int = 18, char_ngrams: Tuple[int, int] = (3, 5), word_bigrams: bool = True,
+                 cache_size: int = 200_000):
+        self.n_bits = int(n_bits)
+        self.n_features = 1 << self.n_bits
+        self.mask = self.n_features - 1
+        self.char_ngrams = (int(char_ngrams[0]), int(char_ngrams[1]))
+        self.word_bigrams = bool(word_bigrams)
+        self.cache_size = cache_size
+        self._cache = {}
+
+    def config(self) -> dict:
+        return {'n_bits': self.n_bits, 'char_ngrams': list(self.char_ngrams), 'word_bigrams': self.word_bigrams}
+
+    def _hash(self, token: str) -> int:
+        h = zlib.crc32(token.encode('utf-8'))
+        # low bits pick the bucket, the top bit the sign
+        return (h & self.mask) if h & 0x80000000 else ~(h & self.mask)
+
+    def _word(self, word: str) -> List[int]:
+        feats = self._cache.get(word)
+        if feats is None:
+            feats = [self._hash('w:' + word)]
+            padded = f'<{word}>'
+            lo, hi = self.char_ngrams
+            for n in range(lo, hi + 1):
+                for i in range(len(padded) - n + 1):
+                    feats.append(self._hash('c:' + padded[i:i + n]))
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[word] = feats
+        return feats
+
+    def _doc(self, text: str) -> List[int]:
+        words = _WORD_RE.findall((text or '').lower())
+        feats = []
+        for w in words:
+            feats.extend(self._word(w))
+        if self.word_bigrams:
+            feats.extend(self._hash(f'b:{a} {b}') for a, b in zip(words, words[1:]))
+        return feats
+
+    def transform(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """COO triple (rows, cols, values) for `texts`, duplicates summed, rows L2-normalised."""
+        lengths, flat = [], []
+        for t in texts:
+            feats = self._doc(t)
+            lengths.append(len(feats))
+            flat.extend(feats)
+        signed = np.asarray(flat, dtype=np.int64)
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        neg = signed < 0
+        cols = np.where(neg, ~signed, signed)
+        key, inverse = np.unique(rows * self.n_features + cols, return_inverse=True)
+        vals = np.bincount(inverse, weights=np.where(neg, -1.0, 1.0))
+        keep = vals != 0
+        key, vals = key[keep], vals[keep]
+        rows, cols = key // self.n_features, key % self.n_features
+        norms = np.sqrt(np.bincount(rows, weights=vals * vals, minlength=len(texts)))
+        vals = vals / norms[rows]
+        return rows, cols, vals.astype(np.float32)
+
+
+def _logits(rows, cols, vals, weights, bias, n_rows: int) -> np.ndarray:
+    out = np.empty((n_rows, weights.shape[1]), dtype=np.float64)
+    for c in range(weights.shape[1]):
+        out[:, c] = np.bincount(rows, weights=vals * weights[cols, c], minlength=n_rows) + bias[c]
+    return out
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+class LinearSentimentModel:
+    """Scorer compatible with the model registry (``polarity_scores`` / ``polarity_scores_batch``)."""
+
+    def __init__(self, featurizer: HashingFeaturizer, weights: np.ndarray, bias: np.ndarray, meta: Optional[dict] = None):
+        self.featurizer = featurizer
+        self.weights = weights
+        self.bias = bias
+        self.meta = meta or {}
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, len(CLASSES)))
+        rows, cols, vals = self.featurizer.transform(texts)
+        return _softmax(_logits(rows, cols, vals, self.weights, self.bias, len(texts)))
+
+    def polarity_scores_batch(self, texts: Sequence[str]) -> List[dict]:
+        proba = self.predict_proba(texts)
+        compound = proba[:, 2] - proba[:, 0]
+        return [
+            {'neg': round(float(p[0]), 4), 'neu': round(float(p[1]), 4), 'pos': round(float(p[2]), 4),
+             'compound': round(float(c), 4)}
+            for p, c in zip(proba, compound)
+        ]
+
+    def polarity_scores(self, text: str) -> dict:
+        return self.polarity_scores_batch([text])[0]
+
+    def save(self, path: str) -> None:
+        nonzero = np.flatnonzero(np.any(self.weights != 0, axis=1)).astype(np.uint32)
+        header = {'format': FORMAT_VERSION, 'classes': list(CLASSES), 'featurizer': self.featurizer.config(), **self.meta}
+        with open(path, 'wb') as fh:
+            np.savez_compressed(fh, rows=nonzero, weights=self.weights[nonzero].astype(np.float32),
+                                bias=self.bias.astype(np.float32), header=np.frombuffer(json.dumps(header).encode('utf-8'), dtype=np.uint8))
+
+    @classmethod
+    def load(cls, path: str) -> 'LinearSentimentModel':
+        with np.load(path) as data:
+            header = json.loads(data['header'].tobytes().decode('utf-8'))
+            if header.get('format') != FORMAT_VERSION:
+                raise ValueError(f'unsupported model format {header.get("format")!r}')
+            cfg = header['featurizer']
+            featurizer = HashingFeaturizer(cfg['n_bits'], tuple(cfg['char_ngrams']), cfg['word_bigrams'])
+            weights = np.zeros((featurizer.n_features, len(CLASSES)), dtype=np.float32)
+            weights[data['rows']] = data['weights']
+            bias = data['bias'].astype(np.float64)
+        meta = {k: v for k, v in header.items() if k not in ('format', 'classes', 'featurizer')}
+        return cls(featurizer, weights, bias, meta)
+
+
+def read_labeled_csv(path: str, text_col: str = 'text', label_col: str = 'label') -> Tuple[List[str], List[int], int]:
+    """Return (texts, class indices, skipped rows) from a CSV with a header row."""
+    texts, labels, skipped = [], [], 0
+    with open(path, newline='', encoding='utf-8-sig') as fh:
+        reader = csv.DictReader(fh)
+        missing = [c for c in (text_col, label_col) if c not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f'missing column(s) {", ".join(missing)}; found {reader.fieldnames}')
+        for row in reader:
+            text, label = (row.get(text_col) or '').strip(), parse_label(row.get(label_col))
+            if not text or label is None:
+                skipped += 1
+                continue
+            texts.append(text)
+            labels.append(label)
+    return texts, labels, skipped
+
+
+def train(texts: Sequence[str], labels: Iterable[int], n_bits: int = 18, epochs: int = 5, lr: float = 0.5,
+          l2: float = 1e-6, batch_size: int = 256, holdout: float = 0.1, seed: int = 13) -> LinearSentimentModel:
+    """Fit a softmax classifier with mini-batch AdaGrad; returns the model with a training report in meta."""
+    t0 = time.perf_counter()
+    y = np.asarray(list(labels), dtype=np.int64)
+    if len(y) != len(texts) or not len(y):
+        raise ValueError('need the same, non-zero number of texts and labels')
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(y))
+    n_hold = int(len(y) * holdout) if len(y) >= 20 else 0
+    hold_idx, train_idx = order[:n_hold], order[n_hold:]
+
+    featurizer = HashingFeaturizer(n_bits)
+    train_texts = [texts[i] for i in train_idx]
+    rows, cols, vals = featurizer.transform(train_texts)
+    y_train = y[train_idx]
+    indptr = np.searchsorted(rows, np.arange(len(train_idx) + 1))
+
+    k = len(CLASSES)
+    weights = np.zeros((featurizer.n_features, k), dtype=np.float32)
+    bias = np.log(np.bincount(y_train, minlength=k) + 1.0)
+    bias -= bias.mean()
+    g2w = np.zeros_like(weights)
+    g2b = np.zeros(k)
+    eps = 1e-8
+    for _ in range(epochs):
+        for start in range(0, len(train_idx), batch_size):
+            stop = min(start + batch_size, len(train_idx))
+            lo, hi = indptr[start], indptr[stop]
+            b_rows, b_cols, b_vals = rows[lo:hi] - start, cols[lo:hi], vals[lo:hi]
+            n = stop - start
+            proba = _softmax(_logits(b_rows, b_cols, b_vals, weights, bias, n))
+            proba[np.arange(n), y_train[start:stop]] -= 1.0  # dLoss/dlogits
+            proba /= n
+            ucols, inverse = np.unique(b_cols, return_inverse=True)
+            grad = np.empty((len(ucols), k))
+            for c in range(k):
+                grad[:, c] = np.bincount(inverse, weights=b_vals * proba[b_rows, c], minlength=len(ucols))
+            grad += l2 * weights[ucols]
+            g2w[ucols] += grad * grad
+            weights[ucols] -= (lr * grad / (np.sqrt(g2w[ucols]) + eps)).astype(np.float32)
+            gb = proba.sum(axis=0)
+            g2b += gb * gb
+            bias -= lr * gb / (np.sqrt(g2b) + eps)
+
+    model = LinearSentimentModel(featurizer, weights, bias)
+
+    def accuracy(idx):
+        if not len(idx):
+            return None
+        pred = model.predict_proba([texts[i] for i in idx]).argmax(axis=1)
+        return round(float((pred == y[idx]).mean()), 4)
+
+    model.meta = {
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'n_train': int(len(train_idx)),
+        'n_holdout': int(n_hold),
+        'epochs': epochs,
+        'train_accuracy': accuracy(train_idx[:5000]),
+        'holdout_accuracy': accuracy(hold_idx),
+        'class_counts': {CLASSES[i]: int(n) for i, n in enumerate(np.bincount(y, minlength=k))},
+        'train_seconds': round(time.perf_counter() - t0, 3),
+    }
+    return model
@@ -0,0 +1,144 @@
+"""Keyword extraction with pooled, language-specific YAKE extractors.
+
+A ``yake.KeywordExtractor`` loads its stopword list when it is built and keeps per-instance
+similarity caches while extracting, so it is cheap to reuse but not safe to share between
+threads. ``KeywordService`` keeps a small pool of extractors per language (built on demand by
+``factory(lang)``), checks one out per call and returns it afterwards, the way
+``ModelRegistry.acquire`` serves models that are not thread-safe.
+
+Texts longer than ``max_chars`` are sampled (``sample_text``): evenly spaced windows covering
+the start, middle and end of the text, cut at sentence or word boundaries. YAKE's cost grows
+with the number of candidate n-grams, and the dominant terms of a long document show up in
+every part of it.
+
+``extract_batch`` scores many texts per checkout; ``corpus_keywords`` ranks keywords across a
+corpus by how many texts they are a top keyword of, then by their best YAKE score.
+"""
+import queue
+import re
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_MAX_CHARS = 20000
+DEFAULT_POOL_SIZE = 4
+DEFAULT_TOP = 6
+_SENTENCE_END = re.compile(r'[.!?\n]\s')
+
+
+def sample_text(text: str, max_chars: int, windows: int = 4) -> str:
+    """`text` itself if short enough, else `windows` evenly spaced excerpts totalling <= max_chars."""
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    size = max_chars // windows
+    step = (len(text) - size) / max(1, windows - 1)
+    parts = []
+    for i in range(windows):
+        start = int(i * step)
+        chunk = text[start:start + size]
+        if start > 0:  # begin after the first sentence (or word) break
+            m = _SENTENCE_END.search(chunk)
+            cut = m.end() if m and m.end() < size // 2 else chunk.find(' ') + 1
+            chunk = chunk[cut:]
+        if start + size < len(text):  # end at the last sentence (or word) break
+            ends = [m.end() for m in _SENTENCE_END.finditer(chunk)]
+            cut = ends[-1] if ends and ends[-1] > len(chunk) // 2 else chunk.rfind(' ')
+            chunk = chunk[:cut] if cut > 0 else chunk
+        parts.append(chunk.strip())
+    return '\n'.join(p for p in parts if p)
+
+
+class KeywordService:
+    def __init__(self, factory: Callable[[str], object], languages: Sequence[str] = ('en',),
+                 default_lang: str = 'en', pool_size: int = DEFAULT_POOL_SIZE,
+                 max_chars: int = DEFAULT_MAX_CHARS, metrics=None):
+        self.factory = factory
+        self.languages = frozenset(languages)
+        self.default_lang = default_lang
+        self.pool_size = max(1, pool_size)
+        self.max_chars = max_chars
+        self.metrics = metrics
+        self._pools: Dict[str, queue.LifoQueue] = {}
+        self._lock = threading.Lock()
+
+    def language_for(self, lang: Optional[str]) -> str:
+        code = (lang or '').lower()[:2]
+        return code if code in self.languages else self.default_lang
+
+    @contextmanager
+    def acquire(self, lang: Optional[str] = None):
+        """Yield an extractor for `lang` (falling back to the default language) for exclusive use."""
+        lang = self.language_for(lang)
+        pool = self._pools.get(lang)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.setdefault(lang, queue.LifoQueue())
+        try:
+            extractor = pool.get_nowait()
+            hit = True
+        except queue.Empty:
+            extractor = self.factory(lang)
+            hit = False
+        if self.metrics is not None:
+            self.metrics.inc('sentiment_cache_hits_total' if hit else 'sentiment_cache_misses_total', 1,
+                             cache='keyword_extractor')
+        try:
+            yield extractor
+        finally:
+            if pool.qsize() < self.pool_size:
+                pool.put(extractor)
+
+    def warm(self, languages: Optional[Sequence[str]] = None) -> None:
+        for lang in (languages or [self.default_lang]):
+            with self.acquire(lang):
+                pass
+
+    def _scored(self, extractor, text: str, top: int) -> List[Tuple[str, float]]:
+        try:
+            config = getattr(extractor, 'config', None)
+            if isinstance(config, dict):  # yake >= 0.7
+                config['top'] = top
+            else:
+                extractor.top = top
+            return extractor.extract_keywords(sample_text(text, self.max_chars))
+        except Exception:
+            return []
+
+    def extract(self, text: str, lang: Optional[str] = None, top: int = DEFAULT_TOP) -> List[str]:
+        if not text:
+            return []
+        with self.acquire(lang) as extractor:
+            return [kw for kw, _ in self._scored(extractor, text, top)]
+
+    def extract_batch(self, texts: Sequence[str], langs: Optional[Sequence[Optional[str]]] = None,
+                      top: int = DEFAULT_TOP) -> List[List[Tuple[str, float]]]:
+        """Scored keywords per text; texts are grouped by language so each group uses one checkout."""
+        out: List[List[Tuple[str, float]]] = [[] for _ in texts]
+        groups = defaultdict(list)
+        for i, text in enumerate(texts):
+            if text:
+                groups[self.language_for(langs[i] if langs else None)].append(i)
+        for lang, idx in groups.items():
+            with self.acquire(lang) as extractor:
+                for i in idx:
+                    out[i] = self._scored(extractor, texts[i], top)
+        return out
+
+    def corpus_keywords(self, texts: Sequence[str], lang: Optional[str] = None, top: int = 20,
+                        per_text: int = 10) -> List[dict]:
+        """Keywords ranked by the number of texts they are a top keyword of, then by best score."""
+        counts: Dict[str, int] = defaultdict(int)
+        best: Dict[str, float] = {}
+        shown: Dict[str, str] = {}
+        for scored in self.extract_batch(texts, [lang] * len(texts) if lang else None, top=per_text):
+            for kw, score in scored:
+                key = kw.lower()
+                counts[key] += 1
+                if key not in best or score < best[key]:
+                    best[key], shown[key] = score, kw
+        ranked = sorted(counts, key=lambda k: (-counts[k], best[k]))[:top]
+        return [{'keyword': shown[k], 'documents': counts[k], 'score': round(best[k], 6)} for k in ranked]
+
+    def stats(self) -> Dict[str, int]:
+        return {lang: pool.qsize() for lang, pool in self._pools.items()}
@@ -0,0 +1,401 @@
+"""Read-only lexicons compiled once and memory-mapped by every worker.
+
+VADER's lexicon and emoji table, langdetect's language profiles and YAKE's stopword lists are
+normally parsed into Python dicts by each process, so memory grows with the worker count.
+``build()`` compiles each resource into one ``.tbl`` file: a JSON header followed by aligned
+arrays, one table per entry in the header, each a sorted fixed-width UTF-8 key array plus an
+optional value array (float64, 2-D float64 rows, or fixed-width strings). ``open_bundle()``
+maps the file read-only with ``mmap`` and wraps the arrays with ``np.frombuffer``, so workers
+share the pages through the OS page cache and "loading" is parsing a few KB of header.
+
+``MappedTable`` is a read-only ``Mapping``: lookups binary-search the key array, reject keys
+whose first character no key starts with (VADER checks every character of a text against the
+emoji table), and remember recent results in a small bounded memo so hot words cost a dict hit.
+
+Each header records a fingerprint of its source files; a stale or missing file is rebuilt
+(atomically, so concurrently starting workers never read a half-written file).
+
+    flask --app app lexicon-build
+"""
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from collections.abc import Mapping
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MAGIC = b'MTBL\x00\x00\x00\x01'
+FORMAT_VERSION = 1
+ALIGN = 64
+SUFFIX = '.tbl'
+DEFAULT_MEMO_SIZE = 8192
+_MISSING = object()
+_open: Dict[Tuple[str, str], 'MappedBundle'] = {}
+_open_lock = threading.Lock()
+_stopwords: Dict[Tuple[str, str], frozenset] = {}
+
+
+# ---------- file format ----------
+
+def _pad(n: int) -> int:
+    return (-n) % ALIGN
+
+
+def write_bundle(path: str, tables: Dict[str, Tuple[Sequence[str], Optional[Sequence]]],
+                 meta: Optional[dict] = None, source: Optional[str] = None) -> int:
+    """Write `tables` ({name: (keys, values or None)}) to `path` atomically; returns the file size.
+
+    Keys must be unique non-empty strings; values are floats, equal-length float rows or strings.
+    """
+    header = {'format': FORMAT_VERSION, 'source': source, 'meta': meta or {}, 'tables': {}}
+    blobs = []
+    offset = 0
+    for name, (keys, values) in tables.items():
+        order = sorted(range(len(keys)), key=lambda i: keys[i].encode('utf-8'))
+        encoded = [keys[i].encode('utf-8') for i in order]
+        if any(not k or k.endswith(b'\x00') for k in encoded):
+            raise ValueError(f'table {name!r}: keys must be non-empty and not end in NUL')
+        if len(set(encoded)) != len(encoded):
+            raise ValueError(f'table {name!r}: duplicate keys')
+        width = max((len(k) for k in encoded), default=1)
+        arrays = {'keys': np.array(encoded, dtype=f'S{width}')}
+        kind = 'set'
+        if values is not None:
+            picked = [values[i] for i in order]
+            if picked and isinstance(picked[0], str):
+                raw = [v.encode('utf-8') for v in picked]
+                arrays['values'] = np.array(raw, dtype=f'S{max((len(v) for v in raw), default=1)}')
+                kind = 'str'
+            else:
+                arrays['values'] = np.asarray(picked, dtype=np.float64)
+                kind = 'rows' if arrays['values'].ndim == 2 else 'float'
+        entry = {'kind': kind, 'count': len(encoded), 'first_chars': sorted({k[0] for k in keys})}
+        for part, arr in arrays.items():
+            data = arr.tobytes()
+            entry[part] = {'offset': offset, 'dtype': arr.dtype.str, 'shape': list(arr.shape)}
+            blobs.append(data + b'\x00' * _pad(len(data)))
+            offset += len(blobs[-1])
+        header['tables'][name] = entry
+
+    head = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    start = len(MAGIC) + 4 + len(head)
+    start += _pad(start)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp, 'wb') as fh:
+        fh.write(MAGIC + len(head).to_bytes(4, 'little') + head)
+        fh.write(b'\x00' * (start - fh.tell()))
+        for blob in blobs:
+            fh.write(blob)
+    os.replace(tmp, path)
+    return start + offset
+
+
+class MappedTable(Mapping):
+    """Read-only str -> value mapping over arrays inside a mapped bundle."""
+
+    def __init__(self, name: str, kind: str, keys: np.ndarray, values: Optional[np.ndarray],
+                 first_chars: Iterable[str] = (), memo_size: int = DEFAULT_MEMO_SIZE):
+        self.name = name
+        self.kind = kind
+        self._keys = keys
+        self._values = values
+        self._width = keys.dtype.itemsize
+        self._first = frozenset(first_chars)
+        self._memo = {}
+        self.memo_size = memo_size
+
+    def _find(self, key) -> int:
+        if not isinstance(key, str) or not key or key[0] not in self._first:
+            return -1
+        raw = key.encode('utf-8', 'surrogatepass')
+        if len(raw) > self._width:
+            return -1
+        i = int(np.searchsorted(self._keys, raw))
+        return i if i < len(self._keys) and self._keys[i] == raw else -1
+
+    def _value(self, i: int):
+        if self.kind == 'float':
+            return float(self._values[i])
+        if self.kind == 'rows':
+            return self._values[i].tolist()
+        if self.kind == 'str':
+            return self._values[i].decode('utf-8')
+        return True
+
+    def _lookup(self, key):
+        try:
+            return self._memo[key]
+        except (KeyError, TypeError):
+            pass
+        i = self._find(key)
+        value = _MISSING if i < 0 else self._value(i)
+        if len(self._memo) >= self.memo_size:
+            self._memo.clear()
+        try:
+            self._memo[key] = value
+        except TypeError:  # unhashable key
+            pass
+        return value
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        return self._lookup(key) is not _MISSING
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self):
+        for raw in self._keys:
+            yield raw.decode('utf-8')
+
+    def with_prefix(self, prefix: str) -> List[str]:
+        """Keys starting with `prefix`, in sorted (UTF-8 byte) order."""
+        lo_key = prefix.encode('utf-8')
+        lo = int(np.searchsorted(self._keys, lo_key, side='left'))
+        hi = int(np.searchsorted(self._keys, lo_key + b'\xff', side='left'))
+        return [raw.decode('utf-8') for raw in self._keys[lo:hi]]
+
+
+class MappedBundle:
+    """A mapped ``.tbl`` file: ``.tables`` by name, ``.meta`` and ``.source`` from the header."""
+
+    def __init__(self, path: str, memo_size: int = DEFAULT_MEMO_SIZE):
+        self.path = path
+        with open(path, 'rb') as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f'{path}: not a mapped table file')
+        head_len = int.from_bytes(self._mmap[len(MAGIC):len(MAGIC) + 4], 'little')
+        head_end = len(MAGIC) + 4 + head_len
+        header = json.loads(self._mmap[len(MAGIC) + 4:head_end].decode('utf-8'))
+        if header.get('format') != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f'{path}: unsupported format {header.get("format")!r}')
+        base = head_end + _pad(head_end)
+        self.source = header.get('source')
+        self.meta = header.get('meta') or {}
+        self.size = len(self._mmap)
+        self.tables: Dict[str, MappedTable] = {}
+        for name, entry in header['tables'].items():
+            arrays = {}
+            for part in ('keys', 'values'):
+                if part in entry:
+                    spec = entry[part]
+                    count = int(np.prod(spec['shape'])) if spec['shape'] else 0
+                    arr = np.frombuffer(self._mmap, dtype=np.dtype(spec['dtype']), count=count,
+                                        offset=base + spec['offset'])
+                    arrays[part] = arr.reshape(spec['shape'])
+            self.tables[name] = MappedTable(name, entry['kind'], arrays['keys'], arrays.get('values'),
+                                            entry.get('first_chars', ()), memo_size)
+
+    def __getitem__(self, name: str) -> MappedTable:
+        return self.tables[name]
+
+
+def open_bundle(path: str, source: Optional[str] = None, memo_size: int = DEFAULT_MEMO_SIZE) -> Optional[MappedBundle]:
+    """Map `path`, or None when it is missing, unreadable or (given `source`) stale."""
+    try:
+        bundle = MappedBundle(path, memo_size)
+    except (OSError, ValueError):
+        return None
+    if source is not None and bundle.source != source:
+        return None
+    return bundle
+
+
+def fingerprint(paths: Iterable[str], extra: str = '') -> str:
+    """Cheap staleness key: names, sizes and mtimes of the source files plus `extra`."""
+    h = hashlib.sha1(f'{FORMAT_VERSION}:{extra}'.encode('utf-8'))
+    for p in sorted(paths):
+        st = os.stat(p)
+        h.update(f'{os.path.basename(p)}:{st.st_size}:{st.st_mtime_ns};'.encode('utf-8'))
+    return h.hexdigest()
+
+
+# ---------- resources ----------
+
+def _vader_dir() -> str:
+    import vaderSentiment.vaderSentiment as vs
+    return os.path.dirname(os.path.abspath(vs.__file__))
+
+
+def _vader_source() -> str:
+    d = _vader_dir()
+    return fingerprint([os.path.join(d, 'vader_lexicon.txt'), os.path.join(d, 'emoji_utf8_lexicon.txt')], 'vader')
+
+
+def _vader_tables():
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    sia = SentimentIntensityAnalyzer()  # reuse VADER's own parser so the contents match exactly
+    lex = {k: v for k, v in sia.lexicon.items() if k}
+    emo = {k: v for k, v in sia.emojis.items() if k}
+    return {'lexicon': (list(lex), list(lex.values())), 'emojis': (list(emo), list(emo.values()))}, {}
+
+
+def _langdetect_source() -> str:
+    from langdetect.detector_factory import PROFILES_DIRECTORY
+    files = [os.path.join(PROFILES_DIRECTORY, f) for f in os.listdir(PROFILES_DIRECTORY) if not f.startswith('.')]
+    return fingerprint(files, 'langdetect')
+
+
+def _langdetect_tables():
+    from langdetect.detector_factory import DetectorFactory, PROFILES_DIRECTORY
+    factory = DetectorFactory()
+    factory.load_profile(PROFILES_DIRECTORY)
+    words = list(factory.word_lang_prob_map)
+    return {'profiles': (words, [factory.word_lang_prob_map[w] for w in words])}, {'langlist': list(factory.langlist)}
+
+
+def _yake_stopword_dir() -> str:
+    import yake.core.yake as yk
+    return os.path.join(os.path.dirname(os.path.abspath(yk.__file__)), 'StopwordsList')
+
+
+def _yake_source() -> str:
+    d = _yake_stopword_dir()
+    return fingerprint([os.path.join(d, f) for f in os.listdir(d) if f.endswith('.txt')], 'yake')
+
+
+def _yake_tables():
+    d = _yake_stopword_dir()
+    keys = set()
+    for fname in sorted(os.listdir(d)):
+        if not (fname.startswith('stopwords_') and fname.endswith('.txt')):
+            continue
+        lang = fname[len('stopwords_'):-len('.txt')]
+        try:
+            with open(os.path.join(d, fname), encoding='utf-8') as fh:
+                text = fh.read()
+        except UnicodeDecodeError:  # same fallback YAKE applies
+            with open(os.path.join(d, fname), encoding='ISO-8859-1') as fh:
+                text = fh.read()
+        # same split as YAKE's loader, including the '' a trailing newline leaves behind
+        keys.update(f'{lang}\t{w}' for w in set(text.lower().split('\n')))
+    return {'stopwords': (sorted(keys), None)}, {}
+
+
+# name -> (source fingerprint, tables builder, memo size)
+RESOURCES = {
+    'vader': (_vader_source, _vader_tables, DEFAULT_MEMO_SIZE),
+    'langdetect': (_langdetect_source, _langdetect_tables, 4096),
+    'yake': (_yake_source, _yake_tables, 1024),
+}
+
+
+def resource_path(out_dir: str, name: str) -> str:
+    return os.path.join(out_dir, name + SUFFIX)
+
+
+def build(out_dir: str, names: Optional[Iterable[str]] = None, force: bool = False) -> Dict[str, dict]:
+    """Compile each resource whose file is missing or stale; returns a per-resource report."""
+    report = {}
+    for name in (names if names is not None else RESOURCES):
+        source_fn, tables_fn, _ = RESOURCES[name]
+        path = resource_path(out_dir, name)
+        try:
+            source = source_fn()
+        except Exception as exc:  # package not installed
+            report[name] = {'status': 'unavailable', 'error': str(exc)}
+            continue
+        if not force and open_bundle(path, source) is not None:
+            report[name] = {'status': 'fresh', 'path': path, 'bytes': os.path.getsize(path)}
+            continue
+        t0 = time.perf_counter()
+        tables, meta = tables_fn()
+        size = write_bundle(path, tables, meta=meta, source=source)
+        report[name] = {'status': 'built', 'path': path, 'bytes': size,
+                        'entries': {t: len(k) for t, (k, _) in tables.items()},
+                        'seconds': round(time.perf_counter() - t0, 3)}
+    return report
+
+
+def load(out_dir: str, name: str, build_missing: bool = True) -> Optional[MappedBundle]:
+    """Mapped bundle for resource `name` (opened once per process), building it first if needed.
+
+    Returns None when the package is missing or the file can be neither opened nor built.
+    """
+    key = (os.path.abspath(out_dir), name)
+    bundle = _open.get(key)
+    if bundle is not None:
+        return bundle
+    with _open_lock:
+        if key in _open:
+            return _open[key]
+        source_fn, _, memo = RESOURCES[name]
+        try:
+            source = source_fn()
+        except Exception:
+            return None
+        path = resource_path(out_dir, name)
+        bundle = open_bundle(path, source, memo)
+        if bundle is None and build_missing:
+            try:
+                build(out_dir, [name], force=True)
+            except OSError:  # e.g. read-only deploy dir: callers fall back to the parsed dicts
+                return None
+            bundle = open_bundle(path, source, memo)
+        if bundle is not None:
+            _open[key] = bundle
+        return bundle
+
+
+# ---------- adapters ----------
+
+def vader_analyzer(out_dir: str, build_missing: bool = True):
+    """A ``SentimentIntensityAnalyzer`` backed by the mapped lexicon, or None."""
+    bundle = load(out_dir, 'vader', build_missing)
+    if bundle is None:
+        return None
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+    class MappedSentimentIntensityAnalyzer(SentimentIntensityAnalyzer):
+        def __init__(self):  # skip file parsing; polarity_scores only reads .lexicon / .emojis
+            self.lexicon = bundle['lexicon']
+            self.emojis = bundle['emojis']
+            self.bundle = bundle
+
+    return MappedSentimentIntensityAnalyzer()
+
+
+def install_langdetect(out_dir: str, build_missing: bool = True) -> bool:
+    """Point langdetect's global factory at the mapped profiles; False if unavailable."""
+    bundle = load(out_dir, 'langdetect', build_missing)
+    if bundle is None:
+        return False
+    from langdetect import detector_factory
+    factory = detector_factory.DetectorFactory()
+    factory.word_lang_prob_map = bundle['profiles']
+    factory.langlist = list(bundle.meta['langlist'])
+    factory.bundle = bundle
+    detector_factory._factory = factory
+    return True
+
+
+def yake_stopwords(out_dir: str, lang: str, build_missing: bool = True) -> Optional[frozenset]:
+    """YAKE's stopword set for `lang` (falling back to its language-neutral list), or None."""
+    code = (lang or '')[:2].lower()
+    key = (os.path.abspath(out_dir), code)
+    if key in _stopwords:
+        return _stopwords[key]
+    bundle = load(out_dir, 'yake', build_missing)
+    if bundle is None:
+        return None
+    table = bundle['stopwords']
+    words = table.with_prefix(f'{code}\t') or table.with_prefix('noLang\t')
+    _stopwords[key] = frozenset(w.split('\t', 1)[1] for w in words)
+    return _stopwords[key]
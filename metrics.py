@@ -0,0 +1,279 @@
+"""Low-overhead in-process metrics rendered in Prometheus text format.
+
+Counters, gauges and fixed-bucket histograms live in plain dicts behind one lock. With
+several worker processes, set METRICS_DIR (run_server.py does): every process periodically
+writes a JSON snapshot to ``<METRICS_DIR>/<pid>.json`` and ``render()`` merges all of them, so
+any worker can answer a scrape. Counters/histograms of exited workers are kept (they are
+cumulative); their gauges are dropped. A scrape folds the snapshots of exited workers into
+one ``exited.json`` and deletes them, so recycled workers (gunicorn ``--max-requests``) do not
+pile up files. Each snapshot carries the id of the process instance that wrote it, so a new
+worker that reuses a dead one's PID folds the old file first instead of overwriting it.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+EXITED_FILE = 'exited.json'
+_MAX_FOLDED_IDS = 256  # instance ids remembered so a fold interrupted before the delete is not repeated
+
+try:  # POSIX only; without it exited workers' files are merged but never folded
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+def _key(labels: dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS, directory: Optional[str] = None, flush_interval: float = 1.0):
+        self.buckets = tuple(buckets)
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        # name -> labels -> [bucket counts..., +Inf count, sum]
+        self._hists: Dict[str, Dict[LabelKey, list]] = {}
+        self._last_flush = 0.0
+        self._instance_pid = None
+        self._instance = ''
+        if directory:
+            atexit.register(self.flush)
+
+    def describe(self, name: str, kind: str, help_text: str):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        k = _key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[k] = series.get(k, 0) + value
+
+    def gauge_add(self, name: str, value: float, **labels):
+        k = _key(labels)
+        with self._lock:
+            series = self._gauges.setdefault(name, {})
+            series[k] = series.get(k, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        k = _key(labels)
+        with self._lock:
+            series = self._hists.setdefault(name, {})
+            h = series.get(k)
+            if h is None:
+                h = series[k] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    h[i] += 1
+                    break
+            else:
+                h[len(self.buckets)] += 1
+            h[-1] += seconds
+
+    @contextmanager
+    def time(self, name: str, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    # ---- multi-process snapshotting ----
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'counters': {n: [[list(map(list, k)), v] for k, v in s.items()] for n, s in self._counters.items()},
+                'gauges': {n: [[list(map(list, k)), v] for k, v in s.items()] for n, s in self._gauges.items()},
+                'hists': {n: [[list(map(list, k)), list(v)] for k, v in s.items()] for n, s in self._hists.items()},
+            }
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def flush(self):
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(f'{os.getpid()}.json')
+        if self._instance_pid != os.getpid():
+            # first flush of this process: a file under our PID belongs to an exited worker
+            self._instance_pid, self._instance = os.getpid(), uuid.uuid4().hex
+            self._fold_exited([path])
+        snap = self.snapshot()
+        snap['instance'] = self._instance
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(snap, fh)
+        os.replace(tmp, path)
+        self._last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        """Cheap call for the request path: writes the snapshot at most every flush_interval seconds."""
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def _collect(self) -> list:
+        if not self.directory:
+            return [(True, self.snapshot())]
+        self.flush()
+        exited = []
+        for fname in os.listdir(self.directory):
+            pid = fname[:-5]
+            if fname.endswith('.json') and pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+                exited.append(self._path(fname))
+        if exited:
+            self._fold_exited(exited)
+        out = []
+        for fname in os.listdir(self.directory):
+            pid = fname[:-5]
+            if not fname.endswith('.json') or not (pid.isdigit() or fname == EXITED_FILE):
+                continue
+            try:
+                with open(self._path(fname), encoding='utf-8') as fh:
+                    snap = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            alive = pid.isdigit() and (int(pid) == os.getpid() or _pid_alive(int(pid)))
+            if alive and int(pid) == os.getpid() and snap.get('instance') != self._instance:
+                continue  # written by an earlier process with our PID; folded on our first flush
+            out.append((alive, snap))
+        return out
+
+    def _fold_exited(self, paths: list):
+        """Add the counters/histograms of exited workers' snapshots to exited.json and delete them."""
+        if fcntl is None:
+            return
+        with open(self._path('.fold.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(self._path(EXITED_FILE), encoding='utf-8') as fh:
+                    total = json.load(fh)
+            except (OSError, ValueError):
+                total = {'counters': {}, 'hists': {}, 'folded': []}
+            for path in paths:
+                try:
+                    with open(path, encoding='utf-8') as fh:
+                        snap = json.load(fh)
+                except (OSError, ValueError):
+                    continue
+                instance = snap.get('instance')
+                if instance == self._instance:
+                    continue  # our own, live snapshot
+                if not instance or instance not in total['folded']:
+                    _merge(total, snap)
+                    if instance:
+                        total['folded'] = (total['folded'] + [instance])[-_MAX_FOLDED_IDS:]
+                    tmp = self._path(EXITED_FILE + '.tmp')
+                    with open(tmp, 'w', encoding='utf-8') as fh:
+                        json.dump(total, fh)
+                    os.replace(tmp, self._path(EXITED_FILE))
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def render(self) -> str:
+        counters: Dict[str, Dict[LabelKey, float]] = {}
+        gauges: Dict[str, Dict[LabelKey, float]] = {}
+        hists: Dict[str, Dict[LabelKey, list]] = {}
+        for alive, snap in self._collect():
+            for target, section, live_only in ((counters, 'counters', False), (gauges, 'gauges', True)):
+                if live_only and not alive:
+                    continue
+                for name, series in snap.get(section, {}).items():
+                    dst = target.setdefault(name, {})
+                    for k, v in series:
+                        key = tuple(tuple(p) for p in k)
+                        dst[key] = dst.get(key, 0) + v
+            for name, series in snap.get('hists', {}).items():
+                dst = hists.setdefault(name, {})
+                for k, v in series:
+                    key = tuple(tuple(p) for p in k)
+                    if key in dst:
+                        dst[key] = [a + b for a, b in zip(dst[key], v)]
+                    else:
+                        dst[key] = list(v)
+
+        lines = []
+
+        def header(name, default_kind):
+            kind, help_text = self._help.get(name, (default_kind, ''))
+            if help_text:
+                lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+        for name in sorted(counters):
+            header(name, 'counter')
+            for k, v in sorted(counters[name].items()):
+                lines.append(f'{name}{fmt(k)} {_num(v)}')
+        for name in sorted(gauges):
+            header(name, 'gauge')
+            for k, v in sorted(gauges[name].items()):
+                lines.append(f'{name}{fmt(k)} {_num(v)}')
+        for name in sorted(hists):
+            header(name, 'histogram')
+            for k, h in sorted(hists[name].items()):
+                cum = 0
+                for i, bound in enumerate(self.buckets):
+                    cum += h[i]
+                    lines.append(f'{name}_bucket{fmt(k, [("le", _num(bound))])} {cum}')
+                cum += h[len(self.buckets)]
+                lines.append(f'{name}_bucket{fmt(k, [("le", "+Inf")])} {cum}')
+                lines.append(f'{name}_sum{fmt(k)} {h[-1]!r}')
+                lines.append(f'{name}_count{fmt(k)} {cum}')
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(total: dict, snap: dict):
+    """Add the counters and histograms of `snap` into `total` (both in snapshot() form)."""
+    for section in ('counters', 'hists'):
+        for name, series in snap.get(section, {}).items():
+            dst = total.setdefault(section, {}).setdefault(name, [])
+            index = {json.dumps(k): entry for k, entry in ((e[0], e) for e in dst)}
+            for k, v in series:
+                entry = index.get(json.dumps(k))
+                if entry is None:
+                    entry = index[json.dumps(k)] = [k, v]
+                    dst.append(entry)
+                elif section == 'counters':
+                    entry[1] += v
+                else:
+                    entry[1] = [a + b for a, b in zip(entry[1], v)]
+
+
+def _num(v) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _escape(v: str) -> str:
+    return str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,234 @@
+"""Registry of sentiment scorers.
+
+A model registers a name, a zero-arg loader and its capabilities::
+
+    MODELS = ModelRegistry(default='vader')
+
+    @MODELS.register('vader', label='VADER', languages=('en',))
+    def _load():
+        return SentimentIntensityAnalyzer()
+
+A loaded model is any object with ``polarity_scores(text) -> {pos, neu, neg, compound}``;
+``batch=True`` models also provide ``polarity_scores_batch(texts) -> [scores, ...]``, which
+``score_batch`` uses instead of a per-item loop. ``score`` accepts a ``document.Document``;
+models registered with ``documents=True`` receive it as is (reusing its tokens), others get
+``doc.text``. Models load on first use. ``warm()`` loads
+them ahead of traffic (run_server.py does this before forking). Models that are not
+``thread_safe`` are served from a pool of up to ``pool_size`` instances, and warming fills
+the pool. Each model keeps call/latency counters, reported by ``stats()``.
+"""
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+class ModelLoadError(RuntimeError):
+    """Raised when a registered model cannot be loaded (e.g. a missing artifact or package)."""
+
+
+class ModelSpec:
+    def __init__(self, name: str, loader: Callable, label: Optional[str] = None, batch: bool = False,
+                 languages: Optional[Iterable[str]] = None, thread_safe: bool = True, pool_size: int = 2,
+                 description: str = '', available: Optional[Callable[[], bool]] = None, documents: bool = False):
+        self.name = name
+        self.loader = loader
+        self.label = label or name
+        self.batch = batch
+        self.languages = tuple(languages) if languages else None  # None = language-agnostic
+        self.thread_safe = thread_safe
+        self.pool_size = max(1, pool_size)
+        self.description = description
+        self._available = available  # e.g. "artifact file exists"; None = always available
+        self.documents = documents  # polarity_scores accepts a Document as well as a str
+
+    def available(self) -> bool:
+        try:
+            return self._available is None or bool(self._available())
+        except Exception:
+            return False
+
+    def supports(self, lang: Optional[str]) -> bool:
+        return self.languages is None or not lang or lang in self.languages
+
+
+class _ModelState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.instance = None
+        self.pool: Optional[queue.LifoQueue] = None
+        self.instances = 0
+        self.load_seconds: Optional[float] = None
+        self.warmed = False
+        self.calls = 0
+        self.items = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+
+class ModelRegistry:
+    def __init__(self, default: str, metrics=None):
+        self.default = default
+        self.metrics = metrics
+        self._specs: Dict[str, ModelSpec] = {}
+        self._state: Dict[str, _ModelState] = {}
+        if metrics is not None:
+            metrics.describe('sentiment_model_seconds', 'histogram', 'Scoring latency per model call (single or batch).')
+
+    # ---- registration / lookup ----
+    def register(self, name: str, **capabilities):
+        def deco(loader: Callable):
+            self._specs[name] = ModelSpec(name, loader, **capabilities)
+            self._state[name] = _ModelState()
+            return loader
+        return deco
+
+    def resolve(self, name: Optional[str]) -> Optional[str]:
+        """Canonical registered name for `name`, or None if it is unknown or unavailable."""
+        key = (name or '').strip().lower()
+        return key if key in self._specs and self._specs[key].available() else None
+
+    def names(self) -> List[str]:
+        return list(self._specs)
+
+    def spec(self, name: str) -> ModelSpec:
+        return self._specs[name]
+
+    # ---- loading ----
+    def _load(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            inst = self._specs[name].loader()
+        except Exception as exc:
+            raise ModelLoadError(f'model {name!r} failed to load: {exc}') from exc
+        if inst is None:
+            raise ModelLoadError(f'model {name!r} is unavailable')
+        st = self._state[name]
+        st.load_seconds = time.perf_counter() - t0
+        st.instances += 1
+        return inst
+
+    def _shared(self, name: str):
+        st = self._state[name]
+        if st.instance is None:
+            with st.lock:
+                if st.instance is None:
+                    st.instance = self._load(name)
+        return st.instance
+
+    @contextmanager
+    def acquire(self, name: str):
+        """Yield a loaded instance of `name`; pooled for models that are not thread-safe."""
+        spec = self._specs[name]
+        if spec.thread_safe:
+            yield self._shared(name)
+            return
+        st = self._state[name]
+        with st.lock:
+            if st.pool is None:
+                st.pool = queue.LifoQueue()
+        try:
+            inst = st.pool.get_nowait()
+        except queue.Empty:
+            inst = self._load(name)
+        try:
+            yield inst
+        finally:
+            if st.pool.qsize() < spec.pool_size:
+                st.pool.put(inst)
+
+    def loaded(self, name: str) -> bool:
+        st = self._state[name]
+        return st.instance is not None or bool(st.pool and st.pool.qsize())
+
+    def warm(self, names: Optional[Iterable[str]] = None) -> Dict[str, Optional[float]]:
+        """Load (and for pooled models, fill the pool of) each model; returns load seconds.
+
+        Unknown names are ignored; a model that fails to load reports None.
+        """
+        out = {}
+        for name in (names if names is not None else self.names()):
+            name = self.resolve(name)
+            if name is None:
+                continue
+            spec, st = self._specs[name], self._state[name]
+            try:
+                if spec.thread_safe:
+                    self._shared(name)
+                else:
+                    with st.lock:
+                        if st.pool is None:
+                            st.pool = queue.LifoQueue()
+                    while st.pool.qsize() < spec.pool_size:
+                        st.pool.put(self._load(name))
+                st.warmed = True
+                out[name] = st.load_seconds
+            except ModelLoadError:
+                out[name] = None
+        return out
+
+    # ---- scoring ----
+    def _observe(self, name: str, seconds: float, n: int, mode: str):
+        st = self._state[name]
+        with st.lock:
+            st.calls += 1
+            st.items += n
+            st.seconds += seconds
+            st.max_seconds = max(st.max_seconds, seconds)
+        if self.metrics is not None:
+            self.metrics.observe('sentiment_model_seconds', seconds, model=name, mode=mode)
+            self.metrics.inc('sentiment_rows_scored_total', n, model=name)
+
+    def score(self, name: str, text) -> dict:
+        if not isinstance(text, str) and not self._specs[name].documents:
+            text = text.text
+        with self.acquire(name) as model:
+            t0 = time.perf_counter()
+            scores = model.polarity_scores(text)
+            self._observe(name, time.perf_counter() - t0, 1, 'single')
+        return scores
+
+    def score_batch(self, name: str, texts: List[str]) -> List[dict]:
+        if not texts:
+            return []
+        spec = self._specs[name]
+        with self.acquire(name) as model:
+            t0 = time.perf_counter()
+            if spec.batch:
+                scores = list(model.polarity_scores_batch(texts))
+            else:
+                scores = [model.polarity_scores(t) for t in texts]
+            self._observe(name, time.perf_counter() - t0, len(texts), 'batch')
+        return scores
+
+    # ---- reporting ----
+    def describe(self) -> List[dict]:
+        return [
+            {
+                'name': s.name,
+                'label': s.label,
+                'batch': s.batch,
+                'languages': list(s.languages) if s.languages else None,
+                'description': s.description,
+                'default': s.name == self.default,
+                'available': s.available(),
+            }
+            for s in self._specs.values()
+        ]
+
+    def stats(self) -> Dict[str, dict]:
+        out = {}
+        for name, st in self._state.items():
+            with st.lock:
+                out[name] = {
+                    'loaded': self.loaded(name),
+                    'warmed': st.warmed,
+                    'instances': st.instances,
+                    'load_seconds': st.load_seconds,
+                    'calls': st.calls,
+                    'items': st.items,
+                    'mean_ms_per_item': (st.seconds / st.items * 1000.0) if st.items else None,
+                    'max_call_ms': st.max_seconds * 1000.0 if st.calls else None,
+                }
+        return out
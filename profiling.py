@@ -0,0 +1,139 @@
+"""Opt-in per-request profiling.
+
+Nothing is installed unless PROFILE_TOKEN or PROFILE_SAMPLE_RATE is set, so the request path
+is untouched by default. When installed, the selected view functions are wrapped and a request
+is profiled if:
+
+  * it sends ``X-Profile-Token: <PROFILE_TOKEN>`` (optionally ``X-Profile: cprofile|sample``), or
+  * it is picked by PROFILE_SAMPLE_RATE (0..1).
+
+``cprofile`` runs the handler under cProfile and writes ``.pstats``; ``sample`` polls the
+handler thread's stack every PROFILE_SAMPLE_INTERVAL_MS and writes collapsed stacks
+(``.collapsed``, flamegraph.pl / speedscope compatible). Each profile gets a ``.json`` sidecar
+with endpoint, input size, model and timing. Output goes to ``data/profiles/``.
+"""
+import cProfile
+import functools
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+DEFAULT_ENDPOINTS = ('analyze', 'analyze_file', 'analyze_csv', 'export_pdf', 'chat')
+MODES = ('cprofile', 'sample')
+
+
+class StackSampler:
+    """Poll one thread's Python stack at a fixed interval and count collapsed stacks."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            parts = []
+            while frame is not None:
+                code = frame.f_code
+                parts.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if parts:
+                self.stacks[';'.join(reversed(parts))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+def _input_size(request) -> dict:
+    size = {'content_length': request.content_length}
+    data = request.get_json(silent=True) if request.is_json else None
+    if isinstance(data, dict):
+        for key in ('text', 'message'):
+            if isinstance(data.get(key), str):
+                size['text_chars'] = len(data[key])
+    for name, f in request.files.items():
+        size.setdefault('files', {})[name] = f.filename
+    return size
+
+
+def install_profiler(app, out_dir: str, token=None, sample_rate: float = 0.0, mode: str = 'sample',
+                     interval_ms: float = 5.0, endpoints=DEFAULT_ENDPOINTS) -> bool:
+    """Wrap `endpoints` with the profiling trigger. Returns False (and does nothing) when disabled."""
+    if not token and sample_rate <= 0:
+        return False
+    from flask import g, request
+
+    def should_profile():
+        if token and hmac.compare_digest(request.headers.get('X-Profile-Token', '').encode(), token.encode()):
+            requested = (request.headers.get('X-Profile') or mode).lower()
+            return requested if requested in MODES else mode
+        if sample_rate > 0 and random.random() < sample_rate:
+            return mode
+        return None
+
+    def wrap(view):
+        @functools.wraps(view)
+        def profiled(*args, **kwargs):
+            chosen = should_profile()
+            if chosen is None:
+                return view(*args, **kwargs)
+            t0 = time.perf_counter()
+            if chosen == 'cprofile':
+                prof = cProfile.Profile()
+                try:
+                    return prof.runcall(view, *args, **kwargs)
+                finally:
+                    _save(prof, None, chosen, t0)
+            sampler = StackSampler(threading.get_ident(), interval_ms / 1000.0).start()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                _save(None, sampler.stop(), chosen, t0)
+        return profiled
+
+    def _save(prof, stacks, chosen, t0):
+        elapsed = time.perf_counter() - t0
+        try:
+            os.makedirs(out_dir, exist_ok=True)
+            stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+            base = os.path.join(out_dir, f'{stamp}-{request.endpoint}-{uuid.uuid4().hex[:8]}')
+            if prof is not None:
+                prof.dump_stats(base + '.pstats')
+            else:
+                with open(base + '.collapsed', 'w', encoding='utf-8') as fh:
+                    for stack, n in stacks.most_common():
+                        fh.write(f'{stack} {n}\n')
+            meta = {
+                'endpoint': request.endpoint,
+                'path': request.path,
+                'mode': chosen,
+                'seconds': elapsed,
+                'model': g.get('resolved_model'),
+                'input': _input_size(request),
+                'created_at': stamp,
+            }
+            with open(base + '.json', 'w', encoding='utf-8') as fh:
+                json.dump(meta, fh, indent=2)
+        except Exception:
+            app.logger.exception('failed to write request profile')
+
+    for endpoint in endpoints:
+        if endpoint in app.view_functions:
+            app.view_functions[endpoint] = wrap(app.view_functions[endpoint])
+    return True
@@ -0,0 +1,169 @@
+"""SQLite storage backend for Flask-Limiter / limits, shared by every worker on a node.
+
+Importing this module registers the ``sqlite://`` scheme, e.g.::
+
+    RATELIMIT_STORAGE_URI=sqlite:///dev/shm/sentiment-ratelimit.db   # tmpfs = shared memory
+    RATELIMIT_STORAGE_URI=sqlite://data/ratelimit.db                 # relative path
+
+Each hit is an atomic UPSERT ... RETURNING statement (no read-modify-write race between
+processes). Hits that arrive from several threads while another one is writing are
+group-committed: the next writer applies everything queued in one transaction, so a burst
+costs one write lock instead of one per request, and every caller still gets its exact count.
+Stale windows are swept in batches rather than per request, and the storage keeps call/time
+counters so the per-request limiter cost can be reported. Supports the default fixed-window
+strategy. Needs limits>=5 (the ``incr`` signature).
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from limits.storage import Storage
+
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+_UPSERT = (
+    "INSERT INTO counters (key, count, expiry) VALUES (?, ?, ?) "
+    "ON CONFLICT(key) DO UPDATE SET "
+    "count = CASE WHEN counters.expiry <= ? THEN excluded.count ELSE counters.count + excluded.count END, "
+    "expiry = CASE WHEN counters.expiry <= ? THEN excluded.expiry ELSE counters.expiry END"
+)
+
+
+class _Hit:
+    __slots__ = ('key', 'expiry', 'amount', 'count', 'error')
+
+    def __init__(self, key: str, expiry: float, amount: int):
+        self.key, self.expiry, self.amount = key, expiry, amount
+        self.count: Optional[int] = None
+        self.error: Optional[BaseException] = None
+
+
+class SQLiteStorage(Storage):
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False, sweep_every: int = 1000, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        path = (uri or 'sqlite://data/ratelimit.db').split('://', 1)[1]
+        self.path = path or ':memory:'
+        self.sweep_every = int(sweep_every)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._calls = 0
+        self._seconds = 0.0
+        self._flushes = 0
+        self._since_sweep = 0  # only touched under _write_lock
+        self._pending: List[_Hit] = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, re-opened after fork so workers never share a handle
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")  # counters are disposable; skip fsync on every hit
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, count INTEGER NOT NULL, expiry REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _record(self, t0: float):
+        with self._stats_lock:
+            self._calls += 1
+            self._seconds += time.perf_counter() - t0
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                'calls': self._calls,
+                'flushes': self._flushes,
+                'seconds': self._seconds,
+                'mean_us': (self._seconds / self._calls * 1e6) if self._calls else 0.0,
+            }
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        t0 = time.perf_counter()
+        hit = _Hit(key, expiry, amount)
+        with self._pending_lock:
+            self._pending.append(hit)
+        with self._write_lock:
+            if hit.count is None and hit.error is None:  # not written by the previous holder
+                with self._pending_lock:
+                    batch, self._pending = self._pending, []
+                self._flush(batch)
+        self._record(t0)
+        if hit.error is not None:
+            raise hit.error
+        return hit.count
+
+    def _flush(self, batch: List[_Hit]):
+        """Apply queued hits in one transaction (one statement when alone); called under _write_lock."""
+        now = time.time()
+        conn = self._conn()
+        try:
+            if len(batch) > 1 or not _HAS_RETURNING:
+                conn.execute("BEGIN IMMEDIATE")
+            try:
+                for hit in batch:
+                    params = (hit.key, hit.amount, now + hit.expiry, now, now)
+                    if _HAS_RETURNING:
+                        hit.count = conn.execute(_UPSERT + " RETURNING count", params).fetchone()[0]
+                    else:
+                        conn.execute(_UPSERT, params)
+                        hit.count = conn.execute("SELECT count FROM counters WHERE key = ?", (hit.key,)).fetchone()[0]
+                if conn.in_transaction:
+                    conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        except Exception as exc:
+            for hit in batch:
+                hit.count, hit.error = None, exc
+            return
+        self._flushes += 1
+        self._since_sweep += len(batch)
+        if self._since_sweep >= self.sweep_every:
+            self._since_sweep = 0
+            try:
+                conn.execute("DELETE FROM counters WHERE expiry <= ?", (now,))
+            except sqlite3.Error:
+                pass  # retried at the next sweep
+
+    def get(self, key: str) -> int:
+        t0 = time.perf_counter()
+        row = self._conn().execute(
+            "SELECT count FROM counters WHERE key = ? AND expiry > ?", (key, time.time())
+        ).fetchone()
+        self._record(t0)
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        row = self._conn().execute("SELECT expiry FROM counters WHERE key = ? AND expiry > ?", (key, now)).fetchone()
+        return row[0] if row else now
+
+    def check(self) -> bool:
+        try:
+            self._conn().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        return self._conn().execute("DELETE FROM counters").rowcount
+
+    def clear(self, key: str) -> None:
+        self._conn().execute("DELETE FROM counters WHERE key = ?", (key,))
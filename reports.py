@@ -0,0 +1,495 @@
+"""PDF reports built from results that already exist, rendered in the background, cached by content.
+
+A report is described by a *spec*: plain JSON with a title, analysis items (stored history
+rows, or a result the client already received from ``/analyze``) and batch summaries
+(counts, means, a compound histogram and the most positive / negative rows of a stored CSV
+upload). Nothing in a spec is re-scored: the caller assembles it from the database or from
+the request and ``render_pdf`` only lays it out, with reportlab charts:
+
+* a label pie and per-item compound bars for multi-item reports;
+* a score bar chart, keywords and the word cloud (when the result carries one) for each
+  analysis;
+* a label pie, compound histogram, means and extremes for each batch.
+
+``ReportService`` keys each spec by the SHA-256 of its canonical JSON (``REPORT_VERSION``
+included, so layout changes invalidate old files) and keeps ``<key>.pdf`` files under one
+directory, shared by all workers, next to a ``<key>.owner`` file naming the user it was built
+for (``GET /reports/<key>`` serves it to that user only). While a report renders, ``<key>.json`` holds its spec
+(a worker that finds a stale one re-submits it, e.g. after a restart). A failed render
+leaves ``<key>.err``. Rendering runs in a small process pool (forkserver where available)
+so the reportlab work competes neither with request threads for the GIL nor with their
+memory. ``workers=0`` renders in the calling thread.
+
+    key, status = REPORTS.request(spec)     # 'ready' (cached) or 'pending'
+    REPORTS.wait(key, timeout=30)           # 'ready' / 'failed' / 'pending'
+    REPORTS.pdf_path(key)
+"""
+import base64
+import binascii
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from extraction import trim_lru
+
+REPORT_VERSION = 2
+LABELS = ('Positive', 'Neutral', 'Negative')
+SCORE_FIELDS = ('pos', 'neu', 'neg', 'compound')
+HISTOGRAM_BINS = 10  # compound in [-1, 1], 0.2 wide
+MAX_WORDCLOUD_B64 = 4 * 1024 * 1024
+_LABEL_COLORS = {'Positive': '#2e9d5b', 'Neutral': '#8c8c8c', 'Negative': '#c8453a'}
+
+
+def available() -> bool:
+    try:
+        import reportlab  # type: ignore  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# ---------- spec ----------
+
+def _label_for(compound: float) -> str:
+    if compound >= 0.05:
+        return 'Positive'
+    if compound <= -0.05:
+        return 'Negative'
+    return 'Neutral'
+
+
+def analysis_item(result: dict, text: Optional[str] = None, **meta) -> dict:
+    """Spec entry for one analysis result (an /analyze response or a history row's fields).
+
+    Raises ValueError for results that are not shaped like ours.
+    """
+    scores = result.get('scores') if isinstance(result.get('scores'), dict) else result
+    try:
+        clean = {k: round(max(-1.0, min(1.0, float(scores.get(k) or 0.0))), 4) for k in SCORE_FIELDS}
+    except (TypeError, ValueError):
+        raise ValueError('scores must be numbers')
+    label = result.get('label')
+    if label not in LABELS:
+        label = _label_for(clean['compound'])
+    keywords = result.get('keywords') or []
+    if not isinstance(keywords, list):
+        raise ValueError('keywords must be a list')
+    item = {
+        'label': label,
+        'scores': clean,
+        'snippet': (text if text is not None else result.get('text_snippet') or '')[:300],
+        'keywords': [str(k)[:80] for k in keywords[:10]],
+    }
+    wc = result.get('wordcloud_png_b64')
+    if wc:
+        if not isinstance(wc, str) or len(wc) > MAX_WORDCLOUD_B64:
+            raise ValueError('wordcloud_png_b64 is too large')
+        try:
+            if not base64.b64decode(wc[:24], validate=True).startswith(b'\x89PNG'):
+                raise ValueError('wordcloud_png_b64 is not a PNG')
+        except binascii.Error:
+            raise ValueError('wordcloud_png_b64 is not base64')
+        item['wordcloud_png_b64'] = wc
+    for key in ('id', 'source', 'filename', 'created_at', 'model', 'lang'):
+        value = meta.get(key, result.get(key))
+        if value is not None:
+            item[key] = value
+    return item
+
+
+def make_spec(analyses: List[dict], batches: List[dict], title: Optional[str] = None, owner=None) -> dict:
+    return {
+        'v': REPORT_VERSION,
+        'title': (title or '').strip()[:120] or 'Sentiment Analysis Report',
+        'analyses': analyses,
+        'batches': batches,
+        'owner': owner,  # keeps users' cached reports apart; not printed
+    }
+
+
+def report_key(spec: dict) -> str:
+    canonical = json.dumps(spec, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+# ---------- rendering (runs in the worker processes) ----------
+
+def _pie(counts: Dict[str, int], size: float = 150):
+    from reportlab.graphics.charts.piecharts import Pie
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.lib import colors
+    d = Drawing(size + 90, size + 10)
+    labels = [lab for lab in LABELS if counts.get(lab)]
+    if not labels:
+        return d
+    pie = Pie()
+    pie.x, pie.y, pie.width, pie.height = 5, 5, size, size
+    pie.data = [counts[lab] for lab in labels]
+    pie.labels = [f'{lab} ({counts[lab]})' for lab in labels]
+    pie.sideLabels = True
+    pie.slices.strokeColor = colors.white
+    for i, lab in enumerate(labels):
+        pie.slices[i].fillColor = colors.HexColor(_LABEL_COLORS[lab])
+    d.add(pie)
+    return d
+
+
+def _bars(categories: List[str], values: List[float], lo: float, hi: float, width: float = 230,
+          height: float = 140, bar_colors: Optional[List[str]] = None):
+    from reportlab.graphics.charts.barcharts import VerticalBarChart
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.lib import colors
+    d = Drawing(width + 40, height + 30)
+    chart = VerticalBarChart()
+    chart.x, chart.y, chart.width, chart.height = 35, 20, width, height
+    chart.data = [values or [0]]
+    chart.valueAxis.valueMin, chart.valueAxis.valueMax = lo, hi
+    chart.valueAxis.labels.fontSize = 7
+    chart.categoryAxis.categoryNames = categories or ['']
+    chart.categoryAxis.labels.fontSize = 7
+    chart.categoryAxis.labels.angle = 30 if len(categories) > 6 else 0
+    chart.categoryAxis.labels.boxAnchor = 'ne' if len(categories) > 6 else 'n'
+    chart.bars.strokeColor = None
+    chart.bars[0].fillColor = colors.HexColor('#4a78c2')
+    for i, c in enumerate(bar_colors or []):
+        chart.bars[(0, i)].fillColor = colors.HexColor(c)
+    d.add(chart)
+    return d
+
+
+def _table(rows: List[list], widths: Optional[List[float]] = None, header: bool = True):
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+    t = Table(rows, colWidths=widths, hAlign='LEFT', repeatRows=1 if header else 0)
+    style = [('FONTSIZE', (0, 0), (-1, -1), 8), ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+             ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.grey)]
+    if header:
+        style.append(('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'))
+    t.setStyle(TableStyle(style))
+    return t
+
+
+def _side_by_side(*flowables):
+    from reportlab.platypus import Table
+    return Table([list(flowables)], hAlign='LEFT')
+
+
+def _analysis_section(item: dict, styles, heading: Optional[str]) -> list:
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Image, Paragraph, Spacer
+    out = []
+    if heading:
+        out.append(Paragraph(escape(heading), styles['Heading3']))
+    meta = [f"{k.replace('_', ' ').title()}: {item[k]}" for k in ('model', 'source', 'filename', 'created_at', 'lang')
+            if item.get(k)]
+    if meta:
+        out.append(Paragraph(escape(' · '.join(str(m) for m in meta)), styles['Normal']))
+    if item.get('snippet'):
+        snippet = item['snippet'] + ('…' if len(item['snippet']) >= 300 else '')
+        out.append(Paragraph('<i>' + escape(snippet).replace('\n', '<br/>') + '</i>', styles['Normal']))
+    sc = item['scores']
+    out.append(Spacer(1, 6))
+    out.append(Paragraph(f"<b>Result: {escape(item['label'])}</b> &nbsp; Positive {sc['pos']:.3f} · Neutral {sc['neu']:.3f}"
+                         f" · Negative {sc['neg']:.3f} · Compound {sc['compound']:.3f}", styles['Normal']))
+    chart = _bars(['Positive', 'Neutral', 'Negative'], [sc['pos'], sc['neu'], sc['neg']], 0, 1, width=160, height=90,
+                  bar_colors=[_LABEL_COLORS[lab] for lab in LABELS])
+    if item.get('keywords'):
+        kws = Paragraph('<b>Top keywords</b><br/>' + '<br/>'.join('• ' + escape(k) for k in item['keywords']),
+                        styles['Normal'])
+        out.append(_side_by_side(chart, kws))
+    else:
+        out.append(chart)
+    if item.get('wordcloud_png_b64'):
+        try:
+            img = Image(io.BytesIO(base64.b64decode(item['wordcloud_png_b64'])))
+            scale = min(1.0, 6.5 * inch / img.imageWidth)
+            img.drawWidth, img.drawHeight = img.imageWidth * scale, img.imageHeight * scale
+            out.append(img)
+        except Exception:
+            pass  # a broken image should not cost the whole report
+    out.append(Spacer(1, 12))
+    return out
+
+
+def _overview(analyses: List[dict], styles) -> list:
+    from reportlab.platypus import Paragraph, Spacer
+    counts = {lab: sum(1 for a in analyses if a['label'] == lab) for lab in LABELS}
+    mean = sum(a['scores']['compound'] for a in analyses) / len(analyses)
+    out = [Paragraph('Overview', styles['Heading2']),
+           Paragraph(f'{len(analyses)} analyses · mean compound {mean:.3f}', styles['Normal'])]
+    bars = _bars([f'#{i + 1}' for i in range(len(analyses))], [a['scores']['compound'] for a in analyses], -1, 1,
+                 bar_colors=[_LABEL_COLORS[a['label']] for a in analyses])
+    out.append(_side_by_side(_pie(counts, 110), bars))
+    rows = [['#', 'Date', 'Source', 'Label', 'Compound', 'Text']]
+    for i, a in enumerate(analyses):
+        rows.append([i + 1, (a.get('created_at') or '')[:16], a.get('source') or '', a['label'],
+                     f"{a['scores']['compound']:.3f}", (a.get('snippet') or '')[:60].replace('\n', ' ')])
+    out += [Spacer(1, 6), _table(rows, widths=[22, 80, 45, 50, 50, 250]), Spacer(1, 12)]
+    return out
+
+
+def _batch_section(batch: dict, styles) -> list:
+    from reportlab.platypus import Paragraph, Spacer
+    title = f"Batch #{batch.get('id')}" + (f" — {batch['filename']}" if batch.get('filename') else '')
+    out = [Paragraph(escape(title), styles['Heading2'])]
+    meta = ' · '.join(str(x) for x in (batch.get('source'), batch.get('model'), batch.get('created_at')) if x)
+    means = batch.get('means') or {}
+    out.append(Paragraph(escape(f"{batch.get('row_count', 0)} rows · {meta}"), styles['Normal']))
+    out.append(Paragraph('Mean scores: ' + ' · '.join(f'{k} {float(means.get(k) or 0):.3f}' for k in SCORE_FIELDS),
+                         styles['Normal']))
+    histogram = batch.get('histogram') or []
+    charts = [_pie(batch.get('counts') or {}, 110)]
+    if any(histogram):
+        edges = [-1 + 2 * i / HISTOGRAM_BINS for i in range(HISTOGRAM_BINS)]
+        charts.append(_bars([f'{e:+.1f}' for e in edges], histogram, 0, max(histogram) * 1.1))
+    out.append(_side_by_side(*charts))
+    for name in ('most_negative', 'most_positive'):
+        rows = batch.get(name) or []
+        if rows:
+            out.append(Paragraph(name.replace('_', ' ').capitalize(), styles['Heading4']))
+            table = [['Row', 'Label', 'Compound', 'Text']]
+            table += [[r.get('row_idx'), r.get('label'), f"{float(r.get('compound') or 0):.3f}",
+                       (r.get('snippet') or '')[:80].replace('\n', ' ')] for r in rows]
+            out.append(_table(table, widths=[35, 50, 55, 350]))
+    out.append(Spacer(1, 12))
+    return out
+
+
+def render_pdf(spec: dict) -> bytes:
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate
+    styles = getSampleStyleSheet()
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=letter, title=spec.get('title') or '', leftMargin=54, rightMargin=54,
+                            topMargin=54, bottomMargin=54)
+    story = [Paragraph(escape(spec.get('title') or 'Sentiment Analysis Report'), styles['Title']),
+             # files are shared by every request for the same spec, so this is when the file was made
+             Paragraph(f"Rendered: {datetime.utcnow().isoformat(timespec='seconds')}Z", styles['Normal'])]
+    analyses = spec.get('analyses') or []
+    if len(analyses) > 1:
+        story += _overview(analyses, styles)
+    for i, item in enumerate(analyses):
+        story += _analysis_section(item, styles, f'Analysis #{i + 1}' if len(analyses) > 1 else None)
+    for batch in spec.get('batches') or []:
+        story += _batch_section(batch, styles)
+    doc.build(story)
+    return buf.getvalue()
+
+
+def render_to_file(spec: dict, path: str) -> int:
+    """Render `spec` to `path` atomically; returns the size in bytes."""
+    data = render_pdf(spec)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+    return len(data)
+
+
+# ---------- service ----------
+
+class ReportService:
+    def __init__(self, directory: str, workers: int = 1, max_bytes: int = 256 * 1024 * 1024,
+                 stale_after: float = 120.0, metrics=None):
+        self.directory = directory
+        self.workers = max(0, int(workers))
+        self.max_bytes = max_bytes
+        self.stale_after = stale_after
+        self.metrics = metrics
+        self._futures: Dict[str, Future] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._renders = 0
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+        if metrics is not None:
+            metrics.describe('sentiment_reports_rendered_total', 'counter', 'PDF reports rendered, by outcome.')
+
+    def _reset(self):
+        self._pool = None
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, f'{key}.{ext}')
+
+    def pdf_path(self, key: str) -> str:
+        return self._path(key, 'pdf')
+
+    def error(self, key: str) -> Optional[str]:
+        try:
+            with open(self._path(key, 'err'), encoding='utf-8') as fh:
+                return fh.read()
+        except OSError:
+            return None
+
+    def belongs_to(self, key: str, owner) -> bool:
+        """Whether the report `key` was requested for `owner` (None: anonymous)."""
+        try:
+            with open(self._path(key, 'owner'), encoding='utf-8') as fh:
+                return json.load(fh) == owner
+        except (OSError, ValueError):
+            return False
+
+    def _write_owner(self, key: str, owner):
+        path = self._path(key, 'owner')
+        if os.path.exists(path):
+            return
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as fh:
+                json.dump(owner, fh)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def _trim(self):
+        trim_lru(self.directory, self.max_bytes, '.pdf')
+        try:
+            names = set(os.listdir(self.directory))
+        except OSError:
+            return
+        for name in names:
+            key, _, ext = name.partition('.')
+            if ext == 'owner' and f'{key}.pdf' not in names and f'{key}.json' not in names:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def status(self, key: str) -> Optional[str]:
+        """'ready', 'pending', 'failed' or None (unknown key)."""
+        if not (len(key) == 64 and all(c in '0123456789abcdef' for c in key)):
+            return None
+        if os.path.exists(self.pdf_path(key)):
+            return 'ready'
+        fut = self._futures.get(key)
+        if fut is not None and fut.done() and fut.exception() is not None:
+            return 'failed'
+        spec_path = self._path(key, 'json')
+        try:
+            age = time.time() - os.path.getmtime(spec_path)
+        except OSError:
+            return 'failed' if os.path.exists(self._path(key, 'err')) else None
+        if key not in self._futures and age > self.stale_after:
+            # queued by a worker that has since gone away: render it here
+            try:
+                with open(spec_path, encoding='utf-8') as fh:
+                    self._submit(key, json.load(fh))
+            except (OSError, ValueError):
+                return None
+        return 'pending'
+
+    def request(self, spec: dict) -> Tuple[str, str]:
+        """(key, status) for `spec`; queues a render unless the PDF is cached or already rendering."""
+        key = report_key(spec)
+        self._write_owner(key, spec.get('owner'))
+        path = self.pdf_path(key)
+        if os.path.exists(path):
+            try:
+                os.utime(path)  # recency for trimming
+            except OSError:
+                pass
+            self._count('sentiment_cache_hits_total')
+            return key, 'ready'
+        self._count('sentiment_cache_misses_total')
+        with self._lock:
+            if key in self._futures:
+                return key, 'pending'
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            os.remove(self._path(key, 'err'))  # asking again retries a failed render
+        except OSError:
+            pass
+        spec_path = self._path(key, 'json')
+        tmp = f'{spec_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(spec, fh, ensure_ascii=False)
+        os.replace(tmp, spec_path)
+        self._submit(key, spec)
+        return key, self.status(key) or 'pending'
+
+    def wait(self, key: str, timeout: Optional[float] = None) -> Optional[str]:
+        """Status of `key` after waiting up to `timeout` for a render started by this process."""
+        fut = self._futures.get(key)
+        if fut is not None:
+            try:
+                fut.result(timeout=timeout)
+            except Exception:
+                pass
+        return self.status(key)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+        return self._pool
+
+    def _submit(self, key: str, spec: dict):
+        # _futures holds a future that completes after _finished has cleaned up, so wait() and
+        # status() never see a render whose .err/.json files are still being written
+        done: Future = Future()
+        with self._lock:
+            if key in self._futures:
+                return
+            self._futures[key] = done
+            if self.workers:
+                try:
+                    fut = self._executor().submit(render_to_file, spec, self.pdf_path(key))
+                except BrokenProcessPool:  # a render worker died; start a new pool
+                    self._pool = None
+                    fut = self._executor().submit(render_to_file, spec, self.pdf_path(key))
+        if not self.workers:
+            fut = Future()
+            try:
+                fut.set_result(render_to_file(spec, self.pdf_path(key)))
+            except Exception as exc:
+                fut.set_exception(exc)
+        fut.add_done_callback(lambda f: self._finished(key, f, done))
+
+    def _finished(self, key: str, fut: Future, done: Future):
+        exc = fut.exception()
+        if exc is not None:
+            try:
+                with open(self._path(key, 'err'), 'w', encoding='utf-8') as fh:
+                    fh.write(f'{type(exc).__name__}: {exc}'[:500])
+            except OSError:
+                pass
+        try:
+            os.remove(self._path(key, 'json'))
+        except OSError:
+            pass
+        with self._lock:
+            self._futures.pop(key, None)
+            self._renders += 1
+            trim = self._renders % 16 == 1
+        if self.metrics is not None:
+            self.metrics.inc('sentiment_reports_rendered_total', 1, status='error' if exc is not None else 'ok')
+        if trim:
+            self._trim()
+        if exc is not None:
+            done.set_exception(exc)
+        else:
+            done.set_result(fut.result())
+
+    def _count(self, name: str):
+        if self.metrics is not None:
+            self.metrics.inc(name, 1, cache='report')
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
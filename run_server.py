@@ -1,5 +1,142 @@
-from app import app
+"""Production launcher.
+
+On POSIX with gunicorn installed this runs a pre-fork server: the parent imports the app,
+calls warm_up() (VADER lexicon, YAKE, langdetect profiles, WordCloud) and freezes the GC so
+forked workers share those pages copy-on-write. Workers are recycled after --max-requests
+(plus jitter) to cap memory growth; send SIGHUP for a graceful worker reload. Static assets
+are fingerprinted and precompressed into static/dist/ first (see static_assets.py).
+
+Elsewhere (e.g. Windows) it falls back to waitress if installed, else the Flask server.
+
+    python run_server.py --workers 4 --threads 4 --bind 0.0.0.0:8000
+"""
+import argparse
+import gc
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _parse_args(argv=None):
+    p = argparse.ArgumentParser(description='Run the sentiment app with a production server.')
+    p.add_argument('--bind', default=os.environ.get('WEB_BIND', '127.0.0.1:' + os.environ.get('PORT', '5000')))
+    p.add_argument('--workers', type=int, default=_env_int('WEB_WORKERS', os.cpu_count() or 2))
+    p.add_argument('--threads', type=int, default=_env_int('WEB_THREADS', 4), help='threads per worker')
+    p.add_argument('--max-requests', type=int, default=_env_int('WEB_MAX_REQUESTS', 1000),
+                   help='recycle a worker after this many requests (0 disables)')
+    p.add_argument('--max-requests-jitter', type=int, default=_env_int('WEB_MAX_REQUESTS_JITTER', 100))
+    p.add_argument('--timeout', type=int, default=_env_int('WEB_TIMEOUT', 60))
+    p.add_argument('--graceful-timeout', type=int, default=_env_int('WEB_GRACEFUL_TIMEOUT', 30))
+    p.add_argument('--no-warmup', action='store_true', help='skip preloading lexicons/extractors in the parent')
+    p.add_argument('--no-asset-build', action='store_true', help='serve static/ as-is instead of building static/dist/')
+    p.add_argument('--no-lexicon-build', action='store_true', help='skip compiling data/lexicon/ before the workers start')
+    return p.parse_args(argv)
+
+
+def load_app(warm: bool = True):
+    from app import app, warm_up
+    if warm:
+        warm_up()
+        # Move everything loaded so far out of GC tracking so collections in the workers
+        # don't write to (and un-share) the preloaded pages.
+        gc.freeze()
+    return app
+
+
+def gunicorn_options(args) -> dict:
+    return {
+        'bind': args.bind,
+        'workers': max(1, args.workers),
+        'worker_class': 'gthread',
+        'threads': max(1, args.threads),
+        'preload_app': True,
+        'max_requests': max(0, args.max_requests),
+        'max_requests_jitter': max(0, args.max_requests_jitter),
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'accesslog': '-',
+    }
+
+
+def run_gunicorn(args) -> bool:
+    try:
+        from gunicorn.app.base import BaseApplication  # type: ignore
+    except ImportError:
+        return False
+
+    class _Launcher(BaseApplication):
+        def load_config(self):
+            for key, value in gunicorn_options(args).items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # preload_app=True: runs once in the parent before workers are forked
+            return load_app(warm=not args.no_warmup)
+
+    _Launcher().run()
+    return True
+
+
+def run_fallback(args):
+    host, _, port = args.bind.rpartition(':')
+    app = load_app(warm=not args.no_warmup)
+    try:
+        from waitress import serve  # type: ignore
+    except ImportError:
+        # No reloader, no debug
+        app.run(host=host or '127.0.0.1', port=int(port), debug=False, threaded=True)
+        return
+    serve(app, host=host or '127.0.0.1', port=int(port), threads=max(1, args.threads))
+
+
+def _default_ratelimit_uri() -> str:
+    # tmpfs keeps the shared counters in memory; fall back to the data dir elsewhere
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+    return 'sqlite://' + os.path.join(base, 'sentiment-ratelimit.db')
+
+
+def _default_metrics_dir() -> str:
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+    return os.path.join(base, 'sentiment-metrics')
+
+
+def _reset_metrics_dir(path: str):
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(('.json', '.tmp')):
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:
+                pass
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    # Per-process memory:// limits would be N times looser across workers
+    os.environ.setdefault('RATELIMIT_STORAGE_URI', _default_ratelimit_uri())
+    # Each worker snapshots its metrics here so /metrics can merge them; start from a clean dir
+    metrics_dir = os.environ.setdefault('METRICS_DIR', _default_metrics_dir())
+    _reset_metrics_dir(metrics_dir)
+    if not args.no_asset_build:
+        # Fingerprinted + precompressed static files; must exist before the app reads the manifest
+        import static_assets
+        static_assets.build(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    if not args.no_lexicon_build and os.environ.get('LEXICON_MMAP', '1') != '0':
+        # Compile once here so workers only map the files (and share their pages) instead of racing to build
+        import mapped_tables
+        root = os.path.dirname(os.path.abspath(__file__))
+        mapped_tables.build(os.environ.get('LEXICON_DIR') or os.path.join(root, 'data', 'lexicon'))
+    # One slow-request log per worker so size-based rotation never races between processes
+    os.environ.setdefault('SLOW_LOG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'slow', 'slow_requests-{pid}.jsonl'))
+    if os.name == 'posix' and run_gunicorn(args):
+        return
+    run_fallback(args)
+
 
 if __name__ == "__main__":
-    # Production-like simple runner (no reloader, no debug, bound only to localhost for safety)
-    app.run(host="127.0.0.1", port=5000, debug=False)
+    main()
@@ -0,0 +1,426 @@
+"""Python client for the sentiment API (standard library only).
+
+    from sentiment_client import SentimentClient
+
+    with SentimentClient('http://127.0.0.1:5000') as api:
+        api.analyze('I love it')                       # POST /analyze (keywords, lang, ...)
+        api.score_many(texts)                          # bulk: label + scores via /analyze_csv
+        api.analyze_file('report.pdf')
+        api.chat('hello', tone='coaching')
+        api.history(limit=20)                          # revalidated with If-None-Match
+
+``SentimentClient`` keeps a pool of keep-alive HTTP/1.1 connections, so calls from many
+threads reuse sockets instead of reconnecting. ``score_many`` packs texts into CSV uploads of
+``batch_size`` rows: one request (and one rate-limit hit) per batch instead of per text.
+Responses are requested gzip-compressed.
+
+Failed calls are retried for 429/502/503/504 and for connection errors. A 429 or 503 waits for
+the server's ``Retry-After``; other failures use exponential backoff with full jitter. When
+``Retry-After`` is longer than ``RetryPolicy.max_retry_after``, or the retries run out,
+``RateLimited`` or ``APIError`` is raised.
+
+POSTs are not idempotent (each analysis is stored in the history), so they are only retried
+when the server cannot have run them: a 429 or 503, or a connection error before the request
+was sent. A timeout, a dropped connection or a 502/504 after sending raises instead, unless
+``RetryPolicy(retry_post=True)`` accepts possible duplicates.
+
+``AsyncSentimentClient`` offers the same calls as coroutines. Concurrent ``score()`` calls
+made within ``batch_window`` seconds are coalesced into a single bulk request.
+"""
+import asyncio
+import csv
+import email.utils
+import gzip
+import http.client
+import io
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+from urllib.parse import urlencode, urlsplit
+
+__all__ = ['APIError', 'RateLimited', 'RetryPolicy', 'SentimentClient', 'AsyncSentimentClient']
+
+SCORE_FIELDS = ('pos', 'neu', 'neg', 'compound')
+_RETRY_STATUSES = frozenset({429, 502, 503, 504})
+_IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+_REFUSED_STATUSES = frozenset({429, 503})  # rate limit and admission control answer before the handler runs
+# a reused keep-alive socket the server already closed fails with one of these
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError, BrokenPipeError)
+
+
+class APIError(Exception):
+    def __init__(self, status: int, message: str, payload=None):
+        super().__init__(f'{status}: {message}')
+        self.status = status
+        self.payload = payload
+
+
+class RateLimited(APIError):
+    def __init__(self, message: str, retry_after: Optional[float], payload=None):
+        super().__init__(429, message, payload)
+        self.retry_after = retry_after
+
+
+class _NotSent(ConnectionError):
+    """A connection error raised before the server received the whole request."""
+
+
+class Response:
+    __slots__ = ('status', 'headers', 'body')
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body.decode('utf-8')) if self.body else None
+
+    def text(self) -> str:
+        return self.body.decode('utf-8')
+
+
+class RetryPolicy:
+    def __init__(self, max_retries: int = 4, backoff: float = 0.25, max_backoff: float = 10.0,
+                 max_retry_after: float = 60.0, statuses: Iterable[int] = _RETRY_STATUSES, retry_post: bool = False):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.statuses = frozenset(statuses)
+        self.retry_post = retry_post  # also retry POSTs the server may already have run
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before retry number `attempt` (0-based)."""
+        if retry_after is not None:
+            return retry_after + random.uniform(0, min(1.0, self.backoff))  # spread clients sharing a window
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _multipart(field: str, filename: str, data: bytes, content_type: str):
+    boundary = uuid.uuid4().hex
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n').encode('utf-8')
+    return head + data + f'\r\n--{boundary}--\r\n'.encode('ascii'), f'multipart/form-data; boundary={boundary}'
+
+
+class _ConnectionPool:
+    """Up to `size` idle keep-alive connections; more are opened under load and dropped after."""
+
+    def __init__(self, base_url: str, size: int, timeout: float):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or 'http'
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=max(1, size))
+        self.opened = 0
+
+    def _new(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        self.opened += 1
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def get(self):
+        """(connection, reused?)"""
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._new(), False
+
+    def put(self, conn) -> None:
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class SentimentClient:
+    def __init__(self, base_url: str = 'http://127.0.0.1:5000', pool_size: int = 8, timeout: float = 30.0,
+                 retry: Optional[RetryPolicy] = None, batch_size: int = 1000, headers: Optional[Dict[str, str]] = None):
+        self.base_url = base_url
+        self.retry = retry or RetryPolicy()
+        self.batch_size = max(1, batch_size)
+        self.headers = dict(headers or {})
+        self._pool = _ConnectionPool(base_url, pool_size, timeout)
+        self._cookies: Dict[str, str] = {}
+        self._etags: Dict[str, tuple] = {}  # path+query -> (etag, parsed body)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+
+    # ---- transport ----
+    def _send(self, method: str, path: str, body: Optional[bytes], headers: Dict[str, str]) -> Response:
+        for fresh_attempt in (False, True):
+            conn, reused = self._pool.get()
+            sent = False
+            try:
+                conn.request(method, self._pool.prefix + path, body=body, headers=headers)
+                sent = True
+                resp = conn.getresponse()
+                data = resp.read()
+            except BaseException as exc:
+                conn.close()
+                if isinstance(exc, _STALE_ERRORS) and reused and not fresh_attempt:
+                    continue  # the server closed an idle connection; retry once on a new one
+                if not sent and isinstance(exc, (OSError, http.client.HTTPException)):
+                    raise _NotSent(str(exc)) from exc
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._pool.put(conn)
+            resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+            if resp_headers.get('content-encoding') == 'gzip':
+                data = gzip.decompress(data)
+            for cookie in resp.headers.get_all('Set-Cookie') or []:
+                name, _, rest = cookie.partition('=')
+                with self._lock:
+                    self._cookies[name.strip()] = rest.split(';', 1)[0]
+            return Response(resp.status, resp_headers, data)
+        raise AssertionError('unreachable')
+
+    def request(self, method: str, path: str, params: Optional[dict] = None, json_body=None,
+                body: Optional[bytes] = None, content_type: Optional[str] = None,
+                headers: Optional[Dict[str, str]] = None, ok=(200,)) -> Response:
+        """Send a request with retries; returns the Response or raises APIError/RateLimited."""
+        query = {k: v for k, v in (params or {}).items() if v is not None}
+        if query:
+            path = f'{path}?{urlencode(query)}'
+        hdrs = {'Accept-Encoding': 'gzip', **self.headers, **(headers or {})}
+        if json_body is not None:
+            body = json.dumps(json_body).encode('utf-8')
+            content_type = 'application/json'
+        if content_type:
+            hdrs['Content-Type'] = content_type
+        with self._lock:
+            if self._cookies:
+                hdrs['Cookie'] = '; '.join(f'{k}={v}' for k, v in self._cookies.items())
+        idempotent = method.upper() in _IDEMPOTENT_METHODS or self.retry.retry_post
+        attempt = 0
+        while True:
+            self.requests += 1
+            try:
+                resp = self._send(method, path, body, hdrs)
+            except (OSError, http.client.HTTPException) as exc:
+                if attempt >= self.retry.max_retries or not (idempotent or isinstance(exc, _NotSent)):
+                    raise APIError(0, f'connection failed: {exc}') from exc
+                time.sleep(self.retry.delay(attempt))
+                attempt += 1
+                self.retries += 1
+                continue
+            if resp.status in ok:
+                return resp
+            retry_after = parse_retry_after(resp.headers.get('retry-after'))
+            retryable = (resp.status in self.retry.statuses and attempt < self.retry.max_retries
+                         and (idempotent or resp.status in _REFUSED_STATUSES))
+            if retryable and retry_after is not None and retry_after > self.retry.max_retry_after:
+                retryable = False
+            if not retryable:
+                try:
+                    payload = resp.json()
+                except ValueError:
+                    payload = resp.body[:500].decode('utf-8', 'replace')
+                message = payload.get('error') if isinstance(payload, dict) and payload.get('error') else str(payload)[:200]
+                if resp.status == 429:
+                    raise RateLimited(message, retry_after, payload)
+                raise APIError(resp.status, message, payload)
+            time.sleep(self.retry.delay(attempt, retry_after if resp.status in (429, 503) else None))
+            attempt += 1
+            self.retries += 1
+
+    def close(self) -> None:
+        self._pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self) -> dict:
+        return {'requests': self.requests, 'retries': self.retries, 'connections_opened': self._pool.opened}
+
+    # ---- endpoints ----
+    def analyze(self, text: str, model: Optional[str] = None) -> dict:
+        """Full single-text analysis: label, scores, lang, keywords, word cloud."""
+        return self.request('POST', '/analyze', json_body={'text': text, 'model': model}).json()
+
+    def score_many(self, texts: Sequence[str], model: Optional[str] = None, detect_lang: bool = False,
+                   batch_size: Optional[int] = None) -> List[dict]:
+        """[{label, scores, (lang)}] for `texts`, in order, sent as CSV batches to /analyze_csv."""
+        out: List[dict] = []
+        size = batch_size or self.batch_size
+        for start in range(0, len(texts), size):
+            out.extend(self._score_batch(texts[start:start + size], model, detect_lang))
+        return out
+
+    def _score_batch(self, texts: Sequence[str], model: Optional[str], detect_lang: bool) -> List[dict]:
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow(['i', 'text'])
+        w.writerows((i, t or '') for i, t in enumerate(texts))
+        body, ctype = _multipart('file', 'batch.csv', buf.getvalue().encode('utf-8'), 'text/csv')
+        params = {'format': 'csv', 'col': 'text', 'model': model, 'details': '0',
+                  'detect_lang': '1' if detect_lang else None}
+        resp = self.request('POST', '/analyze_csv', params=params, body=body, content_type=ctype)
+        results: List[Optional[dict]] = [None] * len(texts)
+        for row in csv.DictReader(io.StringIO(resp.text())):
+            item = {'label': row['label'], 'scores': {k: float(row[k]) for k in SCORE_FIELDS}}
+            if detect_lang:
+                item['lang'] = row.get('lang')
+            results[int(row['i'])] = item
+        if any(r is None for r in results):
+            raise APIError(resp.status, 'bulk response is missing rows')
+        return results  # type: ignore[return-value]
+
+    def analyze_file(self, file: Union[str, bytes], filename: Optional[str] = None, model: Optional[str] = None) -> dict:
+        """Analyze a .txt/.pdf/.docx file given as a path or bytes."""
+        data, filename = self._file_bytes(file, filename)
+        body, ctype = _multipart('file', filename, data, 'application/octet-stream')
+        return self.request('POST', '/analyze_file', params={'model': model}, body=body, content_type=ctype).json()
+
+    def analyze_csv(self, file: Union[str, bytes], filename: Optional[str] = None, col: Optional[str] = None,
+                    model: Optional[str] = None, detect_lang: bool = False, as_csv: bool = False):
+        """Upload a CSV/XLSX as is; JSON preview (first 50 rows), or the full CSV text with as_csv."""
+        data, filename = self._file_bytes(file, filename or 'data.csv')
+        body, ctype = _multipart('file', filename, data, 'text/csv')
+        params = {'col': col, 'model': model, 'detect_lang': '1' if detect_lang else None,
+                  'format': 'csv' if as_csv else None}
+        resp = self.request('POST', '/analyze_csv', params=params, body=body, content_type=ctype)
+        return resp.text() if as_csv else resp.json()
+
+    def chat(self, message: str, tone: Optional[str] = None, model: Optional[str] = None) -> dict:
+        return self.request('POST', '/chat', json_body={'message': message, 'tone': tone, 'model': model}).json()
+
+    def history(self, limit: int = 10) -> List[dict]:
+        """Recent analyses (of the logged-in user, if any); unchanged pages come back as 304s."""
+        key = f'/history?limit={limit}'
+        cached = self._etags.get(key)
+        headers = {'If-None-Match': cached[0]} if cached else None
+        resp = self.request('GET', '/history', params={'limit': limit}, headers=headers, ok=(200, 304))
+        if resp.status == 304 and cached:
+            return cached[1]
+        items = resp.json().get('items', [])
+        if resp.headers.get('etag'):
+            self._etags[key] = (resp.headers['etag'], items)
+        return items
+
+    def login(self, email: str, password: str) -> None:
+        """Start a session (cookie kept for later calls); raises APIError on bad credentials."""
+        self.request('POST', '/login', json_body={'email': email, 'password': password}, ok=(200, 302, 303))
+        self._etags.clear()
+
+    @staticmethod
+    def _file_bytes(file: Union[str, bytes], filename: Optional[str]):
+        if isinstance(file, (bytes, bytearray)):
+            return bytes(file), filename or 'upload.txt'
+        with open(file, 'rb') as fh:
+            return fh.read(), filename or os.path.basename(file)
+
+
+class AsyncSentimentClient:
+    """asyncio front end: calls run on a thread pool over a shared ``SentimentClient``."""
+
+    def __init__(self, base_url: str = 'http://127.0.0.1:5000', pool_size: int = 8, batch_window: float = 0.01,
+                 **kwargs):
+        self.sync = SentimentClient(base_url, pool_size=pool_size, **kwargs)
+        self.batch_window = batch_window
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='sentiment-client')
+        self._pending: Dict[tuple, list] = {}  # (model, detect_lang) -> [(text, future), ...]
+
+    async def _call(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+
+    async def analyze(self, text: str, model: Optional[str] = None) -> dict:
+        return await self._call(self.sync.analyze, text, model)
+
+    async def score_many(self, texts: Sequence[str], model: Optional[str] = None, detect_lang: bool = False) -> List[dict]:
+        """Like SentimentClient.score_many, with the batches sent concurrently."""
+        size = self.sync.batch_size
+        parts = await asyncio.gather(*(self._call(self.sync._score_batch, texts[i:i + size], model, detect_lang)
+                                       for i in range(0, len(texts), size)))
+        return [item for part in parts for item in part]
+
+    async def score(self, text: str, model: Optional[str] = None, detect_lang: bool = False) -> dict:
+        """Label and scores for one text; concurrent calls are coalesced into bulk requests."""
+        loop = asyncio.get_running_loop()
+        key = (model, detect_lang)
+        fut = loop.create_future()
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            loop.call_later(self.batch_window, lambda: asyncio.ensure_future(self._flush(key)))
+        batch.append((text, fut))
+        if len(batch) >= self.sync.batch_size:
+            await self._flush(key)
+        return await fut
+
+    async def _flush(self, key: tuple) -> None:
+        batch = self._pending.pop(key, None)
+        if not batch:
+            return
+        try:
+            results = await self._call(self.sync._score_batch, [t for t, _ in batch], *key)
+        except Exception as exc:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+        for (_, fut), res in zip(batch, results):
+            if not fut.done():
+                fut.set_result(res)
+
+    async def analyze_file(self, file, filename: Optional[str] = None, model: Optional[str] = None) -> dict:
+        return await self._call(self.sync.analyze_file, file, filename, model)
+
+    async def analyze_csv(self, file, **kwargs):
+        return await self._call(self.sync.analyze_csv, file, **kwargs)
+
+    async def chat(self, message: str, tone: Optional[str] = None, model: Optional[str] = None) -> dict:
+        return await self._call(self.sync.chat, message, tone, model)
+
+    async def history(self, limit: int = 10) -> List[dict]:
+        return await self._call(self.sync.history, limit)
+
+    async def login(self, email: str, password: str) -> None:
+        await self._call(self.sync.login, email, password)
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self.sync.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
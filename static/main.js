@@ -187,6 +187,9 @@ function renderResult(data) {
   adjustExpandedSectionHeight(summaryEl);
 }
 
+// last /analyze result, sent with Export PDF so the server does not score the same text again
+let lastAnalysis = null;
+
 analyzeBtn?.addEventListener('click', async () => {
   const text = textEl.value.trim();
   const model = (modelSelect?.value || 'vader');
@@ -201,6 +204,7 @@ analyzeBtn?.addEventListener('click', async () => {
     const txt = await resp.text();
     if (!txt) { summaryEl.innerText = 'Empty response from server'; return; }
     const data = JSON.parse(txt);
+    lastAnalysis = {text, model, result: data};
     renderResult(data);
   } catch (err) {
     summaryEl.innerText = 'Network or server error: ' + err.message;
@@ -315,7 +319,17 @@ exportPdfBtn?.addEventListener('click', async () => {
   if (!text) { alert('Enter text first'); return; }
   const model = (modelSelect?.value || 'vader');
   try {
-    const resp = await fetch(exportPdfUrl, { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({text, model}) });
+    const body = {text, model};
+    if (lastAnalysis && lastAnalysis.text === text && lastAnalysis.model === model) body.result = lastAnalysis.result;
+    let resp = await fetch(exportPdfUrl, { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify(body) });
+    // 202: still rendering; poll its Location until the PDF is there
+    for (let polls = 0; resp.status === 202 && polls < 120; polls++) {
+      const wait = Math.min(10, Number(resp.headers.get('Retry-After')) || 1);
+      const location = resp.headers.get('Location');
+      await new Promise(r => setTimeout(r, wait * 1000));
+      resp = await fetch(location);
+    }
+    if (resp.status === 202) { alert('The PDF is still rendering; try again in a minute.'); return; }
     if (!resp.ok) { const m = await resp.text(); alert('Failed to export PDF: ' + (m || resp.statusText)); return; }
     const blob = await resp.blob();
     const url = URL.createObjectURL(blob);
@@ -365,9 +379,48 @@ function renderHistory(){
     const tdSnippet = document.createElement('td'); const snippet = (r.text_snippet || ''); tdSnippet.title = snippet; tdSnippet.textContent = snippet.length>60 ? snippet.slice(0,60)+'…' : snippet;
     tr.appendChild(tdDate); tr.appendChild(tdSource); tr.appendChild(tdLabel); tr.appendChild(tdScores); tr.appendChild(tdSnippet);
     historyTableBody.appendChild(tr);
+    if (r.batch_id) {
+      // Batch uploads are a single summary row; expand to show stored per-row detail
+      const expanded = batchExpanded.has(r.batch_id);
+      const toggle = document.createElement('button'); toggle.type = 'button'; toggle.className = 'ghost batch-toggle';
+      toggle.textContent = (expanded ? '▾ ' : '▸ ') + `${r.row_count ?? ''} rows`;
+      toggle.setAttribute('aria-expanded', expanded ? 'true' : 'false');
+      toggle.addEventListener('click', ()=> toggleBatch(r.batch_id));
+      tdSnippet.textContent = ''; tdSnippet.appendChild(toggle);
+      if (expanded) renderBatchItems(r.batch_id);
+    }
   });
 }
 
+// batch_id -> loaded detail rows (null while loading)
+const batchExpanded = new Map();
+
+function renderBatchItems(batchId){
+  const items = batchExpanded.get(batchId);
+  const add = (cells) => {
+    const tr = document.createElement('tr'); tr.className = 'batch-item';
+    cells.forEach(c => { const td = document.createElement('td'); if (c instanceof Node) td.appendChild(c); else td.textContent = c; tr.appendChild(td); });
+    historyTableBody.appendChild(tr);
+  };
+  if (!items) { add(['', '', '', '', 'Loading...']); return; }
+  if (!items.length) { add(['', '', '', '', 'No row details stored']); return; }
+  items.forEach(it => {
+    const span = document.createElement('span'); span.className = 'badge ' + (it.label === 'Positive' ? 'pos' : it.label === 'Negative' ? 'neg' : 'neu'); span.textContent = it.label || '';
+    add([`#${it.row_idx + 1}`, '', span, `${fmtNum(it.pos)}/${fmtNum(it.neg)}/${fmtNum(it.neu)}/${fmtNum(it.compound)}`, it.snippet || '']);
+  });
+}
+
+async function toggleBatch(batchId){
+  if (batchExpanded.has(batchId)) { batchExpanded.delete(batchId); renderHistory(); return; }
+  batchExpanded.set(batchId, null); renderHistory();
+  try {
+    const resp = await fetch(backendOrigin + `/history/batch/${batchId}?limit=100`);
+    const data = resp.ok ? await resp.json() : null;
+    if (batchExpanded.has(batchId)) batchExpanded.set(batchId, data?.batch?.items || []);
+  } catch(e){ if (batchExpanded.has(batchId)) batchExpanded.set(batchId, []); }
+  renderHistory();
+}
+
 async function loadHistory(){
   try {
     const resp = await fetch(historyUrl);
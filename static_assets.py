@@ -0,0 +1,161 @@
+"""Fingerprinted, precompressed static assets.
+
+``build()`` copies every file in ``static/`` to ``static/dist/<name>.<hash>.<ext>`` (content
+SHA-256, 12 hex chars), writes ``.gz`` and, when the ``brotli`` package is installed, ``.br``
+siblings for text assets, and records the mapping in ``static/dist/manifest.json``. Outputs
+are deterministic, so rebuilding unchanged sources is a no-op.
+
+``install(app)`` makes ``url_for('static', filename='main.js')`` resolve to the fingerprinted
+name whenever a manifest exists and serves ``/static/dist/...`` with
+``Cache-Control: public, max-age=31536000, immutable``, picking the ``.br``/``.gz`` variant the
+client accepts. Without a manifest (e.g. a fresh checkout) the plain files are served as before.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+from typing import Optional
+
+try:  # optional: brotli variants are skipped when the package is missing
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover
+    brotli = None
+
+DIST_DIRNAME = 'dist'
+MANIFEST_NAME = 'manifest.json'
+HASH_CHARS = 12
+COMPRESSIBLE = ('.js', '.css', '.svg', '.json', '.txt', '.html', '.map')
+IMMUTABLE_MAX_AGE = 31536000
+
+
+def _fingerprinted(name: str, digest: str) -> str:
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{digest[:HASH_CHARS]}{ext}'
+
+
+def _write_if_changed(path: str, data: bytes) -> bool:
+    try:
+        with open(path, 'rb') as fh:
+            if fh.read() == data:
+                return False
+    except OSError:
+        pass
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+    return True
+
+
+def build(static_dir: str, prune: bool = True) -> dict:
+    """Fingerprint and precompress everything under `static_dir`; returns the manifest."""
+    dist = os.path.join(static_dir, DIST_DIRNAME)
+    os.makedirs(dist, exist_ok=True)
+    manifest, written = {}, set()
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist]
+        for fname in sorted(files):
+            src = os.path.join(root, fname)
+            rel = os.path.relpath(src, static_dir).replace(os.sep, '/')
+            with open(src, 'rb') as fh:
+                data = fh.read()
+            out_rel = _fingerprinted(rel, hashlib.sha256(data).hexdigest())
+            out = os.path.join(dist, out_rel)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            _write_if_changed(out, data)
+            written.add(out)
+            if rel.endswith(COMPRESSIBLE):
+                # mtime=0 keeps the .gz bytes stable across builds
+                _write_if_changed(out + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+                written.add(out + '.gz')
+                if brotli is not None:
+                    _write_if_changed(out + '.br', brotli.compress(data, quality=11))
+                    written.add(out + '.br')
+            manifest[rel] = f'{DIST_DIRNAME}/{out_rel}'
+    manifest_path = os.path.join(dist, MANIFEST_NAME)
+    _write_if_changed(manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    written.add(manifest_path)
+    if prune:
+        for root, _, files in os.walk(dist):
+            for fname in files:
+                path = os.path.join(root, fname)
+                if path not in written:
+                    os.remove(path)
+    return manifest
+
+
+def load_manifest(static_dir: str) -> dict:
+    try:
+        with open(os.path.join(static_dir, DIST_DIRNAME, MANIFEST_NAME), encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _accepted_encodings(header: Optional[str]) -> set:
+    accepted = set()
+    for part in (header or '').split(','):
+        token, _, params = part.strip().partition(';')
+        q = 1.0
+        for p in params.split(';'):
+            k, _, v = p.strip().partition('=')
+            if k == 'q':
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        if token and q > 0:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+def choose_variant(path: str, accept_encoding: Optional[str]):
+    """Return (path_to_send, content_encoding) for the best precompressed variant on disk."""
+    accepted = _accepted_encodings(accept_encoding)
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if (encoding in accepted or '*' in accepted) and os.path.isfile(path + suffix):
+            return path + suffix, encoding
+    return path, None
+
+
+def install(app, static_dir: Optional[str] = None, limiter=None):
+    from flask import abort, request, send_file
+
+    static_dir = static_dir or app.static_folder
+    dist = os.path.join(static_dir, DIST_DIRNAME)
+    state = {'manifest': load_manifest(static_dir)}
+
+    @app.url_defaults
+    def _fingerprint_static(endpoint, values):
+        if endpoint == 'static' and state['manifest']:
+            hashed = state['manifest'].get(values.get('filename'))
+            if hashed:
+                values['filename'] = hashed
+
+    def serve_dist(filename: str):
+        path = os.path.realpath(os.path.join(dist, filename))
+        if not path.startswith(os.path.realpath(dist) + os.sep) or not os.path.isfile(path) \
+                or filename.endswith(('.gz', '.br')) or filename == MANIFEST_NAME:
+            abort(404)
+        send_path, encoding = choose_variant(path, request.headers.get('Accept-Encoding'))
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        resp = send_file(send_path, mimetype=mimetype, conditional=True, max_age=IMMUTABLE_MAX_AGE)
+        if encoding:
+            resp.headers['Content-Encoding'] = encoding
+        if os.path.isfile(path + '.gz') or os.path.isfile(path + '.br'):
+            resp.vary.add('Accept-Encoding')
+        resp.cache_control.public = True
+        resp.cache_control.immutable = True
+        return resp
+
+    static_url = (app.static_url_path or '/static').rstrip('/')
+    app.add_url_rule(f'{static_url}/{DIST_DIRNAME}/<path:filename>', 'static_dist', serve_dist)
+    if limiter is not None:
+        limiter.exempt(serve_dist)
+
+    def reload_manifest():
+        state['manifest'] = load_manifest(static_dir)
+        return state['manifest']
+
+    return reload_manifest
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+@pytest.fixture
+def app_db(tmp_path, monkeypatch):
+    """The app module on a fresh database under tmp_path, with rate limiting off.
+
+    Everything is set through monkeypatch, so it is restored after the test; tests that need
+    the limiter turn it back on with monkeypatch.setattr(app_db.limiter, 'enabled', True).
+    """
+    import app as app_module  # not at module level: some test modules must not import the app
+    monkeypatch.setattr(app_module, 'DB_PATH', str(tmp_path / 'app.db'))
+    monkeypatch.setattr(app_module, 'ARCHIVE_DIR', str(tmp_path / 'archive'))
+    monkeypatch.setattr(app_module.limiter, 'enabled', False)
+    app_module.init_db()
+    return app_module
@@ -0,0 +1,118 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import app as app_module
+from admission import ENRICHMENTS, AdmissionController, Rejected, StageCost
+from metrics import Metrics
+
+
+def test_enrichments_that_do_not_fit_the_deadline_are_skipped():
+    ctl = AdmissionController(deadlines={'*': 0.3})
+    with ctl.admit('analyze', 5000, model='vader') as ticket:
+        assert ticket.stages == ('langdetect', 'keywords', 'wordcloud') and not ticket.skipped
+    with AdmissionController(deadlines={'*': 0.15}).admit('analyze', 5000, model='vader') as ticket:
+        assert ticket.stages == ('langdetect', 'keywords') and ticket.skipped == ['wordcloud']
+    with AdmissionController(deadlines={'*': 0.15}).admit('analyze', 5000, ['wordcloud'], model='vader') as ticket:
+        assert ticket.stages == () and ticket.skipped == ['wordcloud']
+
+
+def test_oversized_texts_are_rejected_with_the_accepted_length():
+    metrics = Metrics()
+    ctl = AdmissionController(max_chars=100_000, deadlines={'*': 3.0}, metrics=metrics)
+    with pytest.raises(Rejected) as err:
+        ctl.admit('analyze', 200_000)
+    assert err.value.status == 413 and err.value.details == {'max_chars': 100_000}
+    ctl.admit('analyze', 100_000, model='rule').release()
+    assert 'sentiment_admission_rejected_total{endpoint="analyze",reason="too_large"} 1' in metrics.render()
+
+
+def test_texts_too_slow_to_score_in_time_are_score_only():
+    ctl = AdmissionController(max_chars=100_000, deadlines={'*': 3.0})
+    limit = ctl.max_scorable_chars(3000, 'vader')  # VADER is quadratic: ~40k characters in 3 s
+    assert 30_000 < limit < 60_000 and ctl.cost('score', limit, 'vader') <= 3000
+    with ctl.admit('analyze', limit - 5000, ['langdetect'], model='vader') as ticket:
+        assert ticket.stages == ('langdetect',)
+    with ctl.admit('analyze', limit + 1, model='vader') as ticket:
+        assert ticket.stages == () and ticket.skipped == list(ENRICHMENTS) and ticket.heavy
+    with ctl.admit('analyze', 100_000, model='vader') as ticket:  # ~17 s, but still scored
+        assert ticket.stages == ()
+    with pytest.raises(Rejected):
+        ctl.admit('analyze', 100_001, model='vader')
+
+
+def test_heavy_requests_are_capped_per_worker():
+    ctl = AdmissionController(max_heavy=1, heavy_ms=100, queue_ms=0)
+    first = ctl.admit('analyze', 20_000, model='vader')
+    assert first.heavy and ctl.in_flight() == 1
+    with ctl.admit('analyze', 50, stages=()) as cheap:  # never queued behind heavy ones
+        assert not cheap.heavy
+    with pytest.raises(Rejected) as err:
+        ctl.admit('analyze', 20_000, model='vader')
+    assert err.value.status == 503 and err.value.retry_after >= 1
+    first.release()
+    first.release()  # idempotent
+    ctl.admit('analyze', 20_000, model='vader').release()
+
+    ctl.queue_ms = 2000
+    held = ctl.admit('analyze', 20_000, model='vader')
+    threading.Timer(0.05, held.release).start()
+    t0 = time.monotonic()
+    with ctl.admit('analyze', 20_000, model='vader'):  # waits for the slot instead of failing
+        assert time.monotonic() - t0 < 1.0
+    assert ctl.in_flight() == 0
+
+
+def test_heavy_slot_is_held_until_overrunning_stages_finish(monkeypatch):
+    from concurrent.futures import Future
+    from enrichment import EnrichmentExecutor, parse_timeouts
+
+    ctl = AdmissionController(max_heavy=1, heavy_ms=1, queue_ms=0, deadlines={'*': 3.0})
+    ticket = ctl.admit('analyze', 2000, model='vader')
+    fut = Future()
+    ticket.hold([fut])
+    ticket.release()
+    with pytest.raises(Rejected):  # the request returned, but its stage still runs
+        ctl.admit('analyze', 2000, model='vader')
+    fut.set_result(None)
+    assert ctl.in_flight() == 0
+
+    monkeypatch.setattr(app_module, 'ENRICH', EnrichmentExecutor(max_workers=2, timeouts=parse_timeouts('wordcloud=50')))
+    monkeypatch.setattr(app_module, '_wordcloud_b64', lambda text: time.sleep(0.5) or 'png')
+    with ctl.admit('analyze', 2000, model='vader') as ticket:
+        res = app_module.analyze_text('I love this wonderful product', ticket=ticket)
+    assert 'wordcloud' in res['dropped'] and ctl.in_flight() == 1
+    time.sleep(0.7)
+    assert ctl.in_flight() == 0
+
+
+def test_endpoints_apply_admission(app_db, monkeypatch):
+    client = app_module.app.test_client()
+    text = 'The espresso machine is great but the delivery was painfully slow. ' * 10
+
+    # only the up-front plan decides: the word cloud is priced past a deadline everything else meets easily
+    monkeypatch.setattr(app_module.ADMISSION, 'deadlines', {'*': 5.0})
+    monkeypatch.setitem(app_module.ADMISSION.costs, 'wordcloud', StageCost(10_000.0))
+    data = client.post('/analyze', json={'text': text}).get_json()
+    assert data['dropped'] == ['wordcloud'] and 'wordcloud_png_b64' not in data and data['keywords']
+    data = client.post('/analyze', json={'text': text, 'enrich': 'langdetect'}).get_json()
+    assert data['lang'] == 'en' and 'keywords' not in data and 'dropped' not in data
+    assert client.post('/analyze', json={'text': text, 'enrich': ['colour']}).status_code == 400
+
+    monkeypatch.setattr(app_module.ADMISSION, 'max_chars', 100)
+    resp = client.post('/analyze', json={'text': text})
+    assert resp.status_code == 413 and resp.get_json()['max_chars'] == 100
+    assert client.post('/chat', json={'message': text}).status_code == 413
+
+    monkeypatch.setattr(app_module, 'ADMISSION', AdmissionController(max_heavy=1, heavy_ms=0, queue_ms=0))
+    with app_module.ADMISSION.admit('analyze', 10):
+        resp = client.post('/analyze', json={'text': text})
+    assert resp.status_code == 503 and int(resp.headers['Retry-After']) >= 1
+    assert 'busy' in resp.get_json()['error']
@@ -0,0 +1,123 @@
+import csv
+import json
+import os
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import app as app_module
+import batch_score
+
+TEXTS = ['I love this, it is great!', 'This is terrible and I hate it.', 'The package arrived on Tuesday.',
+         'Not bad at all', '', 'Awful, rude and slow service.'] * 5
+
+
+def _write_csv(path, header, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as fh:
+        w = csv.writer(fh)
+        if header:
+            w.writerow(header)
+        w.writerows(rows)
+
+
+def _read_csv(path):
+    with open(path, newline='', encoding='utf-8') as fh:
+        return list(csv.DictReader(fh))
+
+
+def test_csv_scores_match_app_and_use_column_synonyms(tmp_path):
+    src, out = tmp_path / 'in.csv', tmp_path / 'out.csv'
+    _write_csv(src, ['id', 'Comment'], [[i, t] for i, t in enumerate(TEXTS)])
+    assert batch_score.main([str(src), '-o', str(out), '--jobs', '1', '--chunk-size', '7']) == 0
+    rows = _read_csv(out)
+    expected = app_module.score_texts(TEXTS)
+    assert [r['id'] for r in rows] == [str(i) for i in range(len(TEXTS))]
+    assert [r['label'] for r in rows] == [e['label'] for e in expected]
+    assert [float(r['compound']) for r in rows] == [e['scores']['compound'] for e in expected]
+
+
+def test_parallel_output_matches_serial(tmp_path):
+    src = tmp_path / 'in.csv'
+    _write_csv(src, ['text'], [[t] for t in TEXTS])
+    serial, parallel = tmp_path / 'a.csv', tmp_path / 'b.csv'
+    batch_score.main([str(src), '-o', str(serial), '--jobs', '1', '--chunk-size', '4'])
+    batch_score.main([str(src), '-o', str(parallel), '--jobs', '2', '--chunk-size', '4'])
+    assert serial.read_text(encoding='utf-8') == parallel.read_text(encoding='utf-8')
+
+
+def test_resume_appends_remaining_rows(tmp_path):
+    src, full, partial = tmp_path / 'in.csv', tmp_path / 'full.csv', tmp_path / 'partial.csv'
+    _write_csv(src, ['text'], [[t] for t in TEXTS])
+    batch_score.main([str(src), '-o', str(full), '--jobs', '1'])
+    lines = full.read_text(encoding='utf-8').splitlines(keepends=True)
+    partial.write_text(''.join(lines[:11]), encoding='utf-8')  # header + 10 rows survived a crash
+    assert batch_score.main([str(src), '-o', str(partial), '--jobs', '1', '--resume']) == 0
+    assert partial.read_text(encoding='utf-8') == full.read_text(encoding='utf-8')
+
+
+def test_resume_keeps_the_start_row_offset(tmp_path):
+    src, full, partial = tmp_path / 'in.csv', tmp_path / 'full.csv', tmp_path / 'partial.csv'
+    _write_csv(src, ['id', 'text'], [[i, t] for i, t in enumerate(TEXTS)])
+    batch_score.main([str(src), '-o', str(full), '--jobs', '1', '--start-row', '10'])
+    lines = full.read_text(encoding='utf-8').splitlines(keepends=True)
+    assert lines[1].startswith('10,')
+    partial.write_text(''.join(lines[:6]), encoding='utf-8')  # header + rows 10..14
+    assert batch_score.main([str(src), '-o', str(partial), '--jobs', '1', '--start-row', '10', '--resume']) == 0
+    assert partial.read_text(encoding='utf-8') == full.read_text(encoding='utf-8')
+
+
+def test_ndjson_text_that_is_not_a_string(tmp_path):
+    src, out = tmp_path / 'in.ndjson', tmp_path / 'out.ndjson'
+    src.write_text('{"text": 42}\n{"text": null}\n{"text": 0}\n{"text": "I love it"}\n', encoding='utf-8')
+    assert batch_score.main([str(src), '-o', str(out), '--jobs', '1']) == 0
+    rows = [json.loads(line) for line in out.read_text(encoding='utf-8').splitlines()]
+    assert [r['label'] for r in rows] == ['Neutral', 'Neutral', 'Neutral', 'Positive']
+    assert rows[0]['text'] == 42 and rows[1]['text'] is None
+
+
+def test_ndjson_with_language_and_headerless_csv(tmp_path, capsys):
+    src, out = tmp_path / 'in.ndjson', tmp_path / 'out.ndjson'
+    src.write_text('\n'.join(json.dumps({'message': t, 'n': i}) for i, t in enumerate(TEXTS[:4])) + '\n"just a string, very good"\n',
+                   encoding='utf-8')
+    assert batch_score.main([str(src), '-o', str(out), '--jobs', '1', '--detect-lang']) == 0
+    rows = [json.loads(line) for line in out.read_text(encoding='utf-8').splitlines()]
+    assert len(rows) == 5 and rows[0]['n'] == 0 and rows[0]['lang'] == 'en' and rows[0]['label'] == 'Positive'
+
+    headerless = tmp_path / 'plain.csv'
+    _write_csv(headerless, None, [['I am so happy with this purchase!'], ['Terrible, I hate it.']])
+    out_csv = tmp_path / 'plain_out.csv'
+    assert batch_score.main([str(headerless), '-o', str(out_csv), '--jobs', '1']) == 0
+    assert [r['label'] for r in _read_csv(out_csv)] == ['Positive', 'Negative']
+
+
+def test_missing_column_and_unknown_model(tmp_path, capsys):
+    src = tmp_path / 'in.csv'
+    _write_csv(src, ['id', 'score'], [[1, 2]])
+    assert batch_score.main([str(src), '--jobs', '1']) == 2
+    assert batch_score.main([str(src), '--jobs', '1', '--model', 'nope']) == 2
+    assert 'no text column' in capsys.readouterr().err
+
+
+def test_resume_cuts_a_half_written_row(tmp_path):
+    texts = ['I love it', 'I hate\nthis', 'Fine, "quoted" text', 'Awful'] * 3
+    src, full, partial = tmp_path / 'in.csv', tmp_path / 'full.csv', tmp_path / 'partial.csv'
+    _write_csv(src, ['id', 'text'], [[i, t] for i, t in enumerate(texts)])
+    batch_score.main([str(src), '-o', str(full), '--jobs', '1'])
+    data = full.read_bytes()
+    # crash points: mid-row, inside a quoted multi-line field, right after its embedded newline
+    cut_row = data.index(b'\n5,') + 3
+    inside = data.index(b'"I hate') + 4
+    after_nl = data.index(b'I hate\n') + 7
+    for cut in (cut_row, inside, after_nl):
+        partial.write_bytes(data[:cut])
+        assert batch_score.main([str(src), '-o', str(partial), '--jobs', '1', '--resume']) == 0
+        assert partial.read_bytes() == data
+
+    nd_full, nd_partial = tmp_path / 'full.ndjson', tmp_path / 'partial.ndjson'
+    batch_score.main([str(src), '-o', str(nd_full), '--output-format', 'ndjson', '--jobs', '1'])
+    nd = nd_full.read_bytes()
+    nd_partial.write_bytes(nd[:nd.index(b'\n', 100) + 20])
+    batch_score.main([str(src), '-o', str(nd_partial), '--output-format', 'ndjson', '--jobs', '1', '--resume'])
+    assert nd_partial.read_bytes() == nd
@@ -0,0 +1,54 @@
+import io
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import app as app_module
+
+
+@pytest.fixture
+def client(app_db):
+    return app_db.app.test_client()
+
+
+def _upload(client, body: str, query: str = ''):
+    data = {'file': (io.BytesIO(body.encode('utf-8')), 'reviews.csv')}
+    return client.post('/analyze_csv' + query, data=data, content_type='multipart/form-data')
+
+
+def test_csv_upload_is_one_history_entry(client):
+    resp = _upload(client, "text\nI love it\nThis is terrible\nIt is a chair\n")
+    assert resp.status_code == 200, resp.data
+    batch_id = resp.get_json()['batch_id']
+    assert batch_id
+
+    items = client.get('/history?limit=50').get_json()['items']
+    batch_rows = [i for i in items if i['source'] == 'csv']
+    assert len(batch_rows) == 1
+    assert batch_rows[0]['batch_id'] == batch_id
+    assert batch_rows[0]['row_count'] == 3
+
+    detail = client.get(f'/history/batch/{batch_id}').get_json()['batch']
+    assert detail['row_count'] == 3
+    assert detail['pos_count'] + detail['neu_count'] + detail['neg_count'] == 3
+    assert [i['row_idx'] for i in detail['items']] == [0, 1, 2]
+    assert detail['items'][0]['label'] == 'Positive'
+    assert detail['items'][1]['label'] == 'Negative'
+
+
+def test_batch_without_details(client):
+    resp = _upload(client, "text\nGreat stuff\nBad stuff\n", query='?details=0')
+    batch_id = resp.get_json()['batch_id']
+    detail = client.get(f'/history/batch/{batch_id}').get_json()['batch']
+    assert detail['has_details'] is False
+    assert detail['items'] == []
+    assert detail['row_count'] == 2
+
+
+def test_unknown_batch_is_404(client):
+    assert client.get('/history/batch/9999').status_code == 404
@@ -0,0 +1,20 @@
+import os
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from benchmarks import bench
+
+
+def test_corpora_are_deterministic():
+    assert bench.make_corpus('tweet', 3) == bench.make_corpus('tweet', 3)
+    assert bench.make_csv(50) == bench.make_csv(50)
+    assert bench.make_csv(50).count(b'\n') == 51
+
+
+def test_compare_flags_only_regressions_over_threshold():
+    baseline = {'results': {'a': {'p50_ms': 10.0}, 'b': {'p50_ms': 10.0}, 'gone': {'p50_ms': 1.0}}}
+    current = {'results': {'a': {'p50_ms': 10.9}, 'b': {'p50_ms': 12.0}}}
+    assert bench.compare(current, baseline, threshold=0.10) == [('b', 10.0, 12.0, 1.2)]
@@ -0,0 +1,175 @@
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import app as app_module
+from sentiment_client import APIError, AsyncSentimentClient, RateLimited, RetryPolicy, SentimentClient, parse_retry_after
+
+TEXTS = ['I love this, it is great!', 'This is terrible and I hate it.', 'The package arrived on Tuesday.',
+         'Not bad, "quoted", with commas', '', 'Line one\nline two: awful.']
+
+
+@pytest.fixture
+def server(app_db):
+    from werkzeug.serving import make_server
+
+    srv = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{srv.server_port}'
+    finally:
+        srv.shutdown()
+
+
+def test_pooled_calls_and_bulk_scores_match_app(server):
+    with SentimentClient(server, pool_size=2, batch_size=4) as api:
+        res = api.analyze('I love sunny days')
+        assert res['label'] == 'Positive' and res['lang'] == 'en'
+        assert api.chat('hello there')['reply']
+        scored = api.score_many(TEXTS)
+        expected = app_module.score_texts(TEXTS)
+        assert [s['label'] for s in scored] == [e['label'] for e in expected]
+        assert [s['scores'] for s in scored] == [e['scores'] for e in expected]
+        assert api.stats()['requests'] == 4  # analyze, chat and two CSV batches
+
+
+def test_keep_alive_connections_are_reused():
+    # werkzeug's dev server closes every connection, so use a bare HTTP/1.1 server here
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    peers = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers['Content-Length']))
+            peers.add(self.client_address)
+            body = b'{"label": "Neutral"}'
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    try:
+        with SentimentClient(f'http://127.0.0.1:{srv.server_port}', pool_size=2) as api:
+            for _ in range(5):
+                assert api.analyze('x') == {'label': 'Neutral'}
+            assert api.stats()['connections_opened'] == 1 and len(peers) == 1
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+
+def test_files_and_history_revalidation(server):
+    with SentimentClient(server) as api:
+        assert api.analyze_file(b'What a wonderful, happy day.', 'note.txt')['label'] == 'Positive'
+        preview = api.analyze_csv(b'comment\nawful service\n', detect_lang=True)
+        assert preview['column_used'] == 'comment' and preview['results'][0]['label'] == 'Negative'
+        items = api.history(limit=5)
+        assert items and api.history(limit=5) == items  # second call is a 304 served from the cache
+        with pytest.raises(APIError) as err:
+            api.analyze_file(b'   ', 'blank.txt')
+        assert err.value.status == 400 and 'no readable text' in str(err.value)
+
+
+def test_429_is_retried_after_retry_after(server, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr('sentiment_client.time.sleep', sleeps.append)
+    monkeypatch.setattr(app_module.limiter, 'enabled', True)
+    app_module.limiter.reset()
+    with SentimentClient(server, retry=RetryPolicy(max_retries=1, backoff=0)) as api:
+        for _ in range(5):
+            api.analyze_csv(b'text\nfine\n')
+        with pytest.raises(RateLimited) as err:
+            api.analyze_csv(b'text\nfine\n')
+    assert 0 < err.value.retry_after <= 60
+    assert len(sleeps) == 1 and sleeps[0] >= err.value.retry_after - 1  # one wait, as long as the server asked
+
+    with SentimentClient(server, retry=RetryPolicy(max_retries=3, max_retry_after=0.5)) as api:
+        with pytest.raises(RateLimited):
+            api.analyze_csv(b'text\nfine\n')  # window too long to wait for: fail fast
+        assert api.stats()['retries'] == 0
+
+
+def test_posts_are_retried_only_when_not_run():
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _answer(self):
+            seen.append(self.command)
+            if self.command == 'POST':
+                self.rfile.read(int(self.headers['Content-Length']))
+            if self.path.startswith('/drop'):
+                self.close_connection = True  # ran, but the response is lost
+                return
+            self.send_response(502)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        do_GET = do_POST = _answer
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{srv.server_port}'
+    try:
+        with SentimentClient(url, retry=RetryPolicy(max_retries=2, backoff=0)) as api:
+            for path, method in (('/drop', 'POST'), ('/bad', 'POST')):
+                seen.clear()
+                with pytest.raises(APIError):
+                    api.request(method, path, json_body={'text': 'x'})
+                assert seen == ['POST']
+            seen.clear()
+            with pytest.raises(APIError):
+                api.request('GET', '/bad')
+            assert seen == ['GET'] * 3
+        with SentimentClient(url, retry=RetryPolicy(max_retries=2, backoff=0, retry_post=True)) as api:
+            seen.clear()
+            with pytest.raises(APIError):
+                api.request('POST', '/drop', json_body={'text': 'x'})
+            assert seen == ['POST'] * 3
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+    # nothing listening: the request was never sent, so a POST is retried
+    with SentimentClient(url, retry=RetryPolicy(max_retries=2, backoff=0)) as api:
+        with pytest.raises(APIError) as err:
+            api.analyze('x')
+        assert err.value.status == 0 and api.stats()['retries'] == 2
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('7') == 7.0
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert parse_retry_after(None) is None and parse_retry_after('soon') is None
+
+
+def test_async_scores_are_coalesced(server):
+    async def go():
+        async with AsyncSentimentClient(server, batch_window=0.05) as api:
+            scored = await asyncio.gather(*(api.score(t) for t in TEXTS))
+            return scored, api.sync.stats()
+
+    scored, stats = asyncio.run(go())
+    assert [s['label'] for s in scored] == [e['label'] for e in app_module.score_texts(TEXTS)]
+    assert stats['requests'] == 1
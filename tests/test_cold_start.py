@@ -0,0 +1,30 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PROBE = """
+import json, sys
+import app
+heavy = ['yake', 'wordcloud', 'matplotlib', 'vaderSentiment.vaderSentiment', 'numpy']
+print(json.dumps({'loaded': [m for m in heavy if m in sys.modules],
+                  'phases': sorted(app.IMPORT_TIMINGS)}))
+"""
+
+
+def test_import_does_not_load_heavy_enrichments():
+    out = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+    data = json.loads(out.stdout.strip().splitlines()[-1])
+    assert data['loaded'] == []
+    assert 'framework' in data['phases']
+
+
+def test_lazy_registry_loads_once_and_records_timing():
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    import app as app_module
+    first = app_module.lazy('vader')
+    assert first is app_module.lazy('vader')
+    assert 'vader' in app_module.LAZY_LOAD_TIMINGS
@@ -0,0 +1,100 @@
+import gzip
+import json
+import os
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from flask import Flask, Response, jsonify, make_response
+
+import compression
+from metrics import Metrics
+
+
+def _app(**kwargs):
+    app = Flask(__name__)
+    big = {'rows': [{'text': f'row {i} was great', 'score': i} for i in range(200)]}
+
+    @app.route('/big')
+    def big_json():
+        resp = jsonify(big)
+        resp.set_etag('v1')
+        return resp
+
+    @app.route('/small')
+    def small_json():
+        return jsonify({'ok': True})
+
+    @app.route('/csv')
+    def csv():
+        return Response('id,text\n' + 'x,y\n' * 1000, mimetype='text/csv')
+
+    @app.route('/stream')
+    def stream():
+        return Response((f'{i},row {i}\n' for i in range(500)), mimetype='text/csv')
+
+    @app.route('/png')
+    def png():
+        return Response(b'\x89PNG' * 1000, mimetype='image/png')
+
+    @app.route('/encoded')
+    def encoded():
+        resp = make_response(gzip.compress(b'x' * 5000))
+        resp.headers['Content-Encoding'] = 'gzip'
+        resp.mimetype = 'text/plain'
+        return resp
+
+    metrics = Metrics()
+    assert compression.install_compression(app, metrics=metrics, **kwargs)
+    return app, big, metrics
+
+
+def test_json_is_compressed_when_accepted():
+    app, big, metrics = _app()
+    client = app.test_client()
+    plain = client.get('/big')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    gz = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+    assert gz.headers['Content-Encoding'] == 'gzip'
+    assert int(gz.headers['Content-Length']) == len(gz.data) < len(plain.data)
+    assert json.loads(gzip.decompress(gz.data)) == big
+    assert gz.headers['ETag'] == 'W/"v1"'
+
+    if compression.brotli is not None:
+        br = client.get('/big', headers={'Accept-Encoding': 'gzip, deflate, br'})
+        assert br.headers['Content-Encoding'] == 'br'
+        assert json.loads(compression.brotli.decompress(br.data)) == big
+    assert 'sentiment_compression_bytes_total' in metrics.render()
+
+
+def test_small_binary_and_encoded_responses_are_left_alone():
+    app, _, _ = _app()
+    client = app.test_client()
+    headers = {'Accept-Encoding': 'gzip, br'}
+    assert 'Content-Encoding' not in client.get('/small', headers=headers).headers
+    assert 'Content-Encoding' not in client.get('/png', headers=headers).headers
+    enc = client.get('/encoded', headers=headers)
+    assert gzip.decompress(enc.data) == b'x' * 5000
+    assert 'Content-Encoding' not in client.get('/big', headers={'Accept-Encoding': 'gzip;q=0'}).headers
+
+
+def test_streamed_responses_are_compressed_incrementally():
+    app, _, _ = _app()
+    resp = app.test_client().get('/stream', headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in resp.headers
+    assert gzip.decompress(resp.data).decode() == ''.join(f'{i},row {i}\n' for i in range(500))
+
+
+def test_per_type_rules_and_levels():
+    rules = compression.parse_rules('application/json=1,text/csv=0')
+    assert rules == {'application/json': 1, 'text/csv': 0}
+    app, _, _ = _app(rules=rules)
+    client = app.test_client()
+    assert 'Content-Encoding' not in client.get('/csv', headers={'Accept-Encoding': 'gzip'}).headers
+    assert client.get('/big', headers={'Accept-Encoding': 'gzip'}).headers['Content-Encoding'] == 'gzip'
+    assert not compression.install_compression(Flask(__name__), level=0)
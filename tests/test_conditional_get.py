@@ -0,0 +1,88 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import app as app_module
+
+RESULT = {'label': 'Positive', 'scores': {'pos': 0.6, 'neu': 0.4, 'neg': 0.0, 'compound': 0.7}}
+
+
+@pytest.fixture
+def client(app_db):
+    return app_db.app.test_client()
+
+
+def _login(client, user_id):
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+
+
+def test_history_etag_changes_only_on_writes(client):
+    app_module.insert_analysis('text', 'great', RESULT, user_id=1)
+    first = client.get('/history')
+    etag = first.headers['ETag']
+    assert first.last_modified is not None
+    assert 'no-cache' in first.headers['Cache-Control'] and 'private' in first.headers['Cache-Control']
+
+    again = client.get('/history', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b''
+    assert client.get('/history', headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+    # limit is part of the representation
+    assert client.get('/history?limit=5', headers={'If-None-Match': etag}).status_code == 200
+
+    app_module.insert_analysis('text', 'sad', RESULT, user_id=2)
+    changed = client.get('/history', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert len(changed.get_json()['items']) == 2
+
+
+def test_history_version_is_per_user(client):
+    _login(client, 1)
+    etag = client.get('/history').headers['ETag']
+    app_module.insert_analysis('text', 'other user', RESULT, user_id=2)
+    assert client.get('/history', headers={'If-None-Match': etag}).status_code == 304
+    app_module.insert_batch('csv', [('a', RESULT), ('b', RESULT)], user_id=1)
+    assert client.get('/history', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_prune_invalidates_history(client):
+    app_module.insert_analysis('text', 'great', RESULT, user_id=1)
+    etag = client.get('/history').headers['ETag']
+    app_module.app.config['HISTORY_RETENTION'], saved = {'*': 1}, app_module.app.config['HISTORY_RETENTION']
+    try:
+        app_module.prune_history(now=datetime.utcnow() + timedelta(days=5))
+    finally:
+        app_module.app.config['HISTORY_RETENTION'] = saved
+    resp = client.get('/history', headers={'If-None-Match': etag})
+    assert resp.status_code == 200 and resp.get_json()['items'] == []
+
+
+def test_settings_etag_follows_write_time(client):
+    _login(client, 7)
+    first = client.get('/settings')
+    etag = first.headers['ETag']
+    assert client.get('/settings', headers={'If-None-Match': etag}).status_code == 304
+    client.post('/settings', json={'default_tone': 'coaching', 'accent_theme': 'purple'})
+    updated = client.get('/settings', headers={'If-None-Match': etag})
+    assert updated.status_code == 200
+    assert updated.get_json()['settings']['accent_theme'] == 'purple'
+    etag2 = updated.headers['ETag']
+    client.post('/settings', json={'accent_theme': 'cyan'})
+    assert client.get('/settings', headers={'If-None-Match': etag2}).status_code == 200
+
+
+@pytest.mark.skipif(app_module.swagger is None, reason='API docs disabled')
+def test_api_spec_is_served_from_memory_with_etag(client, monkeypatch):
+    monkeypatch.setattr(app_module.limiter, 'enabled', True)
+    first = client.get('/api/spec.json')
+    assert first.status_code == 200 and '/analyze' in first.get_json()['paths']
+    etag = first.headers['ETag']
+    for _ in range(15):  # exempt from the default per-minute limit
+        assert client.get('/api/spec.json', headers={'If-None-Match': etag}).status_code == 304
+    assert app_module.lazy('apispec')['body'] == first.data
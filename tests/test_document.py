@@ -0,0 +1,54 @@
+import os
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import app as app_module
+from document import Document
+
+
+def test_tokens_offsets_and_flags():
+    doc = Document("  I'm SO happy, it's great!  ")
+    assert doc.tokens == ["i'm", 'so', 'happy', "it's", 'great']
+    assert [doc.span(i) for i in range(len(doc))] == ["I'm", 'SO', 'happy', "it's", 'great']
+    assert doc.lower == doc.text.lower() and doc.is_ascii
+    assert 'happy' in doc.token_set
+    assert doc.words(min_length=3) == ["I'm", 'happy', "it's", 'great']
+    assert not Document('') and Document.of(doc) is doc
+
+
+def test_offsets_survive_length_changing_lowercase():
+    doc = Document('İstanbul café')  # 'İ'.lower() is two code points
+    assert not doc.is_ascii
+    assert doc.tokens == ['i̇stanbul', 'café']
+    assert [doc.span(i) for i in range(len(doc))] == ['İstanbul', 'café']
+
+
+def test_wordcloud_counts_match_process_text():
+    from wordcloud import WordCloud
+    wc = WordCloud()
+    app_module._WORDCLOUD_STOPWORDS = frozenset(w.lower() for w in wc.stopwords)
+    texts = ["John's café is great, great coffee and great people in 2024!",
+             'The the THE apples apple Apples were tasty tasty', 'Plan B: x x y, 3 D printing in 5 G']
+    for text in texts:
+        assert app_module._wordcloud_counts(wc, Document(text)) == wc.process_text(text)
+    assert 'x' in app_module._wordcloud_counts(wc, Document(texts[2]))  # single letters count too
+    short = WordCloud(min_word_length=3, include_numbers=True)
+    for text in texts:
+        assert app_module._wordcloud_counts(short, Document(text)) == short.process_text(text)
+
+
+def test_language_heuristics_use_whitespace_tokens(monkeypatch):
+    monkeypatch.setitem(app_module._LAZY_LOADED, 'langdetect', lambda text: 'de')
+    assert app_module._detect_language('good') == 'en'  # short text with an English marker
+    assert app_module._detect_language('good.') == 'de'  # 'good.' is not a marker token
+    assert app_module._detect_language('das ist gut, very') == 'en'
+
+
+def test_models_receive_documents_or_text():
+    doc = Document('This is GREAT and I love it')
+    assert app_module.MODELS.score('rule', doc) == app_module.MODELS.score('rule', doc.text)
+    assert app_module.MODELS.score('vader', doc) == app_module.MODELS.score('vader', doc.text)
+    assert app_module._detect_language(Document('i am happy')) == 'en'
@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import app as app_module
+from enrichment import EnrichmentExecutor, parse_timeouts
+from metrics import Metrics
+
+
+def _sleeper(seconds, value):
+    def fn():
+        time.sleep(seconds)
+        return value
+    return fn
+
+
+def test_parse_timeouts():
+    t = parse_timeouts('wordcloud=800, keywords=250,*=3000')
+    assert t == {'*': 3.0, 'wordcloud': 0.8, 'keywords': 0.25}
+    assert parse_timeouts(None) == {'*': 2.0}
+
+
+def test_stages_overlap_with_inline_work():
+    ex = EnrichmentExecutor(max_workers=3)
+    t0 = time.perf_counter()
+    out = ex.run({'a': _sleeper(0.2, 1), 'b': _sleeper(0.2, 2)}, inline=_sleeper(0.2, 'score'))
+    elapsed = time.perf_counter() - t0
+    assert out.inline == 'score' and out.values == {'a': 1, 'b': 2} and not out.dropped
+    assert elapsed < 0.5  # sequential would be 0.6s
+    assert set(out.seconds) == {'a', 'b'}
+
+
+def test_overrunning_stage_is_dropped():
+    metrics = Metrics()
+    ex = EnrichmentExecutor(max_workers=2, timeouts=parse_timeouts('slow=50,*=2000'), metrics=metrics)
+    t0 = time.perf_counter()
+    out = ex.run({'slow': _sleeper(1.0, 'late'), 'fast': _sleeper(0.0, 'ok')})
+    assert time.perf_counter() - t0 < 0.5
+    assert out.values == {'fast': 'ok'} and out.dropped == ['slow']
+    assert 'sentiment_enrichment_dropped_total{stage="slow"} 1' in metrics.render()
+
+
+def test_inline_mode_and_errors_propagate():
+    ex = EnrichmentExecutor(max_workers=0, timeouts=parse_timeouts('*=1'))
+    out = ex.run({'a': _sleeper(0.02, 'a')}, inline=lambda: 'x')
+    assert out.values == {'a': 'a'} and out.inline == 'x' and not out.dropped
+
+    def boom():
+        raise ValueError('stage failed')
+    with pytest.raises(ValueError):
+        EnrichmentExecutor(max_workers=1).run({'boom': boom})
+
+
+def test_analyze_text_drops_slow_wordcloud(monkeypatch):
+    monkeypatch.setattr(app_module, 'ENRICH', EnrichmentExecutor(max_workers=2, timeouts=parse_timeouts('wordcloud=50')))
+    monkeypatch.setattr(app_module, '_wordcloud_b64', lambda text: _sleeper(1.0, 'png')())
+    res = app_module.analyze_text('I really love this wonderful product, it is great')
+    assert res['label'] == 'Positive' and res['lang'] == 'en'
+    assert 'keywords' in res and 'wordcloud_png_b64' not in res
+    assert res['dropped'] == ['wordcloud']
+
+
+def test_after_stage_receives_parent_value():
+    for workers in (0, 2):
+        ex = EnrichmentExecutor(max_workers=workers)
+        out = ex.run({'lang': _sleeper(0.05, 'fr')}, after={'keywords': ('lang', lambda lang: [lang, 'mot'])})
+        assert out.values == {'lang': 'fr', 'keywords': ['fr', 'mot']} and not out.dropped
+
+
+def test_request_deadline_caps_stage_timeouts():
+    ex = EnrichmentExecutor(max_workers=2, timeouts=parse_timeouts('*=2000'))
+    t0 = time.perf_counter()
+    out = ex.run({'slow': _sleeper(1.0, 'late'), 'fast': _sleeper(0.0, 'ok')}, deadline=time.monotonic() + 0.05)
+    assert time.perf_counter() - t0 < 0.5 and out.dropped == ['slow']
+
+    seq = EnrichmentExecutor(max_workers=0)
+    out = seq.run({'a': _sleeper(0.0, 1)}, after={'b': ('a', lambda v: v + 1)}, deadline=time.monotonic() - 1)
+    assert out.values == {} and out.dropped == ['a', 'b']
+
+
+def test_overruns_do_not_starve_later_requests():
+    metrics = Metrics()
+    ex = EnrichmentExecutor(max_workers=2, timeouts=parse_timeouts('wordcloud=50,keywords=50,*=200'),
+                            max_overruns=1, metrics=metrics)
+    out = ex.run({'wordcloud': _sleeper(0.6, 'png'), 'keywords': _sleeper(0.6, ['k'])})
+    assert sorted(out.dropped) == ['keywords', 'wordcloud'] and len(out.pending) == 2
+    assert ex.busy() == 2  # both threads are still held by the overruns
+
+    # the next request's cheap stage runs in its own thread instead of queueing behind them
+    t0 = time.perf_counter()
+    out = ex.run({'lang': _sleeper(0.0, 'en'), 'wordcloud': _sleeper(0.6, 'png')})
+    assert out.values == {'lang': 'en'} and out.dropped == ['wordcloud']  # max_overruns of its runs still going
+    assert time.perf_counter() - t0 < 0.2
+    assert 'sentiment_enrichment_inline_total{stage="lang"} 1' in metrics.render()
+
+    time.sleep(0.7)
+    assert ex.busy() == 0
+    out = ex.run({'wordcloud': _sleeper(0.0, 'png')})
+    assert out.values == {'wordcloud': 'png'}
+
+
+def test_one_overrun_does_not_turn_a_stage_off_for_others():
+    ex = EnrichmentExecutor(max_workers=4, timeouts=parse_timeouts('wordcloud=50'), max_overruns=2)
+    slow = ex.run({'wordcloud': _sleeper(0.6, 'slow')})
+    assert slow.dropped == ['wordcloud'] and len(slow.pending) == 1
+    out = ex.run({'wordcloud': _sleeper(0.0, 'png')})  # the first request's run is still overrunning
+    assert out.values == {'wordcloud': 'png'} and not out.dropped
+    ex.run({'wordcloud': _sleeper(0.6, 'slow')})
+    assert ex.run({'wordcloud': _sleeper(0.0, 'png')}).dropped == ['wordcloud']  # the cap is reached
+    time.sleep(0.7)
+    assert ex.run({'wordcloud': _sleeper(0.0, 'png')}).values == {'wordcloud': 'png'}
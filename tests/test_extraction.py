@@ -0,0 +1,142 @@
+import io
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+# No app import at module level: worker processes import this module to run _hang/_spin
+from extraction import ExtractionError, ExtractionPool, TextCache, pdf_pages, pdf_split
+
+
+def _pdf(pages):
+    from reportlab.pdfgen import canvas
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf)
+    for i in range(pages):
+        c.drawString(72, 720, f'Page {i}: the espresso was wonderful and the staff were kind.')
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def _hang():
+    time.sleep(30)
+
+
+def _nap(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def _spin():
+    while True:
+        pass
+
+
+def test_pdf_pages_extracted_in_workers_match_inline(tmp_path):
+    raw = _pdf(11)
+    pool = ExtractionPool(workers=2, pages_per_task=4, cache=TextCache(str(tmp_path)))
+    try:
+        total, texts, parts = pdf_split(raw, 4)
+        assert total == 11 and len(texts) == 4 and len(parts) == 2
+        assert [pdf_pages(p, 0, None)[0] for p in parts] == [4, 3]  # the other ranges, without the whole upload
+        first = pool.extract(raw, 'pdf')
+        assert first.pages == 11 and not first.cached
+        assert first.text == ExtractionPool(workers=0).extract(raw, 'pdf').text
+        assert first.text.index('Page 3:') < first.text.index('Page 4:') < first.text.index('Page 10:')
+        again = pool.extract(raw, 'pdf')
+        assert again.cached and again.text == first.text and again.sha256 == first.sha256
+        assert pool.cached_text(first.sha256.upper()) == first.text
+        with pytest.raises(ExtractionError) as err:
+            pool.extract(b'%PDF-1.4 not really', 'pdf')
+        assert err.value.status == 400 and 'PDF' in str(err.value)
+        pool.extract(_pdf(9), 'pdf')
+        assert pool.started == 2  # four tasks over three extractions, on the same two workers
+    finally:
+        pool.shutdown()
+
+
+def test_hung_and_runaway_workers_are_killed():
+    pool = ExtractionPool(workers=1, timeout=0.5, cpu_seconds=1)
+    try:
+        t0 = time.monotonic()
+        with pytest.raises(ExtractionError) as err:
+            pool._run([(_hang,)], 'pdf')
+        assert err.value.reason == 'timeout' and err.value.status == 422
+        assert time.monotonic() - t0 < 5
+        pool.timeout = 20
+        with pytest.raises(ExtractionError) as err:
+            pool._run([(_spin,)], 'pdf')  # SIGXCPU after one CPU second
+        assert err.value.reason == 'limit'
+        assert pool.extract(_pdf(1), 'pdf').pages == 1  # a fresh pool took over
+    finally:
+        pool.shutdown()
+
+
+def test_a_killed_extraction_leaves_concurrent_ones_alone():
+    pool = ExtractionPool(workers=2, timeout=10, cpu_seconds=1)
+    outcome = {}
+
+    def good():
+        time.sleep(0.2)  # start while the runaway task is already running; still running when it is killed
+        try:
+            outcome['result'] = pool._run([(_nap, 2)], 'pdf')
+        except ExtractionError as exc:
+            outcome['result'] = exc
+    try:
+        for culprit in ([(_spin,)], [(_hang,)]):  # RLIMIT_CPU, then the wall-clock timeout
+            worker = threading.Thread(target=good)
+            worker.start()
+            with pytest.raises(ExtractionError):
+                pool._run(culprit, 'pdf', time.monotonic() + 1)
+            worker.join(10)
+            assert outcome.pop('result') == [2]
+    finally:
+        pool.shutdown()
+
+
+def test_cache_trims_least_recently_used(tmp_path):
+    for i, sha in enumerate('abc'):
+        TextCache(str(tmp_path), max_age=0).put(sha * 64, 'text', str(i) * 1000)
+        os.utime(tmp_path / f'{sha * 64}.text.txt', (i, i))
+    cache = TextCache(str(tmp_path), max_bytes=2500, max_age=0)
+    assert cache.get('a' * 64) is not None  # touched: now the most recent
+    assert cache.trim() == 1
+    assert cache.get('b' * 64) is None and cache.get('a' * 64) == ('0' * 1000, 'text')
+    assert cache.get('../etc/passwd') is None
+
+
+def test_cache_drops_stale_and_oversized_entries(tmp_path):
+    cache = TextCache(str(tmp_path), max_bytes=16_000, max_age=3600)
+    cache.put('a' * 64, 'text', 'x' * 1001)  # over max_bytes / 16
+    assert cache.get('a' * 64) is None
+    cache.put('b' * 64, 'text', 'old')
+    cache.put('c' * 64, 'text', 'new')
+    old = time.time() - 7200
+    os.utime(tmp_path / f'{"b" * 64}.text.txt', (old, old))
+    assert cache.get('b' * 64) is None and cache.get('c' * 64) == ('new', 'text')
+    assert cache.trim() == 1 and not (tmp_path / f'{"b" * 64}.text.txt').exists()
+
+
+def test_analyze_file_and_export_pdf_reuse_extracted_text(app_db, tmp_path, monkeypatch):
+    app_module = app_db
+    monkeypatch.setattr(app_module, 'EXTRACTION', ExtractionPool(workers=0, cache=TextCache(str(tmp_path / 'x'))))
+    from reports import ReportService
+    monkeypatch.setattr(app_module, 'REPORTS', ReportService(str(tmp_path / 'reports'), workers=0))
+    client = app_module.app.test_client()
+    raw = _pdf(2)  # reportlab stamps the time, so build it once
+    upload = lambda: client.post('/analyze_file', data={'file': (io.BytesIO(raw), 'r.pdf')},
+                                 content_type='multipart/form-data')
+    first = upload().get_json()
+    assert first['label'] == 'Positive' and first['meta']['pages'] == 2 and not first['meta']['cached']
+    assert upload().get_json()['meta']['cached']
+
+    resp = client.post('/export_pdf', json={'file_sha256': first['meta']['sha256']})
+    assert resp.status_code == 200 and resp.data.startswith(b'%PDF')
+    assert client.post('/export_pdf', json={'file_sha256': 'f' * 64}).status_code == 404
@@ -0,0 +1,77 @@
+import csv
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import app as app_module
+import hashing_model as hm
+
+POS = ['great product, I love it', 'excellent service and happy staff', 'wonderful, awesome day',
+       'me encanta, es excelente', 'c\'est génial, très content']
+NEG = ['terrible product, I hate it', 'awful service and rude staff', 'broken and disappointing',
+       'es horrible, lo odio', 'c\'est nul, très déçu']
+
+
+def _labeled_csv(path, repeat=8):
+    with open(path, 'w', newline='', encoding='utf-8') as fh:
+        w = csv.writer(fh)
+        w.writerow(['text', 'sentiment'])
+        for _ in range(repeat):
+            for t in POS:
+                w.writerow([t, 'positive'])
+            for t in NEG:
+                w.writerow([t, '-1'])
+            w.writerow(['', 'positive'])  # skipped: empty text
+            w.writerow(['no label here', 'maybe'])  # skipped: unknown label
+
+
+def test_featurizer_is_deterministic_and_normalized():
+    f = hm.HashingFeaturizer(n_bits=12)
+    rows, cols, vals = f.transform(['Great great day', '', 'great day'])
+    assert set(rows.tolist()) == {0, 2}
+    for r in (0, 2):
+        assert abs(float((vals[rows == r] ** 2).sum()) - 1.0) < 1e-5
+    again = hm.HashingFeaturizer(n_bits=12).transform(['Great great day', '', 'great day'])
+    assert all((a == b).all() for a, b in zip((rows, cols, vals), again))
+    assert hm.parse_label('POS') == 2 and hm.parse_label('-3') == 0 and hm.parse_label('0') == 1
+    assert hm.parse_label('maybe') is None
+
+
+def test_train_save_load_and_batch_inference(tmp_path):
+    path = tmp_path / 'train.csv'
+    _labeled_csv(path)
+    texts, labels, skipped = hm.read_labeled_csv(str(path), label_col='sentiment')
+    assert skipped == 16 and len(texts) == 80
+    model = hm.train(texts, labels, n_bits=14, epochs=10)
+    assert model.meta['train_accuracy'] == 1.0
+
+    out = tmp_path / 'linear.npz'
+    model.save(str(out))
+    loaded = hm.LinearSentimentModel.load(str(out))
+    batch = loaded.polarity_scores_batch(['I love it, great', 'I hate it, awful', ''])
+    assert batch[0]['compound'] > 0.05 and batch[1]['compound'] < -0.05
+    assert batch[0] == loaded.polarity_scores('I love it, great')
+    assert abs(sum(batch[2][k] for k in ('neg', 'neu', 'pos')) - 1.0) < 1e-3
+    with pytest.raises(ValueError):
+        hm.read_labeled_csv(str(path), label_col='label')
+
+
+def test_cli_trains_model_and_registry_offers_it(app_db, tmp_path, monkeypatch):
+    path = tmp_path / 'train.csv'
+    _labeled_csv(path)
+    artifact = tmp_path / 'models' / 'linear.npz'
+    monkeypatch.setattr(app_module, 'LINEAR_MODEL_PATH', str(artifact))
+    assert app_module.MODELS.resolve('linear') is None  # not trained yet -> falls back
+
+    result = app_module.app.test_cli_runner().invoke(
+        args=['train-linear', str(path), '--label-col', 'sentiment', '--bits', '14', '--epochs', '10'])
+    assert result.exit_code == 0, result.output
+    assert artifact.exists()
+    assert app_module.MODELS.resolve('linear') == 'linear'
+    scored = app_module.score_texts(['me encanta, es excelente', 'lo odio, es horrible', ''], model='linear')
+    assert [r['label'] for r in scored] == ['Positive', 'Negative', 'Neutral']
@@ -0,0 +1,90 @@
+import gzip
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import app as app_module
+
+
+@pytest.fixture
+def db(app_db, monkeypatch):
+    monkeypatch.setitem(app_db.app.config, 'HISTORY_RETENTION', {'csv': 7, '*': 30})
+    return app_db.DB_PATH
+
+
+def _insert(db, source, days_old, user_id=None):
+    created = (datetime.utcnow() - timedelta(days=days_old)).isoformat(timespec='seconds') + 'Z'
+    with sqlite3.connect(db) as conn:
+        conn.execute(
+            "INSERT INTO analyses (source, text_snippet, label, compound, created_at, user_id) VALUES (?, ?, 'Neutral', 0, ?, ?)",
+            (source, f'{source}-{days_old}', created, user_id),
+        )
+
+
+def _snippets(db):
+    with sqlite3.connect(db) as conn:
+        return sorted(r[0] for r in conn.execute("SELECT text_snippet FROM analyses"))
+
+
+def test_prune_archives_by_source_policy(db, tmp_path):
+    _insert(db, 'text', 10)
+    _insert(db, 'text', 40)
+    _insert(db, 'csv', 10)
+    _insert(db, 'csv', 1)
+
+    report = app_module.prune_history()
+
+    assert report == {'csv': 1, '*': 1}
+    assert _snippets(db) == ['csv-1', 'text-10']
+    files = list((tmp_path / 'archive').iterdir())
+    assert len(files) == 1
+    with gzip.open(files[0], 'rt', encoding='utf-8') as fh:
+        archived = sorted(json.loads(line)['text_snippet'] for line in fh)
+    assert archived == ['csv-10', 'text-40']
+
+
+def test_user_retention_overrides_source_policy(db):
+    with sqlite3.connect(db) as conn:
+        conn.execute("INSERT INTO user_settings (user_id, history_retention_days) VALUES (1, 0), (2, 3)")
+    _insert(db, 'text', 400, user_id=1)
+    _insert(db, 'text', 5, user_id=2)
+    _insert(db, 'text', 1, user_id=2)
+
+    app_module.prune_history()
+
+    assert _snippets(db) == ['text-1', 'text-400']
+
+
+def test_history_stats_reports_tables_and_archive(db):
+    _insert(db, 'csv', 30)
+    app_module.prune_history()
+    app_module.vacuum_history()
+    stats = app_module.history_stats()
+    assert stats['tables']['analyses']['rows'] == 0
+    assert stats['archive']['files'] == 1
+    assert stats['auto_vacuum'] == 'incremental'
+
+
+def test_default_policy_keeps_history_and_one_process_maintains(db, monkeypatch):
+    assert app_module._parse_retention(None) == {'*': 0}
+    monkeypatch.setitem(app_module.app.config, 'HISTORY_RETENTION', app_module._parse_retention(None))
+    _insert(db, 'text', 4000)
+    assert app_module.prune_history() == {} and _snippets(db) == ['text-4000']
+
+    fcntl = pytest.importorskip('fcntl')
+    monkeypatch.setattr(app_module, '_maintenance_lock_fh', None)
+    assert app_module._maintenance_leader() and app_module._maintenance_leader()
+    try:
+        with open(db + '.maintenance.lock', 'a') as other:  # what a second worker would do
+            with pytest.raises(OSError):
+                fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    finally:
+        app_module._maintenance_lock_fh.close()
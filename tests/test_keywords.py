@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import yake
+
+import app as app_module
+from keywords import KeywordService, sample_text
+from metrics import Metrics
+
+EN = 'The new espresso machine makes excellent coffee. The espresso machine is quiet and the coffee tastes great.'
+ES = 'La nueva máquina de café prepara un espresso excelente. La máquina de café es silenciosa y el café sabe muy bien.'
+
+
+def _service(**kw):
+    built = []
+
+    def factory(lang):
+        built.append(lang)
+        return yake.KeywordExtractor(lan=lang, top=6)
+    return KeywordService(factory, languages=('en', 'es'), **kw), built
+
+
+def test_extractors_are_pooled_per_language():
+    metrics = Metrics()
+    svc, built = _service(metrics=metrics)
+    first = svc.extract(EN, 'en')
+    assert first == [kw for kw, _ in yake.KeywordExtractor(lan='en', top=6).extract_keywords(EN)]
+    assert svc.extract(EN, 'en') == first
+    svc.extract(ES, 'es')
+    svc.extract(ES, 'zz')  # unsupported -> default language
+    assert built == ['en', 'es']
+    assert svc.stats() == {'en': 1, 'es': 1}
+    text = metrics.render()
+    assert 'sentiment_cache_hits_total{cache="keyword_extractor"} 2' in text
+    assert 'sentiment_cache_misses_total{cache="keyword_extractor"} 2' in text
+
+
+def test_concurrent_use_never_shares_an_extractor():
+    svc, built = _service(pool_size=2)
+    expected = svc.extract(EN, 'en')
+    results, errors = [], []
+
+    def worker():
+        try:
+            for _ in range(5):
+                results.append(svc.extract(EN, 'en'))
+        except Exception as exc:  # pragma: no cover - surfaced by the assert below
+            errors.append(exc)
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors and all(r == expected for r in results)
+    assert svc.stats()['en'] <= 2
+
+
+def test_sample_text_caps_long_documents():
+    sentence = 'Sentence number {} talks about coffee and espresso machines. '
+    text = ''.join(sentence.format(i) for i in range(2000))
+    sampled = sample_text(text, 4000)
+    assert len(sampled) <= 4000
+    parts = sampled.split('\n')
+    assert len(parts) == 4
+    assert parts[0].startswith('Sentence number 0 ') and parts[-1].endswith('machines.')
+    assert all(p.startswith('Sentence number') for p in parts)
+    assert sample_text('short', 4000) == 'short'
+
+
+def test_batch_and_corpus_keywords():
+    svc, _ = _service()
+    scored = svc.extract_batch([EN, '', ES], ['en', None, 'es'], top=3)
+    assert len(scored) == 3 and scored[1] == [] and len(scored[0]) == 3
+    ranked = svc.corpus_keywords([EN, EN.upper(), 'Espresso machine reviews.'], 'en', top=3)
+    assert ranked[0]['documents'] >= 2
+    assert {'keyword', 'documents', 'score'} <= set(ranked[0])
+
+
+def test_top_is_set_on_extractors_without_config():
+    class OldYake:  # yake < 0.7 keeps its settings as attributes
+        top = 20
+
+        def extract_keywords(self, text):
+            return [(f'kw{i}', i / 10) for i in range(self.top)]
+    svc = KeywordService(lambda lang: OldYake())
+    assert svc.extract('some text', top=3) == ['kw0', 'kw1', 'kw2']
+
+
+def test_analyze_text_uses_detected_language():
+    res = app_module.analyze_text(ES)
+    assert res['lang'] == 'es'
+    assert res['keywords'] == app_module.KEYWORDS.extract(ES, 'es')
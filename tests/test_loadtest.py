@@ -0,0 +1,61 @@
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from benchmarks import loadtest
+
+
+def test_only_loopback_targets_allowed():
+    assert loadtest.is_loopback('http://127.0.0.1:5000')
+    assert loadtest.is_loopback('http://localhost:8000/')
+    assert loadtest.is_loopback('http://[::1]:5000')
+    assert not loadtest.is_loopback('http://example.com')
+    assert not loadtest.is_loopback('http://10.0.0.5:5000')
+    with pytest.raises(ValueError):
+        loadtest.run_load('http://10.0.0.5:5000', [('GET', '/health', None)])
+
+
+def test_traffic_replays_paths_and_maps_text_lines():
+    lines = [
+        json.dumps({'method': 'GET', 'path': '/health'}),
+        json.dumps({'request_id': 'x', 'title': 'Title', 'body': 'Some body text'}),
+        json.dumps({'unrelated': 1}),
+        '',
+    ]
+    traffic = loadtest.load_traffic(lines, {'chat': 1})
+    assert traffic[0] == ('GET', '/health', None)
+    assert traffic[1] == ('POST', '/chat', json.dumps({'message': 'Some body text'}).encode())
+    assert len(traffic) == 2
+    with pytest.raises(ValueError):
+        loadtest.parse_mix('upload=1')
+
+
+def test_run_load_reports_latency_and_429s(app_db, monkeypatch):
+    from werkzeug.serving import make_server
+    app_module = app_db
+
+    monkeypatch.setattr(app_module.limiter, 'enabled', True)
+    app_module.limiter.reset()
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        traffic = [('GET', '/health', None), ('POST', '/analyze', json.dumps({'text': 'great day'}).encode())]
+        report = loadtest.run_load(f'http://127.0.0.1:{server.server_port}', traffic,
+                                   concurrency=2, duration=0, max_requests=60)
+    finally:
+        server.shutdown()
+    total = report['total']
+    assert total['requests'] == 60
+    assert total['errors'] == 0
+    assert total['p50_ms'] <= total['p95_ms'] <= total['p99_ms']
+    # 30 /analyze calls against a 20/minute limit
+    assert report['endpoints']['/analyze']['rate_limited'] >= 10
+    assert report['endpoints']['/health']['rate_limited'] == 0
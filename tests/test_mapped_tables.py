@@ -0,0 +1,92 @@
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import mapped_tables as mt
+
+TEXTS = ['I love this 😍 so much!!', 'The service was NOT good, kind of awful :(',
+         "meh. it's ok I guess 👍", 'no problem at all, not bad', '']
+
+
+def test_bundle_roundtrip(tmp_path):
+    path = str(tmp_path / 'x.tbl')
+    mt.write_bundle(path, {
+        'floats': (['b', 'a', 'ça'], [2.0, 1.5, -3.25]),
+        'rows': (['xy', 'x'], [[0.5, 0.0], [0.0, 1.0]]),
+        'names': (['😍', ':)'], ['smiling face with heart-eyes', 'smile']),
+        'set': (['en\tthe', 'en\ta', 'de\tder'], None),
+    }, meta={'langlist': ['en', 'de']}, source='v1')
+    bundle = mt.open_bundle(path, 'v1')
+    assert bundle.meta == {'langlist': ['en', 'de']}
+    floats, rows, names, words = (bundle[n] for n in ('floats', 'rows', 'names', 'set'))
+    assert dict(floats) == {'a': 1.5, 'b': 2.0, 'ça': -3.25}
+    assert 'ç' not in floats and 'c' not in floats and 'zzzzzzz' not in floats
+    assert floats.get('missing', 7) == 7
+    with pytest.raises(KeyError):
+        floats['missing']
+    assert rows['xy'] == [0.5, 0.0] and isinstance(rows['x'], list)
+    assert names['😍'] == 'smiling face with heart-eyes'
+    assert 'en\tthe' in words and words.with_prefix('en\t') == ['en\ta', 'en\tthe']
+    # stale or missing files are reported as None so callers rebuild or fall back
+    assert mt.open_bundle(path, 'v2') is None
+    assert mt.open_bundle(str(tmp_path / 'missing.tbl')) is None
+
+
+def test_write_rejects_duplicate_keys(tmp_path):
+    with pytest.raises(ValueError):
+        mt.write_bundle(str(tmp_path / 'd.tbl'), {'t': (['a', 'a'], [1.0, 2.0])})
+
+
+def test_build_is_incremental(tmp_path):
+    first = mt.build(str(tmp_path), ['vader'])
+    assert first['vader']['status'] == 'built'
+    assert first['vader']['entries']['lexicon'] > 7000
+    assert mt.build(str(tmp_path), ['vader'])['vader']['status'] == 'fresh'
+    assert mt.build(str(tmp_path), ['vader'], force=True)['vader']['status'] == 'built'
+
+
+def test_mapped_vader_matches_parsed(tmp_path):
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    mapped = mt.vader_analyzer(str(tmp_path))
+    parsed = SentimentIntensityAnalyzer()
+    assert mapped is not None and not isinstance(mapped.lexicon, dict)
+    for text in TEXTS * 2:  # second pass answers from the memo
+        assert mapped.polarity_scores(text) == parsed.polarity_scores(text)
+
+
+def test_mapped_langdetect_matches_parsed(tmp_path):
+    from langdetect import detect_langs
+    from langdetect import detector_factory
+    samples = ['Bonjour tout le monde, comment allez-vous?', 'Hola, ¿cómo estás? Muy bien gracias',
+               'Das ist ein schöner Tag heute', 'this is an english sentence about cats']
+    saved, seed = detector_factory._factory, detector_factory.DetectorFactory.seed
+    try:
+        detector_factory.DetectorFactory.seed = 0
+        detector_factory._factory = None
+        detector_factory.init_factory()
+        expected = [str(detect_langs(s)) for s in samples]
+        assert mt.install_langdetect(str(tmp_path))
+        assert not isinstance(detector_factory._factory.word_lang_prob_map, dict)
+        assert [str(detect_langs(s)) for s in samples] == expected
+    finally:
+        detector_factory._factory, detector_factory.DetectorFactory.seed = saved, seed
+
+
+def test_yake_stopwords_match_package(tmp_path):
+    import yake
+    for lang in ('en', 'pt', 'xx'):
+        assert mt.yake_stopwords(str(tmp_path), lang) == yake.KeywordExtractor(lan=lang).stopword_set
+
+
+def test_app_uses_mapped_lexicon():
+    import app as app_module
+    if not app_module.LEXICON_MMAP:
+        pytest.skip('LEXICON_MMAP=0')
+    vader = app_module.lazy('vader')
+    assert type(vader.lexicon).__name__ == 'MappedTable'
+    assert os.path.exists(mt.resource_path(app_module.LEXICON_DIR, 'vader'))
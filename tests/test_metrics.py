@@ -0,0 +1,74 @@
+import json
+import os
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import app as app_module
+from metrics import Metrics
+
+
+def test_metrics_endpoint_reports_stages_and_requests():
+    client = app_module.app.test_client()
+    client.post('/analyze', json={'text': 'What a wonderful, sunny day at the beach'})
+    resp = client.get('/metrics')
+    assert resp.status_code == 200
+    assert resp.headers['Content-Type'].startswith('text/plain')
+    body = resp.get_data(as_text=True)
+    for stage in ('langdetect', 'score', 'keywords', 'wordcloud', 'db_write', 'serialize'):
+        assert f'sentiment_stage_seconds_count{{stage="{stage}"}}' in body
+    assert 'sentiment_requests_total{endpoint="analyze",status="200"}' in body
+    assert '# TYPE sentiment_request_seconds histogram' in body
+
+
+def test_histogram_buckets_are_cumulative():
+    m = Metrics(buckets=(0.1, 1.0))
+    m.observe('lat', 0.05, stage='a')
+    m.observe('lat', 0.5, stage='a')
+    m.observe('lat', 5.0, stage='a')
+    body = m.render()
+    assert 'lat_bucket{stage="a",le="0.1"} 1' in body
+    assert 'lat_bucket{stage="a",le="1"} 2' in body
+    assert 'lat_bucket{stage="a",le="+Inf"} 3' in body
+    assert 'lat_count{stage="a"} 3' in body
+
+
+def test_merges_worker_snapshots_and_drops_dead_gauges(tmp_path):
+    other = Metrics(directory=str(tmp_path))
+    other.inc('hits_total', 5, endpoint='analyze')
+    other.gauge_add('in_flight', 2, endpoint='analyze')
+    # pretend the snapshot came from a worker that has since exited
+    (tmp_path / '999999999.json').write_text(json.dumps(other.snapshot()))
+
+    mine = Metrics(directory=str(tmp_path))
+    mine.inc('hits_total', 1, endpoint='analyze')
+    mine.gauge_add('in_flight', 1, endpoint='analyze')
+    body = mine.render()
+    assert 'hits_total{endpoint="analyze"} 6' in body
+    assert 'in_flight{endpoint="analyze"} 1' in body
+
+
+def test_exited_workers_are_folded_and_pid_reuse_keeps_counts(tmp_path):
+    other = Metrics(directory=str(tmp_path))
+    other.inc('hits_total', 5, endpoint='analyze')
+    (tmp_path / '999999999.json').write_text(json.dumps(other.snapshot()))
+    # an earlier process that had our PID
+    (tmp_path / f'{os.getpid()}.json').write_text(json.dumps({**other.snapshot(), 'instance': 'gone'}))
+
+    mine = Metrics(directory=str(tmp_path))
+    mine.inc('hits_total', 1, endpoint='analyze')
+    for _ in range(2):  # folding happens once; the total does not move on later scrapes
+        assert 'hits_total{endpoint="analyze"} 11' in mine.render()
+    assert sorted(p.name for p in tmp_path.glob('*.json')) == sorted([f'{os.getpid()}.json', 'exited.json'])
+
+
+def test_rate_limited_requests_are_counted(app_db, monkeypatch):
+    monkeypatch.setattr(app_db.limiter, 'enabled', True)
+    app_db.limiter.reset()
+    client = app_db.app.test_client()
+    # /settings only has the app-wide default limits, which Flask-Limiter checks in before_request
+    statuses = {client.get('/settings').status_code for _ in range(12)}  # 10 per minute
+    assert 429 in statuses
+    assert 'sentiment_requests_total{endpoint="settings_api",status="429"}' in client.get('/metrics').get_data(as_text=True)
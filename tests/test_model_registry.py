@@ -0,0 +1,116 @@
+import io
+import os
+import sys
+import threading
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import app as app_module
+from model_registry import ModelLoadError, ModelRegistry
+
+
+class _Echo:
+    def __init__(self):
+        self.batches = 0
+
+    def polarity_scores(self, text):
+        return {'pos': 0.0, 'neu': 1.0, 'neg': 0.0, 'compound': len(text) / 100.0}
+
+    def polarity_scores_batch(self, texts):
+        self.batches += 1
+        return [self.polarity_scores(t) for t in texts]
+
+
+def test_models_load_lazily_once_and_report_stats():
+    reg = ModelRegistry(default='echo')
+    loads = []
+
+    @reg.register('echo', batch=True, languages=('en', 'es'))
+    def _load():
+        loads.append(1)
+        return _Echo()
+
+    assert reg.resolve(' ECHO ') == 'echo' and reg.resolve('nope') is None
+    assert not reg.loaded('echo') and loads == []
+    assert reg.score('echo', 'abcd')['compound'] == 0.04
+    assert reg.score_batch('echo', ['a', 'bb']) == [reg.score('echo', 'a'), reg.score('echo', 'bb')]
+    assert loads == [1]
+    with reg.acquire('echo') as model:
+        assert model.batches == 1  # batch-capable models use their batch path
+    stats = reg.stats()['echo']
+    assert stats['calls'] == 4 and stats['items'] == 5 and stats['loaded']
+    assert reg.spec('echo').supports('es') and not reg.spec('echo').supports('de')
+
+
+def test_pooled_models_are_warmed_and_reused():
+    reg = ModelRegistry(default='p')
+
+    @reg.register('p', thread_safe=False, pool_size=3)
+    def _load():
+        return _Echo()
+
+    @reg.register('broken')
+    def _broken():
+        raise ImportError('missing dependency')
+
+    assert reg.warm(['p', 'broken', 'unknown']) == {'p': reg.stats()['p']['load_seconds'], 'broken': None}
+    assert reg.stats()['p']['instances'] == 3
+
+    barrier = threading.Barrier(3)
+
+    def use():
+        with reg.acquire('p'):
+            barrier.wait(timeout=5)
+
+    threads = [threading.Thread(target=use) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert reg.stats()['p']['instances'] == 3  # three concurrent users fit in the warm pool
+    with pytest.raises(ModelLoadError):
+        reg.score('broken', 'x')
+
+
+@pytest.fixture
+def client(app_db):
+    return app_db.app.test_client()
+
+
+def test_requests_resolve_models_through_registry(client):
+    assert client.post('/analyze', json={'text': 'great and good', 'model': 'RULE'}).get_json()['scores']['compound'] == 0.4
+    # unknown names fall back to the user's default model
+    with client.session_transaction() as sess:
+        sess['user_id'] = 3
+    client.post('/settings', json={'default_model': 'rule'})
+    assert client.post('/analyze', json={'text': 'great and good', 'model': 'gpt'}).get_json()['scores']['compound'] == 0.4
+    listing = client.get('/models').get_json()
+    assert listing['default'] == 'vader'
+    assert {m['name'] for m in listing['models']} >= {'vader', 'rule'}
+    assert next(m for m in listing['models'] if m['name'] == 'rule')['items'] >= 2
+
+
+def test_csv_batches_score_without_enrichments(client, monkeypatch):
+    def boom(*a, **k):
+        raise AssertionError('per-row enrichment called')
+
+    monkeypatch.setattr(app_module, '_wordcloud_b64', boom)
+    monkeypatch.setattr(app_module, '_extract_keywords', boom)
+    data = 'text\nI love it\n\nthis is awful\n'.encode()
+    resp = client.post('/analyze_csv?model=rule', data={'file': (io.BytesIO(data), 'rows.csv')},
+                       content_type='multipart/form-data')
+    rows = resp.get_json()['results']
+    assert [r['label'] for r in rows] == ['Positive', 'Negative']
+
+
+def test_missing_vader_is_a_model_load_error(monkeypatch):
+    monkeypatch.setitem(app_module._LAZY_LOADED, 'vader', None)
+    monkeypatch.setitem(app_module._LAZY_ERRORS, 'vader', ImportError('No module named vaderSentiment'))
+    reg = ModelRegistry(default='vader')
+    reg.register('vader')(app_module._model_vader)
+    with pytest.raises(ModelLoadError, match='vaderSentiment'):
+        reg.score('vader', 'fine')
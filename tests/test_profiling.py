@@ -0,0 +1,57 @@
+import json
+import os
+import sys
+
+from flask import Flask, jsonify
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from profiling import install_profiler
+
+
+def _make_app():
+    app = Flask(__name__)
+
+    @app.route('/analyze', methods=['POST'])
+    def analyze():
+        total = sum(i * i for i in range(20000))
+        return jsonify({'ok': True, 'total': total})
+
+    return app
+
+
+def test_disabled_installs_nothing(tmp_path):
+    app = _make_app()
+    view = app.view_functions['analyze']
+    assert install_profiler(app, str(tmp_path)) is False
+    assert app.view_functions['analyze'] is view
+
+
+def test_header_triggers_profile_with_metadata(tmp_path):
+    app = _make_app()
+    assert install_profiler(app, str(tmp_path), token='s3cret')
+    client = app.test_client()
+
+    client.post('/analyze', json={'text': 'hello'})
+    client.post('/analyze', json={'text': 'hello'}, headers={'X-Profile-Token': 'wrong'})
+    assert list(tmp_path.iterdir()) == []
+
+    resp = client.post('/analyze', json={'text': 'hello there'},
+                       headers={'X-Profile-Token': 's3cret', 'X-Profile': 'cprofile'})
+    assert resp.status_code == 200
+    names = sorted(p.name for p in tmp_path.iterdir())
+    assert len(names) == 2 and names[0].endswith('.json') and names[1].endswith('.pstats')
+    meta = json.loads((tmp_path / names[0]).read_text())
+    assert meta['endpoint'] == 'analyze'
+    assert meta['mode'] == 'cprofile'
+    assert meta['input']['text_chars'] == len('hello there')
+
+
+def test_sampled_mode_writes_collapsed_stacks(tmp_path):
+    app = _make_app()
+    install_profiler(app, str(tmp_path), sample_rate=1.0, mode='sample', interval_ms=0.5)
+    app.test_client().post('/analyze', json={'text': 'x'})
+    collapsed = [p for p in tmp_path.iterdir() if p.suffix == '.collapsed']
+    assert len(collapsed) == 1
@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+import ratelimit_storage
+
+
+def _hammer(uri, n):
+    storage = storage_from_string(uri)
+    for _ in range(n):
+        storage.incr('shared', 60)
+
+
+def test_scheme_is_registered(tmp_path):
+    storage = storage_from_string(f'sqlite://{tmp_path}/rl.db')
+    assert isinstance(storage, ratelimit_storage.SQLiteStorage)
+    assert storage.check()
+
+
+def test_limit_holds_across_processes(tmp_path):
+    uri = f'sqlite://{tmp_path}/rl.db'
+    procs = [multiprocessing.Process(target=_hammer, args=(uri, 50)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert storage_from_string(uri).get('shared') == 200
+
+    limiter = FixedWindowRateLimiter(storage_from_string(uri))
+    limit = parse('2/minute')
+    assert limiter.hit(limit, 'k') and limiter.hit(limit, 'k')
+    # a second "worker" sees the same window
+    assert not FixedWindowRateLimiter(storage_from_string(uri)).hit(limit, 'k')
+
+
+def test_expired_window_restarts(tmp_path):
+    storage = storage_from_string(f'sqlite://{tmp_path}/rl.db', sweep_every=1)
+    storage.incr('k', 1)
+    storage.incr('k', 1)
+    assert storage.get('k') == 2
+    time.sleep(1.05)
+    assert storage.get('k') == 0
+    assert storage.incr('k', 1) == 1
+    assert storage.stats()['calls'] >= 4
+
+
+def test_concurrent_hits_are_group_committed_with_exact_counts(tmp_path):
+    import threading
+    storage = storage_from_string(f'sqlite://{tmp_path}/rl.db', sweep_every=7)
+    counts = []
+
+    def worker():
+        for _ in range(50):
+            counts.append(storage.incr('burst', 60))
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(counts) == list(range(1, 401))  # every caller saw its own exact count
+    stats = storage.stats()
+    assert stats['calls'] == 400 and stats['flushes'] <= 400
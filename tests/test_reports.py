@@ -0,0 +1,139 @@
+import io
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+# No app import at module level: report workers import this module's dependencies only
+import reports
+from reports import ReportService, analysis_item, make_spec, render_pdf, report_key
+
+pytestmark = pytest.mark.skipif(not reports.available(), reason='reportlab not installed')
+
+
+def _pdf_text(data: bytes) -> str:
+    from PyPDF2 import PdfReader
+    return '\n'.join(p.extract_text() or '' for p in PdfReader(io.BytesIO(data)).pages)
+
+
+def _batch():
+    return {'id': 7, 'source': 'csv', 'filename': 'reviews.csv', 'model': 'vader', 'created_at': '2026-01-01',
+            'row_count': 3, 'counts': {'Positive': 2, 'Neutral': 0, 'Negative': 1},
+            'means': {'pos': 0.4, 'neu': 0.5, 'neg': 0.1, 'compound': 0.3},
+            'histogram': [1, 0, 0, 0, 0, 0, 0, 0, 1, 1],
+            'most_negative': [{'row_idx': 2, 'label': 'Negative', 'compound': -0.8, 'snippet': 'cold soup'}],
+            'most_positive': [{'row_idx': 0, 'label': 'Positive', 'compound': 0.9, 'snippet': 'lovely staff'}]}
+
+
+def test_items_are_validated_and_spec_keys_are_stable():
+    item = analysis_item({'label': 'bogus', 'scores': {'pos': 2, 'neu': 0, 'neg': 0, 'compound': -0.6},
+                          'keywords': ['k'] * 20, 'emoji': 'x'}, text='bad', model='vader')
+    assert item['label'] == 'Negative' and item['scores']['pos'] == 1.0
+    assert len(item['keywords']) == 10 and item['model'] == 'vader' and 'emoji' not in item
+    with pytest.raises(ValueError):
+        analysis_item({'scores': {'compound': 'high'}})
+    with pytest.raises(ValueError):
+        analysis_item({'scores': {}, 'wordcloud_png_b64': 'aGVsbG8gd29ybGQ='})
+    spec = make_spec([item], [_batch()], ' Q1 ', owner=3)
+    assert spec['title'] == 'Q1'
+    assert report_key(spec) == report_key(make_spec([dict(item)], [_batch()], 'Q1', owner=3))
+    assert report_key(spec) != report_key(make_spec([item], [_batch()], 'Q1', owner=4))
+
+
+def test_render_pdf_has_overview_items_and_batch_sections():
+    items = [analysis_item({'scores': {'pos': 0.6, 'neu': 0.4, 'neg': 0, 'compound': 0.7}}, text='great coffee'),
+             analysis_item({'scores': {'pos': 0, 'neu': 0.5, 'neg': 0.5, 'compound': -0.5}}, text='slow service')]
+    text = _pdf_text(render_pdf(make_spec(items, [_batch()], 'Weekly')))
+    assert 'Weekly' in text and 'great coffee' in text and 'slow service' in text
+    assert 'reviews.csv' in text and 'cold soup' in text and 'lovely staff' in text
+
+
+def test_service_caches_by_content_and_records_failures(tmp_path):
+    service = ReportService(str(tmp_path), workers=1)
+    try:
+        spec = make_spec([analysis_item({'scores': {'compound': 0.5}}, text='fine')], [])
+        key, status = service.request(spec)
+        assert status in ('pending', 'ready')
+        assert service.wait(key, 30) == 'ready'
+        assert service.pdf_path(key).endswith('.pdf') and open(service.pdf_path(key), 'rb').read(4) == b'%PDF'
+        assert service.request(spec) == (key, 'ready')
+        assert not os.path.exists(os.path.join(str(tmp_path), f'{key}.json'))
+
+        broken = make_spec([{'label': 'Positive'}], [])  # not built by analysis_item: no scores
+        bad, _ = service.request(broken)
+        assert service.wait(bad, 30) == 'failed' and 'KeyError' in service.error(bad)
+        assert service.status('0' * 64) is None and service.status('../x') is None
+    finally:
+        service.shutdown()
+
+
+@pytest.fixture
+def client(app_db, tmp_path, monkeypatch):
+    app_module = app_db
+    monkeypatch.setattr(app_module, 'REPORTS', ReportService(str(tmp_path / 'reports'), workers=0))
+    return app_module, app_module.app.test_client()
+
+
+def test_reports_from_history_and_batches_are_not_rescored(client, monkeypatch):
+    app_module, c = client
+    first = c.post('/analyze', json={'text': 'The espresso was wonderful.'}).get_json()
+    c.post('/analyze', json={'text': 'The queue was awful.'})
+    csv_body = 'text\nlovely staff\ncold soup\nok\n'
+    c.post('/analyze_csv?format=json', data={'file': (io.BytesIO(csv_body.encode()), 'reviews.csv')},
+           content_type='multipart/form-data')
+    history = c.get('/history?limit=10').get_json()['items']
+    single = [h['id'] for h in history if not h.get('batch_id')]
+    batch_ids = [h['batch_id'] for h in history if h.get('batch_id')]
+    assert len(single) == 2 and batch_ids
+
+    def boom(*a, **k):
+        raise AssertionError('report generation must not re-score')
+    monkeypatch.setattr(app_module, 'analyze_text', boom)
+
+    resp = c.post('/reports', json={'history_ids': single, 'batch_ids': batch_ids, 'title': 'Mixed'})
+    assert resp.status_code == 200, resp.get_json()
+    body = resp.get_json()
+    pdf = c.get(body['url'])
+    assert pdf.status_code == 200 and pdf.mimetype == 'application/pdf'
+    text = _pdf_text(pdf.data)
+    assert 'Mixed' in text and 'espresso' in text and 'reviews.csv' in text
+    assert c.get(body['url'], headers={'If-None-Match': f'"{body["id"]}"'}).status_code == 304
+    assert c.post('/reports', json={'history_ids': single, 'batch_ids': batch_ids, 'title': 'Mixed'}).get_json() == body
+
+    missing = c.post('/reports', json={'history_ids': [single[0], 99999]})
+    assert missing.status_code == 404 and missing.get_json()['history_ids'] == [99999]
+    assert c.post('/reports', json={}).status_code == 400
+    assert c.post('/reports', json={'history_ids': ['x']}).status_code == 400
+    assert c.get('/reports/' + 'a' * 64).status_code == 404
+
+    resp = c.post('/export_pdf', json={'text': 'The espresso was wonderful.', 'result': first})
+    assert resp.status_code == 200 and resp.data.startswith(b'%PDF')
+    assert c.post('/export_pdf', json={'text': 'x', 'result': {'scores': {'compound': 'no'}}}).status_code == 400
+
+
+def test_export_pdf_waits_no_longer_than_its_deadline(app_db, tmp_path, monkeypatch):
+    import time
+    app_module = app_db
+    service = ReportService(str(tmp_path / 'reports'), workers=1)
+    monkeypatch.setattr(app_module, 'REPORTS', service)
+    monkeypatch.setitem(app_module.ADMISSION.deadlines, 'export_pdf', 0.05)
+    c = app_module.app.test_client()
+    result = c.post('/analyze', json={'text': 'The espresso was wonderful.'}).get_json()
+    try:
+        t0 = time.monotonic()
+        resp = c.post('/export_pdf', json={'text': 'The espresso was wonderful.', 'result': result})
+        assert resp.status_code == 202 and time.monotonic() - t0 < app_module.app.config['REPORT_WAIT_S']
+        assert service.wait(resp.get_json()['id'], 30) == 'ready'
+        pdf = c.get(resp.headers['Location'])
+        assert pdf.status_code == 200 and 'Rendered:' in _pdf_text(pdf.data)
+
+        other = app_module.app.test_client()
+        with other.session_transaction() as sess:
+            sess['user_id'] = 42
+        assert other.get(resp.headers['Location']).status_code == 404  # someone else's report
+    finally:
+        service.shutdown()
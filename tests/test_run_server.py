@@ -0,0 +1,17 @@
+import os
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import run_server
+
+
+def test_gunicorn_options_preload_and_recycle():
+    args = run_server._parse_args(['--workers', '3', '--threads', '8', '--max-requests', '500', '--bind', '0.0.0.0:8000'])
+    opts = run_server.gunicorn_options(args)
+    assert opts['preload_app'] is True
+    assert opts['worker_class'] == 'gthread'
+    assert (opts['workers'], opts['threads'], opts['max_requests']) == (3, 8, 500)
+    assert opts['bind'] == '0.0.0.0:8000'
@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import app as app_module
+
+
+@pytest.fixture
+def slow_log(app_db, tmp_path, monkeypatch):
+    path = tmp_path / 'slow.jsonl'
+    monkeypatch.setitem(app_module.app.config, 'SLOW_REQUEST_MS', 0.001)
+    monkeypatch.setitem(app_module.app.config, 'SLOW_LOG_PATH', str(path))
+    monkeypatch.setattr(app_module, '_slow_pid', None)
+    yield path
+    if app_module._slow_listener is not None:
+        app_module._slow_listener.stop()
+        app_module._slow_listener = None
+    app_module._slow_pid = None
+
+
+def _entries(path):
+    app_module._slow_listener.stop()  # drain the background queue
+    app_module._slow_listener = None
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+
+def test_slow_request_entry_has_breakdown_and_hash_only(slow_log):
+    text = 'A secret sentence that must never be written to the log'
+    resp = app_module.app.test_client().post('/analyze', json={'text': text, 'model': 'rule'},
+                                             headers={'X-Request-ID': 'req-123'})
+    assert resp.headers['X-Request-ID'] == 'req-123'
+
+    [entry] = _entries(slow_log)
+    assert entry['request_id'] == 'req-123'
+    assert entry['endpoint'] == 'analyze'
+    assert entry['model'] == 'rule'
+    assert entry['input_chars'] == len(text)
+    assert entry['input_sha256'] == hashlib.sha256(text.encode('utf-8')).hexdigest()
+    assert {'langdetect', 'score', 'keywords', 'wordcloud', 'db_write'} <= set(entry['stages_ms'])
+    assert entry['db_ms'] == entry['stages_ms']['db_write']
+    assert 'secret' not in slow_log.read_text(encoding='utf-8')
+
+
+def test_fast_requests_are_not_logged(slow_log, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'SLOW_REQUEST_MS', 60_000)
+    app_module.app.test_client().get('/health')
+    assert not slow_log.exists()
+
+
+def test_input_is_hashed_on_the_listener_thread(slow_log, monkeypatch):
+    import hashlib
+    import threading
+    import types
+    threads = []
+
+    def sha256(data=b''):
+        threads.append(threading.current_thread().name)
+        return hashlib.sha256(data)
+    monkeypatch.setattr(app_module, 'hashlib', types.SimpleNamespace(sha256=sha256))
+    app_module.app.test_client().post('/analyze', json={'text': 'slow enough', 'model': 'rule'})
+    [entry] = _entries(slow_log)
+    assert entry['input_sha256'] == hashlib.sha256(b'slow enough').hexdigest()
+    assert threads and threading.current_thread().name not in threads
@@ -0,0 +1,74 @@
+import gzip
+import os
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from flask import Flask, url_for
+
+import static_assets
+
+
+def _app(tmp_path):
+    static = tmp_path / 'static'
+    static.mkdir()
+    (static / 'main.js').write_text('console.log("hello");\n' * 50)
+    (static / 'logo.png').write_bytes(b'\x89PNG fake')
+    manifest = static_assets.build(str(static))
+    app = Flask(__name__, static_folder=str(static))
+    static_assets.install(app)
+    return app, static, manifest
+
+
+def test_build_is_deterministic_and_prunes_stale_files(tmp_path):
+    app, static, manifest = _app(tmp_path)
+    js = static / manifest['main.js']
+    assert manifest['main.js'].startswith('dist/main.') and js.is_file()
+    assert gzip.decompress((static / (manifest['main.js'] + '.gz')).read_bytes()) == (static / 'main.js').read_bytes()
+    assert not (static / (manifest['logo.png'] + '.gz')).exists()  # binary assets are not compressed
+    assert static_assets.build(str(static)) == manifest
+
+    (static / 'main.js').write_text('console.log("changed");\n')
+    new = static_assets.build(str(static))
+    assert new['main.js'] != manifest['main.js']
+    assert not js.exists()
+
+
+def test_url_for_and_serving_negotiate_encoding(tmp_path):
+    app, static, manifest = _app(tmp_path)
+    with app.test_request_context():
+        url = url_for('static', filename='main.js')
+    assert url == '/static/' + manifest['main.js']
+
+    client = app.test_client()
+    plain = client.get(url, headers={'Accept-Encoding': 'identity'})
+    assert plain.status_code == 200
+    assert 'Content-Encoding' not in plain.headers
+    assert 'immutable' in plain.headers['Cache-Control'] and 'max-age=31536000' in plain.headers['Cache-Control']
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    gz = client.get(url, headers={'Accept-Encoding': 'gzip, br;q=0'})
+    assert gz.headers['Content-Encoding'] == 'gzip'
+    assert gz.mimetype == 'text/javascript' or gz.mimetype == 'application/javascript'
+    assert gzip.decompress(gz.data) == plain.data
+
+    if static_assets.brotli is not None:
+        br = client.get(url, headers={'Accept-Encoding': 'gzip, br'})
+        assert br.headers['Content-Encoding'] == 'br'
+        assert static_assets.brotli.decompress(br.data) == plain.data
+
+    assert client.get('/static/dist/manifest.json').status_code == 404
+    assert client.get('/static/' + manifest['main.js'] + '.gz').status_code == 404
+    assert client.get('/static/dist/../main.js').status_code == 404
+
+
+def test_without_manifest_static_urls_are_unchanged(tmp_path):
+    static = tmp_path / 'static'
+    static.mkdir()
+    (static / 'main.js').write_text('x')
+    app = Flask(__name__, static_folder=str(static))
+    static_assets.install(app)
+    with app.test_request_context():
+        assert url_for('static', filename='main.js') == '/static/main.js'
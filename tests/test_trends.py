@@ -0,0 +1,62 @@
+import io
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import app as app_module
+
+
+@pytest.fixture
+def client(app_db):
+    return app_db.app.test_client()
+
+
+def test_trends_follow_inserts_and_match_rebuild(client):
+    client.post('/analyze', json={'text': 'I love this so much'})
+    client.post('/analyze', json={'text': 'This is awful and I hate it'})
+    data = {'file': (io.BytesIO(b"text\nGreat work\nTerrible idea\nA table\n"), 'rows.csv')}
+    client.post('/analyze_csv', data=data, content_type='multipart/form-data')
+
+    day = client.get('/history/trends').get_json()
+    assert day['granularity'] == 'day'
+    assert len(day['buckets']) == 1
+    bucket = day['buckets'][0]
+    assert bucket['count'] == 5
+    assert bucket['labels'] == {'Positive': 2, 'Neutral': 1, 'Negative': 2}
+
+    hour = client.get('/history/trends?granularity=hour').get_json()
+    assert sum(b['count'] for b in hour['buckets']) == 5
+
+    app_module.rebuild_rollups()
+    rebuilt = client.get('/history/trends').get_json()['buckets'][0]
+    assert rebuilt['count'] == bucket['count']
+    assert rebuilt['labels'] == bucket['labels']
+    assert rebuilt['mean_compound'] == pytest.approx(bucket['mean_compound'])
+
+
+def test_trends_rejects_unknown_granularity(client):
+    assert client.get('/history/trends?granularity=week').status_code == 400
+
+
+def test_rebuild_keeps_buckets_of_archived_rows(client, monkeypatch):
+    client.post('/analyze', json={'text': 'I love this so much'})
+    client.post('/analyze_csv', data={'file': (io.BytesIO(b"text\nGreat work\nTerrible idea\n"), 'rows.csv')},
+                content_type='multipart/form-data')
+    with sqlite3.connect(app_module.DB_PATH) as conn:
+        conn.execute("UPDATE analyses SET created_at = '2020-01-02T03:00:00Z'")
+        conn.execute("UPDATE batches SET created_at = '2020-01-02T03:00:00Z'")
+    app_module.rebuild_rollups()
+    trends = lambda: app_module.get_trends(None, granularity='day', since='2000-01-01')
+    before = trends()
+    assert sum(b['count'] for b in before) == 3
+
+    monkeypatch.setitem(app_module.app.config, 'HISTORY_RETENTION', {'*': 30})
+    assert app_module.prune_history()['*'] == 2
+    app_module.rebuild_rollups()
+    assert trends() == before